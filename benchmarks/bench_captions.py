@@ -0,0 +1,127 @@
+"""
+Benchmark of subtitle parsing on synthetic rolling auto-captions of 1 to 20 MB.
+
+Run with `poetry run python -m benchmarks.bench_captions`. Every size is parsed as SRT, the format the
+summarizer used to download, three ways: with the original split-on-blank-lines parser, with the streaming cue
+parser as for official subtitles, which keeps every cue like the original parser but also their timing, and as
+for automatic captions, whose rolled text is dropped as well. The estimated tokens of the original and the
+de-duplicated transcripts are compared to show what the extra parsing time buys.
+"""
+
+import argparse
+import io
+import json
+import random
+import re
+import time
+from collections.abc import Callable
+
+from ytsum.youtube.captions import cues_to_text
+from ytsum.youtube.utils import iter_subtitle_cues, parse_subtitle_stream
+
+SIZES_MB = (1, 5, 20)
+REPEAT = 3
+WORDS = "the a video speaker explains why how data model talk idea example point really people time".split()
+
+
+def legacy_srt_to_text(srt_subs: str) -> str:
+    """The original `get_raw_text_from_srt`, without its debug logging, as the baseline."""
+    blocks = srt_subs.strip().split("\n\n")
+    lines = []
+    for block in blocks:
+        parts = block.strip().splitlines()
+        if len(parts) < 3:
+            continue
+        text_lines = [line for line in parts[2:] if line.strip()]
+        cleaned = [re.sub(r"\[.*?]", "", line).strip() for line in text_lines]
+        block_text = " ".join(filter(None, cleaned))
+        if block_text:
+            lines.append(block_text)
+    return " ".join(lines)
+
+
+def _timestamp(seconds: float) -> str:
+    """Format seconds as an SRT timestamp."""
+    minutes, milliseconds = divmod(int(seconds * 1000), 60_000)
+    return f"{minutes // 60:02}:{minutes % 60:02}:{milliseconds // 1000:02},{milliseconds % 1000:03}"
+
+
+def make_rolling_srt(size_mb: int, seed: int = 0) -> str:
+    """Return an SRT file of about `size_mb` megabytes shaped like converted YouTube auto-captions."""
+    rng = random.Random(seed)
+    blocks: list[str] = []
+    size = 0
+    previous = ""
+    second = 0.0
+    while size < size_mb * 1024 * 1024:
+        line = " ".join(rng.choices(WORDS, k=rng.randint(4, 9)))
+        if rng.random() < 0.05:
+            line = "[music] " + line
+        # Each line first appears under the previous one, then is held alone for a moment before scrolling up.
+        for text, duration in ((f"{previous}\n{line}" if previous else line, 2.0), (line, 0.01)):
+            block = f"{len(blocks) + 1}\n{_timestamp(second)} --> {_timestamp(second + duration)}\n{text}\n"
+            blocks.append(block)
+            size += len(block) + 1
+            second += duration
+        previous = line
+    return "\n".join(blocks)
+
+
+def _best_of(repeat: int, parse: Callable[[], str]) -> tuple[float, str]:
+    """Run `parse` `repeat` times and return its fastest time in seconds and its result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = parse()
+        timings.append(time.perf_counter() - started)
+    return min(timings), text
+
+
+def run(size_mb: int, repeat: int = REPEAT) -> dict[str, float]:
+    """Parse a synthetic file of `size_mb` megabytes every way and return timing and token statistics."""
+    content = make_rolling_srt(size_mb)
+    payload = content.encode("utf-8")
+
+    legacy_seconds, legacy_text = _best_of(repeat, lambda: legacy_srt_to_text(content))
+    cue_seconds, _ = _best_of(
+        repeat, lambda: cues_to_text(iter_subtitle_cues(io.BytesIO(payload), "srt", automatic=False))
+    )
+    seconds, text = _best_of(repeat, lambda: parse_subtitle_stream(io.BytesIO(payload), "srt"))
+
+    legacy_tokens = len(legacy_text) // 4
+    tokens = len(text) // 4
+    return {
+        "megabytes": round(len(payload) / 1024 / 1024, 2),
+        "legacy_seconds": round(legacy_seconds, 4),
+        "cue_seconds": round(cue_seconds, 4),
+        "merge_seconds": round(seconds - cue_seconds, 4),
+        "seconds": round(seconds, 4),
+        "megabytes_per_second": round(len(payload) / 1024 / 1024 / seconds, 1),
+        "legacy_tokens": legacy_tokens,
+        "tokens": tokens,
+        "token_reduction": round(1 - tokens / legacy_tokens, 3),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every size and print a table or JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per size.")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Runs per parser, of which the fastest counts.")
+    args = parser.parse_args()
+
+    for size_mb in SIZES_MB:
+        result = run(size_mb, args.repeat)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['megabytes']:>6.2f} MB: legacy {result['legacy_seconds']:>7.4f}s, "
+                f"cues {result['cue_seconds']:>7.4f}s + merge {result['merge_seconds']:>7.4f}s "
+                f"= {result['seconds']:>7.4f}s ({result['megabytes_per_second']:>5.1f} MB/s), "
+                f"tokens {result['legacy_tokens']:>8} -> {result['tokens']:>8} (-{result['token_reduction']:.1%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of `pack_sentences` on synthetic transcripts of 1k to 200k sentences.
+
+Run with `poetry run python -m benchmarks.bench_chunking`. The exact token counter is simulated as 10% more
+than the estimate, so the numbers include the cost of the bounded re-verification path.
+"""
+
+import argparse
+import json
+import random
+import time
+
+from ytsum.llms.utils import pack_sentences
+from ytsum.utils.prompts.prompt_generators import generate_summary_prompt
+
+SIZES = (1_000, 10_000, 50_000, 200_000)
+WORDS = "the a video speaker explains why how data model talk idea example point really people time".split()
+
+
+def make_sentences(count: int, seed: int = 0) -> list[str]:
+    """Return `count` pseudo-random sentences of 3 to 40 words."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(3, 40))).capitalize() + "." for _ in range(count)]
+
+
+def run(count: int, max_tokens: int) -> dict[str, float]:
+    """Pack `count` sentences and return timing and call statistics."""
+    sentences = make_sentences(count)
+    exact_calls = 0
+
+    def estimate(text: str) -> int:
+        return max(len(text) // 4, 1)
+
+    def exact(text: str) -> int:
+        nonlocal exact_calls
+        exact_calls += 1
+        return int(estimate(text) * 1.1)
+
+    started = time.perf_counter()
+    chunks = pack_sentences(
+        sentences=sentences,
+        get_token_count=exact,
+        max_tokens=max_tokens,
+        generate_prompt=generate_summary_prompt,
+        estimate_token_count=estimate,
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        "sentences": count,
+        "chunks": len(chunks),
+        "exact_counts": exact_calls,
+        "seconds": round(elapsed, 4),
+        "sentences_per_second": round(count / elapsed),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every size and print a table or JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-tokens", type=int, default=6000, help="Token limit per prompt.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per size.")
+    args = parser.parse_args()
+
+    for count in SIZES:
+        result = run(count, args.max_tokens)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['sentences']:>8} sentences -> {result['chunks']:>6} chunks, "
+                f"{result['exact_counts']:>6} exact counts, {result['seconds']:>8.4f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+End-to-end benchmark of the summarization pipeline on caption fixtures of 5 minutes to 10 hours.
+
+Run with `poetry run python -m benchmarks.bench_pipeline`. Every fixture is summarized along both paths of
+`ytsum`, against `LocalLLM`, the offline backend with simulated latency and generation speed:
+
+- `planned`, as for a stored transcript: the captions are parsed into a `TimedTranscript`, `plan_sections` plans
+  its chunks on cue boundaries, and `LLM.ask_prompt` runs the map and reduce calls on the planned spans.
+- `streaming`, as for a download: `LLM.ask_prompt` packs and answers chunks while the captions are still parsed.
+
+Reported per fixture and path are the wall time of every stage, the time spent counting tokens, the number of
+map and reduce calls as traced in the model and the tokens sent, the peak and mean number of calls in flight, and
+the peak traced memory. Memory is traced in a second pass without simulated latency, so tracing does not skew the
+timings. Every pass uses a model name of its own and the latency statistics are persisted to a temporary file, so
+none carry over from another fixture or an earlier run.
+
+Fixtures are synthetic subtitles generated from a fixed seed, so every run replays the same input. Pass
+`--record DIR` to save them as SRT files and `--fixtures DIR` to replay the SRT files of a directory instead,
+e.g. real captions. Use `--output FILE` to save the settings and results as JSON for comparing runs over time.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from ytsum import config
+from ytsum.llms.llm import ProgressCallback
+from ytsum.llms.local import LocalLLM
+from ytsum.llms.segmenters import SEGMENTERS, get_segmenter
+from ytsum.utils.cache import plan_sections
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import Cue, TimedTranscript
+from ytsum.youtube.utils import iter_subtitle_cues
+
+DURATIONS_MINUTES = (5, 30, 60, 180, 600)
+WORDS = "the a video speaker explains why how data model talk idea example point really people time".split()
+# Speech rate of a typical talk, in words per second.
+WORDS_PER_SECOND = 2.5
+_TIMESTAMP_PATTERN = re.compile(r"(\d+):(\d\d):(\d\d)[,.](\d{3})\s*$", re.MULTILINE)
+
+
+class BenchmarkLLM(LocalLLM):
+    """
+    Local model recording the calls in flight, their busy time, the time spent counting tokens and the number of
+    calls of every map stage, the first being the transcript's chunks and the others the reduce levels.
+    """
+
+    def __init__(self, **kwargs: Any):
+        """Initialize the model with `LocalLLM` arguments and empty statistics."""
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.busy_seconds = 0.0
+        self.token_count_seconds = 0.0
+        self.stage_calls: list[int] = []
+        self._stats_lock = threading.Lock()
+
+    def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """Answer a prompt, counting it as in flight until it returns."""
+        with self._stats_lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return super().ask(prompt, max_retries, backoff_seconds)
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def _map_chunks(
+        self,
+        prompt_generator: Callable[[str], str],
+        chunks: Iterable[str],
+        on_progress: ProgressCallback | None,
+        preamble: str = "",
+        refresh: bool = False,
+    ) -> list[str]:
+        """Answer the chunks of a map stage, recording their number."""
+        answers = super()._map_chunks(prompt_generator, chunks, on_progress, preamble, refresh)
+        with self._stats_lock:
+            self.stage_calls.append(len(answers))
+        return answers
+
+    def get_token_count(self, text: str) -> int:
+        """Count tokens, adding the time taken to the total."""
+        started = time.perf_counter()
+        try:
+            return super().get_token_count(text)
+        finally:
+            with self._stats_lock:
+                self.token_count_seconds += time.perf_counter() - started
+
+
+def _timestamp(seconds: float) -> str:
+    """Format seconds as an SRT timestamp."""
+    minutes, milliseconds = divmod(int(seconds * 1000), 60_000)
+    return f"{minutes // 60:02}:{minutes % 60:02}:{milliseconds // 1000:02},{milliseconds % 1000:03}"
+
+
+def make_srt(minutes: int, seed: int = 0) -> str:
+    """Return punctuated subtitles of a talk lasting `minutes`, with a cue every few seconds and some pauses."""
+    rng = random.Random(seed)
+    blocks: list[str] = []
+    second = 0.0
+    sentence_left = rng.randint(3, 30)
+    while second < minutes * 60:
+        words = []
+        for _ in range(rng.randint(5, 9)):
+            word = rng.choice(WORDS)
+            sentence_left -= 1
+            if sentence_left == 0:
+                word += "."
+                sentence_left = rng.randint(3, 30)
+            words.append(word)
+        duration = len(words) / WORDS_PER_SECOND
+        blocks.append(
+            f"{len(blocks) + 1}\n{_timestamp(second)} --> {_timestamp(second + duration)}\n{' '.join(words)}\n"
+        )
+        second += duration + (rng.uniform(2, 5) if rng.random() < 0.03 else 0)
+    return "\n".join(blocks)
+
+
+def get_duration_minutes(srt_subs: str) -> float:
+    """Return the end time of the last cue of SRT subtitles in minutes."""
+    matches = _TIMESTAMP_PATTERN.findall(srt_subs[-1000:])
+    if not matches:
+        return 0.0
+    hours, minutes, seconds, milliseconds = map(int, matches[-1])
+    return round(hours * 60 + minutes + seconds / 60 + milliseconds / 60_000, 1)
+
+
+def load_fixtures(directory: str | None, record: str | None) -> Iterator[tuple[str, str]]:
+    """
+    Yield the name and content of every fixture, generated or read from a directory.
+
+    Args:
+        directory (str | None): Directory of SRT files to replay, or None for the synthetic fixtures.
+        record (str | None): Directory to save the synthetic fixtures to, or None not to save them.
+
+    Yields:
+        tuple[str, str]: Name and SRT content of each fixture, shortest first.
+    """
+    if directory is not None:
+        fixtures = [(path.stem, path.read_text(encoding="utf-8")) for path in Path(directory).glob("*.srt")]
+        yield from sorted(fixtures, key=lambda fixture: get_duration_minutes(fixture[1]))
+        return
+    for minutes in DURATIONS_MINUTES:
+        name, content = f"{minutes}min", make_srt(minutes)
+        if record is not None:
+            Path(record).mkdir(parents=True, exist_ok=True)
+            (Path(record) / f"{name}.srt").write_text(content, encoding="utf-8")
+        yield name, content
+
+
+def _iter_cues(srt_subs: str) -> Iterator[Cue]:
+    """Parse SRT subtitles into cues as a download of official subtitles is parsed."""
+    return iter_subtitle_cues(io.BytesIO(srt_subs.encode("utf-8")), "srt", automatic=False)
+
+
+def run_planned(srt_subs: str, llm: BenchmarkLLM) -> dict[str, float]:
+    """Summarize a transcript with its chunks planned on its cues and return the wall time of each stage."""
+    started = time.perf_counter()
+    transcript = TimedTranscript.from_cues(_iter_cues(srt_subs))
+    parsed = time.perf_counter()
+    spans = [section.span for section in plan_sections(llm, Prompt.SUMMARY, transcript)] or None
+    planned = time.perf_counter()
+    llm.ask_prompt(Prompt.SUMMARY, transcript.text, spans=spans)
+    finished = time.perf_counter()
+    return {
+        "transcript_tokens": llm.get_token_count(transcript.text),
+        "parse_seconds": parsed - started,
+        "plan_seconds": planned - parsed,
+        "llm_seconds": finished - planned,
+        "wall_seconds": finished - started,
+    }
+
+
+def run_streaming(srt_subs: str, llm: BenchmarkLLM) -> dict[str, float]:
+    """Summarize a transcript while its captions are parsed and return the wall time, as the stages overlap."""
+    started = time.perf_counter()
+    transcript = TimedTranscript()
+    llm.ask_prompt(Prompt.SUMMARY, (transcript.append(cue) for cue in _iter_cues(srt_subs)))
+    finished = time.perf_counter()
+    return {
+        "transcript_tokens": llm.get_token_count(transcript.text),
+        "llm_seconds": finished - started,
+        "wall_seconds": finished - started,
+    }
+
+
+PATHS: dict[str, Callable[[str, BenchmarkLLM], dict[str, float]]] = {
+    "planned": run_planned,
+    "streaming": run_streaming,
+}
+
+
+def run(name: str, srt_subs: str, path: str, args: argparse.Namespace) -> dict[str, Any]:
+    """Benchmark one fixture along one path and return its timings, API usage, concurrency and peak memory."""
+    settings = {
+        "max_tokens": args.max_tokens,
+        "output_tokens": args.output_tokens,
+        "segmenter": get_segmenter(args.segmenter),
+    }
+    run_path = PATHS[path]
+
+    llm = BenchmarkLLM(
+        **settings,
+        latency_seconds=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        model_name=f"bench-{name}-{path}",
+    )
+    timings = run_path(srt_subs, llm)
+
+    traced_llm = BenchmarkLLM(
+        **settings, latency_seconds=0, tokens_per_second=0, model_name=f"bench-traced-{name}-{path}"
+    )
+    tracemalloc.start()
+    try:
+        run_path(srt_subs, traced_llm)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    usage = llm.get_usage()
+    map_calls = llm.stage_calls[0] if llm.stage_calls else 0
+    return {
+        "fixture": name,
+        "path": path,
+        "minutes": get_duration_minutes(srt_subs),
+        "megabytes": round(len(srt_subs.encode("utf-8")) / 1024 / 1024, 2),
+        "transcript_tokens": timings["transcript_tokens"],
+        **{key: round(value, 4) for key, value in timings.items() if key.endswith("_seconds")},
+        "token_count_seconds": round(llm.token_count_seconds, 4),
+        "api_calls": usage["calls"],
+        "map_calls": map_calls,
+        "reduce_calls": sum(llm.stage_calls[1:]),
+        "tokens_sent": usage["input_tokens"],
+        "tokens_received": usage["output_tokens"],
+        "peak_concurrency": llm.peak_in_flight,
+        "mean_concurrency": round(llm.busy_seconds / timings["llm_seconds"], 2) if timings["llm_seconds"] else 0,
+        "peak_memory_mb": round(peak_bytes / 1024 / 1024, 1),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every fixture and print a table or JSON lines, optionally saving a report."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per fixture.")
+    parser.add_argument("--output", help="Save the settings and results to this JSON file.")
+    parser.add_argument("--fixtures", help="Replay the SRT files of this directory instead of synthetic ones.")
+    parser.add_argument("--record", help="Save the synthetic fixtures as SRT files to this directory.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated latency per call in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Simulated generation speed.")
+    parser.add_argument("--max-tokens", type=int, default=6000, help="Token limit per prompt.")
+    parser.add_argument("--output-tokens", type=int, default=256, help="Maximum tokens per answer.")
+    parser.add_argument("--segmenter", choices=SEGMENTERS, default="regex", help="Sentence segmenter.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        config.LATENCY_STATS_PATH = os.path.join(directory, "latency_stats.json")
+        for name, content in load_fixtures(args.fixtures, args.record):
+            for path in PATHS:
+                result = run(name, content, path, args)
+                results.append(result)
+                if args.json:
+                    print(json.dumps(result))
+                    continue
+                stages = ""
+                if path == "planned":
+                    stages = f"parse {result['parse_seconds']:>6.3f}s, plan {result['plan_seconds']:>6.3f}s, "
+                print(
+                    f"{result['fixture']:>8} {path:<9} ({result['minutes']:>5.0f} min, "
+                    f"{result['transcript_tokens']:>7} tokens): {stages}llm {result['llm_seconds']:>6.2f}s, "
+                    f"{result['api_calls']:>3} calls ({result['map_calls']} map, {result['reduce_calls']} reduce), "
+                    f"{result['tokens_sent']:>7} tokens sent, "
+                    f"concurrency {result['mean_concurrency']:.1f}/{result['peak_concurrency']}, "
+                    f"peak memory {result['peak_memory_mb']:.1f} MB"
+                )
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("json", "output", "record")}
+        report = {
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "settings": settings,
+            "results": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
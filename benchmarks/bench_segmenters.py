@@ -0,0 +1,116 @@
+"""
+Benchmark of the sentence segmenters on synthetic official subtitles and unpunctuated auto-captions.
+
+Run with `poetry run python -m benchmarks.bench_segmenters`. Each segmenter splits every transcript, then the
+segments are packed into chunks as in the summarizer. Reported are the segmentation throughput and the chunk
+balance: the number of chunks, their mean fill of the token limit and the coefficient of variation of their
+sizes. Segmenters that cannot run, e.g. NLTK without its punkt data, are reported as skipped.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any
+
+from ytsum.llms.segmenters import SEGMENTERS, get_segmenter
+from ytsum.llms.utils import pack_sentences
+from ytsum.utils.prompts.prompt_generators import generate_summary_prompt
+
+LINE_COUNTS = (10_000, 100_000)
+WORDS = "the a video speaker explains why how data model talk idea example point really people time".split()
+
+
+def make_transcript(lines: int, punctuated: bool, seed: int = 0) -> str:
+    """Return a transcript with one caption cue per line and a blank line for every long pause."""
+    rng = random.Random(seed)
+    words = [rng.choice(WORDS) for _ in range(lines * 7)]
+    if punctuated:
+        position = 0
+        while position < len(words):
+            words[position] = words[position].capitalize()
+            position += rng.randint(3, 30)
+            words[min(position, len(words)) - 1] += "."
+    cues: list[str] = []
+    position = 0
+    for _ in range(lines):
+        width = rng.randint(5, 9)
+        cues.append(" ".join(words[position : position + width]))
+        position += width
+        if rng.random() < 0.03:
+            cues.append("")
+    return "\n".join(cues)
+
+
+def estimate(text: str) -> int:
+    """Estimate tokens as four characters per token."""
+    return max(len(text) // 4, 1)
+
+
+def run(segmenter_name: str, kind: str, lines: int, max_tokens: int) -> dict[str, Any]:
+    """Segment and pack one transcript and return throughput and chunk balance statistics."""
+    text = make_transcript(lines, punctuated=kind == "punctuated")
+    segmenter = get_segmenter(segmenter_name)
+    result: dict[str, Any] = {"segmenter": segmenter_name, "transcript": kind, "lines": lines}
+
+    started = time.perf_counter()
+    try:
+        segments = segmenter.split(text)
+    except LookupError as e:
+        return {**result, "skipped": str(e).strip().splitlines()[0][:100]}
+    seconds = time.perf_counter() - started
+
+    chunks = pack_sentences(
+        sentences=segments,
+        get_token_count=lambda prompt: int(estimate(prompt) * 1.1),
+        max_tokens=max_tokens,
+        generate_prompt=generate_summary_prompt,
+        estimate_token_count=estimate,
+    )
+    sizes = [estimate(chunk) for chunk in chunks]
+    return {
+        **result,
+        "seconds": round(seconds, 4),
+        "megabytes_per_second": round(len(text) / 1024 / 1024 / seconds, 1),
+        "segments": len(segments),
+        "max_segment_tokens": max(estimate(segment) for segment in segments),
+        "chunks": len(chunks),
+        "mean_fill": round(
+            statistics.mean(estimate(generate_summary_prompt(chunk)) for chunk in chunks) / max_tokens, 3
+        ),
+        "size_cv": round(statistics.pstdev(sizes) / statistics.mean(sizes), 3),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every segmenter, transcript kind and size and print a table or JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-tokens", type=int, default=6000, help="Token limit per prompt.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per measurement.")
+    args = parser.parse_args()
+
+    unavailable: set[str] = set()
+    for kind in ("punctuated", "auto-captions"):
+        for lines in LINE_COUNTS:
+            for segmenter_name in SEGMENTERS:
+                if segmenter_name in unavailable:
+                    continue
+                result = run(segmenter_name, kind, lines, args.max_tokens)
+                if "skipped" in result:
+                    unavailable.add(segmenter_name)
+                if args.json:
+                    print(json.dumps(result))
+                elif "skipped" in result:
+                    print(f"{segmenter_name:>6} {kind:>13} {lines:>7} lines: skipped ({result['skipped']})")
+                else:
+                    print(
+                        f"{segmenter_name:>6} {kind:>13} {lines:>7} lines: {result['seconds']:>7.4f}s "
+                        f"({result['megabytes_per_second']:>5.1f} MB/s), {result['segments']:>7} segments "
+                        f"(max {result['max_segment_tokens']:>7} tokens), {result['chunks']:>4} chunks, "
+                        f"fill {result['mean_fill']:.3f}, size CV {result['size_cv']:.3f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of CLI cold-start time.
+
+Run with `poetry run python -m benchmarks.bench_startup`. Every entry point module is imported in a fresh
+interpreter with `-X importtime` to report its cumulative import time and the slowest imports it pulls in,
+and `python -m ytsum --help` is timed end to end.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+MODULES = ("ytsum.__main__", "ytsum.batch")
+HEAVY_MODULES = ("google.genai", "yt_dlp", "nltk", "dotenv")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Import a module in a fresh interpreter and return the cumulative import time, in us, of the module
+    and of every module it pulls in, leaving out what the interpreter imports at startup.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, field = line.split("|")
+        name = field.strip()
+        times[name] = int(cumulative)
+        # Nested imports are indented and listed before their importer, so a top-level line ends a group.
+        if field[1:2] != " ":
+            if name == module:
+                break
+            times = {}
+    return times
+
+
+def run_import(module: str, runs: int, top: int) -> dict[str, Any]:
+    """Return the median cumulative import time of a module, its slowest imports and the heavy modules it loads."""
+    samples = [import_times(module) for _ in range(runs)]
+    median_ms = statistics.median(sample[module] for sample in samples) / 1000
+    last = samples[-1]
+    slowest = sorted((name for name in last if name != module), key=last.__getitem__, reverse=True)[:top]
+    return {
+        "module": module,
+        "import_ms": round(median_ms, 1),
+        "slowest": {name: round(last[name] / 1000, 1) for name in slowest},
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in last],
+    }
+
+
+def run_help(runs: int) -> dict[str, Any]:
+    """Return the median wall time of `python -m ytsum --help` in a fresh interpreter."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "ytsum", "--help"], capture_output=True, check=True)
+        samples.append(time.perf_counter() - started)
+    return {"command": "python -m ytsum --help", "wall_ms": round(statistics.median(samples) * 1000, 1)}
+
+
+def main() -> None:
+    """Run the benchmark and print a table or JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to report.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per measurement.")
+    args = parser.parse_args()
+
+    results = [run_import(module, args.runs, args.top) for module in MODULES] + [run_help(args.runs)]
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        elif "module" in result:
+            slowest = ", ".join(f"{name} {ms}ms" for name, ms in result["slowest"].items())
+            print(f"import {result['module']:<16} {result['import_ms']:>8.1f}ms  slowest: {slowest}")
+            print(f"{'':24}heavy modules loaded: {result['heavy_modules_loaded'] or 'none'}")
+        else:
+            print(f"{result['command']:<23} {result['wall_ms']:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from ytsum import config
+from ytsum.llms import optimizer
+
+
+@pytest.fixture(autouse=True)
+def isolate_latency_stats(tmp_path: Path) -> Generator[None, None, None]:
+    """Fixture to keep the latency statistics learned by a test out of the user's data and out of other tests."""
+    optimizer._stats.clear()
+    with patch.object(config, "LATENCY_STATS_PATH", str(tmp_path / "latency_stats.json")):
+        yield
+    optimizer._stats.clear()
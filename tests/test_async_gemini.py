@@ -0,0 +1,81 @@
+import asyncio
+import os
+from collections.abc import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from ytsum.llms import async_gemini
+from ytsum.llms.async_gemini import AsyncGemini
+from ytsum.llms.limits import AsyncRequestLimiter
+from ytsum.llms.registry import get_llm
+
+
+@pytest.fixture
+def mock_shared_client() -> Generator[MagicMock, None, None]:
+    """Fixture to mock the genai.Client shared by AsyncGemini instances."""
+    with patch("google.genai.Client") as mock_client_constructor, patch.dict(async_gemini._clients, clear=True):
+        mock_client = MagicMock()
+        mock_client.aio.models.generate_content = AsyncMock()
+        mock_client_constructor.return_value = mock_client
+
+        os.environ["GOOGLE_API_KEY"] = "test-key"
+        yield mock_client
+
+
+def test_async_gemini_ask_async_success(mock_shared_client: MagicMock) -> None:
+    """Calls the asynchronous API through a client shared between instances."""
+    mock_shared_client.aio.models.generate_content.return_value = MagicMock(text="This is a summary. ")
+    llm = AsyncGemini()
+
+    result = asyncio.run(llm.ask_async("Test prompt"))
+
+    assert result == "This is a summary."
+    assert AsyncGemini()._client is llm._client
+    mock_shared_client.aio.models.generate_content.assert_awaited_once()
+
+
+def test_async_gemini_sends_the_rest_of_a_prompt_after_a_cached_preamble(mock_shared_client: MagicMock) -> None:
+    """Uploads the preamble to a context cache and sends only each chunk's own text asynchronously."""
+    mock_shared_client.caches.create.return_value.name = "cachedContents/abc"
+    mock_shared_client.aio.models.generate_content.return_value = MagicMock(text="An answer.")
+    llm = AsyncGemini(context_cache_min_tokens=10)
+    preamble = "Long instructions shared by every chunk.\n"
+
+    async def run() -> list[str]:
+        return list(
+            await asyncio.gather(*(llm.ask_with_preamble_async(preamble + f"chunk {i}", preamble) for i in range(3)))
+        )
+
+    assert asyncio.run(run()) == ["An answer."] * 3
+    mock_shared_client.caches.create.assert_called_once()
+    calls = mock_shared_client.aio.models.generate_content.await_args_list
+    assert sorted(call.kwargs["contents"] for call in calls) == ["chunk 0", "chunk 1", "chunk 2"]
+    assert all(call.kwargs["config"].cached_content == "cachedContents/abc" for call in calls)
+
+
+def test_async_gemini_is_selectable_as_a_backend(mock_shared_client: MagicMock) -> None:
+    """Creates the asynchronous Gemini backend by its registry name."""
+    assert isinstance(get_llm("gemini-async"), AsyncGemini)
+
+
+def test_async_request_limiter_bounds_requests_in_flight() -> None:
+    """Never lets more requests run concurrently than the limit."""
+    in_flight = 0
+    peak = 0
+
+    async def request(limiter: AsyncRequestLimiter) -> None:
+        nonlocal in_flight, peak
+        async with limiter.slot():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run() -> None:
+        limiter = AsyncRequestLimiter(max_in_flight=2)
+        await asyncio.gather(*(request(limiter) for _ in range(6)))
+
+    asyncio.run(run())
+
+    assert peak == 2
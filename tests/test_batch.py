@@ -0,0 +1,57 @@
+import json
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ytsum.batch import BatchPipeline, expand_sources
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import TimedTranscript
+
+URL_OK = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+URL_NO_SUBS = "https://www.youtube.com/watch?v=bbbbbbbbbbb"
+TRANSCRIPT = TimedTranscript.from_text("some subtitle text")
+
+
+@pytest.fixture
+def mock_stages() -> Generator[dict[str, MagicMock], None, None]:
+    """Fixture to mock the title and subtitle stages of the pipeline."""
+    with (
+        patch("ytsum.batch.get_video_name") as mock_get_video_name,
+        patch("ytsum.batch.get_video_transcript") as mock_get_video_transcript,
+    ):
+        mock_get_video_name.side_effect = lambda url, store: f"Title of {url[-11:]}"
+        mock_get_video_transcript.side_effect = lambda url, store: None if url == URL_NO_SUBS else TRANSCRIPT
+        yield {"get_video_name": mock_get_video_name, "get_video_transcript": mock_get_video_transcript}
+
+
+def test_batch_pipeline_writes_summaries_and_manifest(mock_stages: dict[str, MagicMock], tmp_path: Path) -> None:
+    """Writes one markdown file per video and records every outcome in the manifest."""
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.return_value = "AI-generated summary."
+
+    pipeline = BatchPipeline(llm, str(tmp_path), subtitle_workers=2, title_workers=2, llm_workers=1)
+    results = pipeline.run([URL_OK, URL_NO_SUBS])
+
+    assert sorted(result.status for result in results) == ["failed", "ok"]
+    llm.ask_prompt.assert_called_once_with(Prompt.SUMMARY, "some subtitle text", spans=None, refresh=False)
+    assert (tmp_path / "aaaaaaaaaaa.md").read_text(encoding="utf-8") == (
+        f"AI-generated summary.\n\nOriginal video: [**Title of aaaaaaaaaaa**]({URL_OK})\n"
+    )
+    assert not (tmp_path / "bbbbbbbbbbb.md").exists()
+
+    manifest = [json.loads(line) for line in (tmp_path / "manifest.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert {entry["video_id"]: entry["status"] for entry in manifest} == {"aaaaaaaaaaa": "ok", "bbbbbbbbbbb": "failed"}
+
+
+@patch("ytsum.batch.get_playlist_video_urls", return_value=[URL_OK, URL_NO_SUBS])
+def test_expand_sources_expands_playlists_and_deduplicates(mock_get_playlist: MagicMock) -> None:
+    """Expands playlist URLs and drops videos that were already seen."""
+    playlist_url = "https://www.youtube.com/playlist?list=PL123"
+
+    urls = list(expand_sources([URL_OK, playlist_url]))
+
+    assert urls == [URL_OK, URL_NO_SUBS]
+    mock_get_playlist.assert_called_once_with(playlist_url)
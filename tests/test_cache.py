@@ -0,0 +1,148 @@
+import os
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from ytsum.utils.cache import (
+    DiskCache,
+    SummaryCache,
+    plan_sections,
+    stream_transcript_summary,
+    summarize_transcript,
+)
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import Cue, TimedTranscript
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Evicts the least recently read entry once the entry limit is exceeded."""
+    cache = DiskCache(str(tmp_path), max_bytes=1024, max_entries=2, max_age_seconds=3600)
+    cache.put("a", "first")
+    cache.put("b", "second")
+    os.utime(tmp_path / "b.txt", (time.time() - 60, time.time()))
+    assert cache.get("a") == "first"
+
+    cache.put("c", "third")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "first"
+    assert cache.get("c") == "third"
+
+
+def test_disk_cache_expires_old_entries(tmp_path: Path) -> None:
+    """Treats entries written longer ago than the age limit as missing."""
+    cache = DiskCache(str(tmp_path), max_bytes=1024, max_entries=10, max_age_seconds=60)
+    cache.put("a", "stale")
+    os.utime(tmp_path / "a.txt", (time.time(), time.time() - 120))
+
+    assert cache.get("a") is None
+    assert not (tmp_path / "a.txt").exists()
+
+
+def test_summarize_transcript_skips_llm_on_cache_hit(tmp_path: Path) -> None:
+    """Calls the LLM once and serves the repeated request from the cache."""
+    cache = SummaryCache(str(tmp_path))
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.return_value = "AI-generated summary."
+
+    first = summarize_transcript(llm, Prompt.SUMMARY, "some subtitle text", cache)
+    second = summarize_transcript(llm, Prompt.SUMMARY, "some subtitle text", cache)
+    refreshed = summarize_transcript(llm, Prompt.SUMMARY, "some subtitle text", cache, refresh=True)
+
+    assert first == second == refreshed == "AI-generated summary."
+    assert llm.ask_prompt.call_count == 2
+
+
+def test_plan_sections_returns_the_spans_of_a_cached_summary(tmp_path: Path) -> None:
+    """Lists the sections a cached summary was made from, not a new plan, and none if they are unknown."""
+    cache = SummaryCache(str(tmp_path))
+    transcript = TimedTranscript.from_cues([Cue(0, 1, "First part."), Cue(1, 2, "Second part.")])
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.return_value = "AI-generated summary."
+    llm.plan_chunks.return_value = [(0, 11), (11, len(transcript.text))]
+
+    sections = plan_sections(llm, Prompt.SUMMARY, transcript, cache)
+    summarize_transcript(llm, Prompt.SUMMARY, transcript.text, cache, spans=[section.span for section in sections])
+    llm.plan_chunks.return_value = [(0, len(transcript.text))]
+
+    assert plan_sections(llm, Prompt.SUMMARY, transcript, cache) == sections
+    assert len(plan_sections(llm, Prompt.SUMMARY, transcript, cache, refresh=True)) == 1
+    llm.ask_prompt.side_effect = lambda prompt_type, text, refresh: "".join(text) and "AI-generated summary."
+    summarize_transcript(llm, Prompt.SUMMARY, iter([transcript.text]), cache)
+    assert plan_sections(llm, Prompt.SUMMARY, transcript, cache) == []
+
+
+def test_summary_cache_key_depends_on_model() -> None:
+    """Produces different keys for different models."""
+    key_a = SummaryCache.make_key("text", "model-a", Prompt.SUMMARY)
+    key_b = SummaryCache.make_key("text", "model-b", Prompt.SUMMARY)
+
+    assert key_a != key_b
+
+
+def test_summary_cache_key_depends_on_prompt_preamble(tmp_path: Path) -> None:
+    """Misses the cache once the wording of the prompt preamble changes."""
+    cache = SummaryCache(str(tmp_path))
+    cache.put(SummaryCache.make_key("text", "model", Prompt.SUMMARY), "Old summary.")
+
+    with patch("ytsum.utils.prompts.prompt_generators.SUMMARY_PREAMBLE", "Reworded instructions:\n"):
+        assert cache.get(SummaryCache.make_key("text", "model", Prompt.SUMMARY)) is None
+
+
+def test_summary_cache_key_depends_on_prompt_version() -> None:
+    """Changes the key when the prompt version is bumped, even if the template reads the same."""
+    key = SummaryCache.make_key("text", "model", Prompt.SUMMARY)
+
+    with patch("ytsum.utils.cache.PROMPT_VERSION", 2):
+        assert SummaryCache.make_key("text", "model", Prompt.SUMMARY) != key
+
+
+def test_stream_transcript_summary_caches_streamed_pieces(tmp_path: Path) -> None:
+    """Stores the streamed summary once complete and serves it in one piece afterwards."""
+    cache = SummaryCache(str(tmp_path))
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt_stream.return_value = iter(["AI-generated ", "summary."])
+
+    streamed = list(stream_transcript_summary(llm, Prompt.SUMMARY, "some subtitle text", cache))
+    cached = list(stream_transcript_summary(llm, Prompt.SUMMARY, "some subtitle text", cache))
+
+    assert streamed == ["AI-generated ", "summary."]
+    assert cached == ["AI-generated summary."]
+    llm.ask_prompt_stream.assert_called_once()
+
+
+def test_summarize_transcript_stores_pieces_under_the_whole_transcript_key(tmp_path: Path) -> None:
+    """Summarizes a transcript given in pieces and caches it as if it had been given whole."""
+    cache = SummaryCache(str(tmp_path))
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.side_effect = lambda prompt_type, text, refresh: f"Summary of {''.join(text)}"
+
+    summary = summarize_transcript(llm, Prompt.SUMMARY, iter(["some ", "subtitle ", "text"]), cache)
+
+    assert summary == "Summary of some subtitle text"
+    assert summarize_transcript(llm, Prompt.SUMMARY, "some subtitle text", cache) == summary
+    llm.ask_prompt.assert_called_once()
+
+
+def test_stream_transcript_summary_probes_the_source_key_before_reading_pieces(tmp_path: Path) -> None:
+    """Serves the summary of a streamed transcript from its source key without reading any piece."""
+    cache = SummaryCache(str(tmp_path))
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt_stream.side_effect = lambda prompt_type, text, on_progress, refresh: iter(
+        ["Summary of ", "".join(text)]
+    )
+
+    streamed = list(stream_transcript_summary(llm, Prompt.SUMMARY, iter(["some ", "text"]), cache, source_key="v:en"))
+    unread = MagicMock()
+    cached = list(stream_transcript_summary(llm, Prompt.SUMMARY, unread, cache, source_key="v:en"))
+
+    assert streamed == ["Summary of ", "some text"]
+    assert cached == ["Summary of some text"]
+    unread.__iter__.assert_not_called()
+    assert summarize_transcript(llm, Prompt.SUMMARY, "some text", cache) == "Summary of some text"
+    llm.ask_prompt_stream.assert_called_once()
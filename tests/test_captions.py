@@ -0,0 +1,82 @@
+import io
+
+from ytsum.youtube.captions import (
+    Chapter,
+    Cue,
+    TimedTranscript,
+    cues_to_text,
+    iter_cues,
+    merge_rolling_cues,
+    parse_timed_text,
+)
+
+ROLLING_VTT = (
+    "WEBVTT\n\n"
+    "00:00:00.000 --> 00:00:02.000 align:start position:0%\n"
+    "so<00:00:00.400><c> today</c><00:00:00.800><c> we</c>\n\n"
+    "00:00:02.000 --> 00:00:02.010\nso today we\n\n"
+    "00:00:02.010 --> 00:00:04.000\nso today we\nare<c> talking</c><c> about</c> caching\n\n"
+    "00:00:04.000 --> 00:00:04.010\nare talking about caching\n\n"
+    "00:00:04.010 --> 00:00:06.000\nare talking about caching\nand why it matters\n"
+)
+
+
+def test_iter_cues_handles_crlf_and_extra_blank_lines() -> None:
+    """Parses SRT cues and their timings regardless of line endings and blank-line runs."""
+    srt = (
+        "1\r\n00:00:01,000 --> 00:00:03,500\r\nFirst <i>line</i>.\r\n\r\n\r\n"
+        "2\r\n01:00:04,000 --> 01:00:05,000\r\nSecond.\r\n"
+    )
+
+    cues = list(iter_cues(io.BytesIO(srt.encode("utf-8")), "srt"))
+
+    assert cues == [Cue(1.0, 3.5, "First line."), Cue(3604.0, 3605.0, "Second.")]
+
+
+def test_parse_timed_text_skips_vtt_header_and_notes() -> None:
+    """Skips the WebVTT header, NOTE blocks and cue identifiers, and accepts timings without hours."""
+    vtt = "WEBVTT\nKind: captions\n\nNOTE a comment\n\nintro\n00:01.000 --> 00:02.000\nHello &amp; welcome\n"
+
+    assert list(parse_timed_text([vtt])) == [Cue(1.0, 2.0, "Hello & welcome")]
+
+
+def test_merge_rolling_cues_removes_repeated_lines() -> None:
+    """Keeps only the new words of every rolling auto-caption cue."""
+    cues = list(merge_rolling_cues(iter_cues(io.BytesIO(ROLLING_VTT.encode("utf-8")), "vtt")))
+
+    assert [cue.text for cue in cues] == ["so today we", "are talking about caching", "and why it matters"]
+    assert [cue.start for cue in cues] == [0.0, 2.01, 4.01]
+
+
+def test_merge_rolling_cues_keeps_single_repeated_word() -> None:
+    """Does not treat a single word repeated across cue boundaries as rolling overlap."""
+    cues = [Cue(0, 1, "I think that"), Cue(1, 2, "that is right")]
+
+    assert [cue.text for cue in merge_rolling_cues(cues)] == ["I think that", "that is right"]
+
+
+def test_cues_to_text_keeps_cue_boundaries_and_pauses() -> None:
+    """Puts every cue on its own line and marks long pauses with a blank line."""
+    cues = [Cue(0, 1, "so today"), Cue(1.2, 2, "we talk"), Cue(5, 6, "next topic")]
+
+    assert cues_to_text(cues, pause_seconds=2) == "so today\nwe talk\n\nnext topic"
+
+
+def test_timed_transcript_maps_spans_to_times_and_chapters() -> None:
+    """Builds the same text as `cues_to_text` and describes chunks by their time and the chapters they cover."""
+    cues = [Cue(0, 1, "so today"), Cue(1.2, 2, "we talk"), Cue(65, 66, "next topic"), Cue(66, 70, "and more")]
+    chapters = [Chapter(60, 120, "Next"), Chapter(0, 60, "Intro")]
+    transcript = TimedTranscript.from_cues(cues, chapters, pause_seconds=2)
+
+    assert transcript.text == cues_to_text(cues, pause_seconds=2)
+    breaks = transcript.chapter_breaks()
+    assert breaks == [transcript.text.index("next topic")]
+    sections = transcript.sections([(0, breaks[0]), (breaks[0], len(transcript.text))])
+    assert [(section.start, section.end, section.titles) for section in sections] == [
+        (0, 2, ("Intro",)),
+        (65, 70, ("Next",)),
+    ]
+
+    restored = TimedTranscript.from_dict(transcript.text, transcript.to_dict())
+    assert restored.sections([section.span for section in sections]) == sections
+    assert TimedTranscript.from_text("no timing").sections([(0, 9)]) == []
@@ -1,10 +1,23 @@
+import asyncio
+import logging
 import os
+import threading
+import time
 from collections.abc import Generator
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
+from google.genai.errors import ClientError
 
 from ytsum.llms.gemini import Gemini
+from ytsum.llms.llm import LLM
+from ytsum.llms.tokenizer import CharRatioTokenCounter
+from ytsum.utils.cache import ChunkCache
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.utils.prompts.prompt_generators import generate_summary_prompt
+
+TRANSCRIPT = "A transcript too long for a single prompt."
 
 
 @pytest.fixture
@@ -31,3 +44,295 @@ def test_gemini_ask_success(mock_gemini_client: MagicMock) -> None:
 
     assert result == "This is a summary."
     mock_gemini_client.models.generate_content.assert_called_once()
+
+
+def test_gemini_token_count_uses_api_only_near_limit(mock_gemini_client: MagicMock, tmp_path: Path) -> None:
+    """Counts far-from-limit texts locally and calls the API, calibrating the counter, near the limit."""
+    counter = CharRatioTokenCounter("test-model", path=str(tmp_path / "ratios.json"))
+    llm = Gemini(max_tokens=100, token_counter=counter, count_margin=0.1)
+    mock_gemini_client.models.count_tokens.return_value.total_tokens = 80
+
+    assert llm.get_token_count("x" * 40) == 10
+    mock_gemini_client.models.count_tokens.assert_not_called()
+
+    assert llm.get_token_count("x" * 400) == 80
+    mock_gemini_client.models.count_tokens.assert_called_once()
+    assert counter.ratio > 4.0
+
+
+def test_gemini_ask_stream_yields_stripped_pieces(mock_gemini_client: MagicMock) -> None:
+    """Streams the response piece by piece without its surrounding whitespace."""
+    mock_gemini_client.models.generate_content_stream.return_value = iter(
+        [MagicMock(text="\n This is "), MagicMock(text="a summary. "), MagicMock(text="\n")]
+    )
+
+    pieces = list(Gemini().ask_stream("Test prompt"))
+
+    assert pieces == ["This is", " a summary."]
+
+
+def test_gemini_ask_with_preamble_uploads_it_once(mock_gemini_client: MagicMock) -> None:
+    """Caches a long preamble once and sends only the rest of each prompt, or whole prompts for short ones."""
+    mock_gemini_client.caches.create.return_value.name = "cachedContents/abc"
+    mock_gemini_client.models.generate_content.return_value = MagicMock(text="An answer.")
+    llm = Gemini(context_cache_min_tokens=10)
+    preamble = "Long instructions shared by every chunk.\n"
+
+    assert llm.ask_with_preamble(preamble + "chunk one", preamble) == "An answer."
+    llm.ask_with_preamble(preamble + "chunk two", preamble)
+    llm.ask_with_preamble("Short.\nchunk three", "Short.\n")
+
+    mock_gemini_client.caches.create.assert_called_once()
+    calls = mock_gemini_client.models.generate_content.call_args_list
+    assert [call.kwargs["contents"] for call in calls] == ["chunk one", "chunk two", "Short.\nchunk three"]
+    assert calls[0].kwargs["config"].cached_content == "cachedContents/abc"
+    assert calls[2].kwargs["config"] is None
+
+
+def test_gemini_context_cache_upload_is_shared_without_holding_the_lock(mock_gemini_client: MagicMock) -> None:
+    """Uploads a preamble once for concurrent requests, without holding the lock of the other caches meanwhile."""
+    uploading = threading.Event()
+    release = threading.Event()
+
+    def create(**kwargs: object) -> MagicMock:
+        uploading.set()
+        release.wait(5)
+        return MagicMock()
+
+    mock_gemini_client.caches.create.side_effect = create
+    llm = Gemini(context_cache_min_tokens=10)
+    preamble = "Long instructions shared by every chunk.\n"
+    threads = [threading.Thread(target=llm._get_context_cache, args=(preamble,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    assert uploading.wait(5)
+    assert llm._context_caches_lock.acquire(timeout=1)
+    llm._context_caches_lock.release()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    mock_gemini_client.caches.create.assert_called_once()
+    assert llm._context_caches[preamble] is not None
+
+
+def test_gemini_ask_with_preamble_counts_a_preamble_at_most_once(mock_gemini_client: MagicMock) -> None:
+    """Skips counting preambles with fewer characters than the token threshold and counts others only once."""
+    mock_gemini_client.models.generate_content.return_value = MagicMock(text="An answer.")
+    counter = MagicMock(count=MagicMock(return_value=5))
+    llm = Gemini(token_counter=counter, context_cache_min_tokens=10)
+    preamble = "Instructions shared by every chunk.\n"
+
+    llm.ask_with_preamble("Short.\nchunk one", "Short.\n")
+    llm.ask_with_preamble(preamble + "chunk two", preamble)
+    llm.ask_with_preamble(preamble + "chunk three", preamble)
+
+    counted = [call.args[0] for call in counter.count.call_args_list]
+    assert "Short.\n" not in counted
+    assert counted.count(preamble) == 1
+    mock_gemini_client.caches.create.assert_not_called()
+
+
+class FakeLLM(LLM):
+    """Minimal LLM for testing the map-reduce flow of `ask_prompt`."""
+
+    def __init__(self, chunk_cache: ChunkCache | None = None, fail_on: str | None = None):
+        """Initialize the fake with an optional chunk cache and a prompt fragment that makes `ask` fail."""
+        super().__init__(logging.getLogger(__name__), chunk_cache)
+        self.prompts: list[str] = []
+        self._fail_on = fail_on
+
+    def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """Record the prompt and answer with its last line."""
+        self.prompts.append(prompt)
+        if self._fail_on and self._fail_on in prompt:
+            raise RuntimeError("Quota exhausted")
+        return f"answer to {prompt.splitlines()[-1]}"
+
+    def get_token_count(self, text: str) -> int:
+        """Treat the original transcript as too long and everything else as fitting."""
+        return 10_000 if text == TRANSCRIPT else 1
+
+    def get_token_limit(self) -> int:
+        """Return a fixed token limit."""
+        return 1000
+
+    def get_model_name(self) -> str:
+        """Return a fixed model name."""
+        return "fake-model"
+
+
+@patch("ytsum.llms.llm.chunk_text", return_value=["chunk one", "chunk two", "chunk three"])
+def test_ask_prompt_resumes_from_cached_chunk_answers(mock_chunk_text: MagicMock, tmp_path: Path) -> None:
+    """Persists completed chunk answers so a re-run only sends the missing chunks and the reduce step."""
+    cache = ChunkCache(str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        FakeLLM(cache, fail_on="chunk two").ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    resumed = FakeLLM(cache)
+    result = resumed.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    assert len(resumed.prompts) == 2
+    assert resumed.prompts[0].endswith("\nchunk two")
+    assert result == "answer to answer to chunk three"
+
+
+@patch("ytsum.llms.llm.chunk_text", return_value=["chunk one", "chunk two"])
+def test_ask_prompt_refresh_answers_chunks_anew_and_caches_them(mock_chunk_text: MagicMock, tmp_path: Path) -> None:
+    """Skips cached chunk answers on a refresh, but still stores the new ones for a later resume."""
+    cache = ChunkCache(str(tmp_path))
+    FakeLLM(cache).ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    refreshed = FakeLLM(cache)
+    refreshed.ask_prompt(Prompt.SUMMARY, TRANSCRIPT, refresh=True)
+    asyncio.run(refreshed.ask_prompt_async(Prompt.SUMMARY, TRANSCRIPT, refresh=True))
+    resumed = FakeLLM(cache)
+    resumed.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    assert len(refreshed.prompts) == 2 * 3
+    assert len(resumed.prompts) == 1
+
+
+@patch("ytsum.llms.llm.chunk_text", return_value=["chunk one", "chunk two"])
+def test_ask_prompt_async_maps_and_reduces(mock_chunk_text: MagicMock) -> None:
+    """Answers every chunk concurrently and reduces the combined answers."""
+    llm = FakeLLM()
+
+    result = asyncio.run(llm.ask_prompt_async(Prompt.SUMMARY, TRANSCRIPT))
+
+    assert result == "answer to answer to chunk two"
+    assert len(llm.prompts) == 3
+
+
+def test_ask_prompt_async_answers_at_most_max_parallelism_chunks_at_a_time() -> None:
+    """Bounds the concurrent chunk requests of the async map stage as the blocking one does."""
+    llm = FakeLLM()
+    llm._max_parallelism = 2
+    in_flight: list[int] = [0, 0]
+
+    async def ask_async(prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return llm.ask(prompt)
+
+    with (
+        patch("ytsum.llms.llm.chunk_text", return_value=[f"chunk {i}" for i in range(6)]),
+        patch.object(llm, "ask_async", side_effect=ask_async),
+    ):
+        asyncio.run(llm.ask_prompt_async(Prompt.SUMMARY, TRANSCRIPT))
+
+    assert in_flight[1] == 2
+    assert len(llm.prompts) == 6 + 1
+
+
+def test_ask_async_holds_an_in_flight_slot_for_blocking_backends(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Bounds the blocking requests run in worker threads by `LLM_MAX_IN_FLIGHT`."""
+    monkeypatch.setenv("LLM_MAX_IN_FLIGHT", "2")
+    llm = FakeLLM()
+    lock = threading.Lock()
+    in_flight: list[int] = [0, 0]
+
+    def ask(prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return prompt
+
+    async def run() -> None:
+        await asyncio.gather(*(llm.ask_async(f"prompt {i}") for i in range(6)))
+
+    with patch.object(llm, "ask", side_effect=ask):
+        asyncio.run(run())
+
+    assert in_flight[1] == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_ask_prompt_reduces_more_if_the_final_prompt_is_over_the_limit(use_async: bool) -> None:
+    """Counts the final prompt exactly and reduces the partials further if only the estimate fits."""
+    llm = FakeLLM()
+    chunks = ["chunk one", "chunk two", "chunk three", "chunk four"]
+    merged = "\n\n".join(f"answer to {chunk}" for chunk in chunks)
+
+    def get_token_count(text: str) -> int:
+        return 10_000 if text == TRANSCRIPT or merged in text else 1
+
+    with (
+        patch("ytsum.llms.llm.chunk_text", return_value=chunks),
+        patch.object(llm, "get_token_count", side_effect=get_token_count),
+    ):
+        if use_async:
+            result = asyncio.run(llm.ask_prompt_async(Prompt.SUMMARY, TRANSCRIPT))
+        else:
+            result = llm.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    assert result == "answer to answer to answer to chunk four"
+    assert len(llm.prompts) == 4 + 2 + 1
+
+
+def test_ask_prompt_stream_async_maps_planned_spans() -> None:
+    """Answers the planned chunks concurrently and streams the final answer."""
+    llm = FakeLLM()
+
+    async def run() -> list[str]:
+        return [piece async for piece in llm.ask_prompt_stream_async(Prompt.SUMMARY, TRANSCRIPT, [(0, 12), (12, 42)])]
+
+    assert asyncio.run(run()) == ["answer to answer to too long for a single prompt."]
+    assert [prompt.splitlines()[-1] for prompt in llm.prompts[:2]] == ["A transcript", "too long for a single prompt."]
+
+
+@patch("ytsum.llms.gemini.time.sleep")
+def test_gemini_ask_retries_after_server_hint(mock_sleep: MagicMock, mock_gemini_client: MagicMock) -> None:
+    """Waits for the server's retry-after hint before retrying a request that hit the quota."""
+    error = ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "retryDelay": "3s"}})
+    mock_response = MagicMock(text="This is a summary.")
+    mock_gemini_client.models.generate_content.side_effect = [error, mock_response]
+
+    with (
+        patch("ytsum.llms.gemini.get_rate_limiter") as mock_get_rate_limiter,
+        patch("ytsum.llms.llm.get_rate_limiter", mock_get_rate_limiter),
+    ):
+        result = Gemini().ask("Test prompt")
+
+    assert result == "This is a summary."
+    assert 3 <= mock_sleep.call_args.args[0] <= 5
+    mock_get_rate_limiter.return_value.pause.assert_called_once_with(3.0)
+
+
+@patch("ytsum.llms.llm.chunk_text", return_value=["chunk one", "chunk two"])
+def test_ask_prompt_stream_reports_chunk_progress(mock_chunk_text: MagicMock) -> None:
+    """Reports every answered chunk before streaming the final answer."""
+    llm = FakeLLM()
+    progress: list[tuple[int, int]] = []
+
+    pieces = list(llm.ask_prompt_stream(Prompt.SUMMARY, TRANSCRIPT, lambda done, total: progress.append((done, total))))
+
+    assert pieces == ["answer to answer to chunk two"]
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_ask_prompt_tree_reduces_with_bounded_fan_in(caplog: pytest.LogCaptureFixture) -> None:
+    """Merges many chunk answers level by level in groups no larger than the fan-in."""
+    template_tokens = len(generate_summary_prompt("")) // 4
+    llm = FakeLLM()
+    llm._reduce_fan_in = 4
+    chunks = [f"chunk {i:02d}" for i in range(16)]
+
+    with (
+        patch("ytsum.llms.llm.chunk_text", return_value=chunks),
+        patch.object(llm, "get_token_limit", return_value=template_tokens + 25),
+        caplog.at_level(logging.INFO),
+    ):
+        llm.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    levels = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Reduce level")]
+    assert levels == ["Reduce level 1: merged 16 partials into 4.", "Reduce level 2: merged 4 partials into 2."]
+    assert len(llm.prompts) == 16 + 4 + 2 + 1
+    assert all(prompt.split("Transcription:\n")[1].count("\n\n") < 4 for prompt in llm.prompts)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import threading
+from collections.abc import Generator, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ytsum.llms.local import LocalLLM
+from ytsum.llms.openai_compatible import OpenAICompatible
+from ytsum.llms.registry import get_llm
+from ytsum.llms.segmenters import RegexSegmenter
+from ytsum.utils.prompts.prompt_factory import Prompt
+
+TRANSCRIPT = " ".join(f"Sentence number {i} of the transcript." for i in range(400))
+
+
+def test_get_llm_selects_backend_by_name_or_environment() -> None:
+    """Creates the named backend, falls back to LLM_BACKEND and rejects unknown names."""
+    with patch.dict(os.environ, {"LLM_BACKEND": "local"}):
+        assert isinstance(get_llm(), LocalLLM)
+    assert isinstance(get_llm("local"), LocalLLM)
+    with pytest.raises(ValueError, match="Unknown LLM backend"):
+        get_llm("missing")
+
+
+def test_local_llm_runs_map_reduce_deterministically() -> None:
+    """Splits a long transcript into chunks and gives the same answer on every run."""
+    first = LocalLLM(max_tokens=500, output_tokens=50, segmenter=RegexSegmenter())
+    second = LocalLLM(max_tokens=500, output_tokens=50, segmenter=RegexSegmenter())
+
+    answer = first.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+
+    assert answer == second.ask_prompt(Prompt.SUMMARY, TRANSCRIPT)
+    assert first.get_token_count(answer) <= 50
+    usage = first.get_usage()
+    assert usage["calls"] > 2
+    assert usage["input_tokens"] > first.get_token_count(TRANSCRIPT)
+
+
+@patch("ytsum.llms.local.time.sleep")
+def test_local_llm_retries_injected_quota_errors(mock_sleep: MagicMock) -> None:
+    """Retries simulated quota errors, honouring their retry-after hint."""
+    llm = LocalLLM(quota_error_rate=0.5, retry_after_seconds=3, model_name="local-quota-test")
+
+    answers = [llm.ask(f"Prompt {i}", max_retries=20) for i in range(20)]
+
+    assert len(answers) == 20
+    assert llm.get_usage()["quota_errors"] > 0
+    assert any(3 <= call.args[0] <= 5 for call in mock_sleep.call_args_list)
+
+
+def test_local_llm_rejects_prompts_over_its_token_limit() -> None:
+    """Raises before answering a prompt longer than the limit, as a real API would."""
+    llm = LocalLLM(max_tokens=10)
+
+    with pytest.raises(ValueError, match="exceeds the limit of 10 tokens"):
+        llm.ask("x" * 41)
+    with pytest.raises(ValueError, match="exceeds the limit of 10 tokens"):
+        list(llm.ask_stream("x" * 41))
+    with pytest.raises(ValueError, match="exceeds the limit of 10 tokens"):
+        asyncio.run(llm.ask_async("x" * 41))
+
+    assert llm.ask("x" * 40) == "x" * 40
+    assert llm.get_usage()["calls"] == 1
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible endpoint rejecting the first request with HTTP 429."""
+
+    requests: list[dict[str, Any]] = []
+
+    def do_POST(self) -> None:
+        """Answer a chat completion request, as a whole or as server-sent events."""
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(request)
+        if len(self.requests) == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "2")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.end_headers()
+        if request["stream"]:
+            for piece in (" Hello", " world"):
+                self.wfile.write(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            self.wfile.write(json.dumps({"choices": [{"message": {"content": " Hello world "}}]}).encode())
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def chat_server() -> Generator[str, None, None]:
+    """Fixture serving `ChatCompletionsHandler` on a free local port and yielding its base URL."""
+    ChatCompletionsHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+@patch("ytsum.llms.openai_compatible.time.sleep")
+def test_openai_compatible_retries_rate_limits_and_streams(mock_sleep: MagicMock, chat_server: str) -> None:
+    """Retries HTTP 429 after its Retry-After delay, then parses whole and streamed answers."""
+    with patch.dict(os.environ, {"OPENAI_MODEL_NAME": "test-model"}):
+        llm = OpenAICompatible(base_url=chat_server)
+
+    assert llm.ask("Test prompt") == "Hello world"
+    assert list(llm.ask_stream("Test prompt")) == ["Hello", " world"]
+    assert 2 <= mock_sleep.call_args_list[0].args[0] <= 4
+    assert ChatCompletionsHandler.requests[-1]["model"] == "test-model"
+    assert ChatCompletionsHandler.requests[-1]["messages"] == [{"role": "user", "content": "Test prompt"}]
+
+
+@patch("ytsum.llms.segmenters.STREAM_WINDOW_CHARS", 1000)
+def test_local_llm_maps_chunks_while_text_pieces_arrive() -> None:
+    """Submits the first chunk before the last piece is read and answers as for the whole text."""
+    sentences = [f"Sentence number {i} of the transcript." for i in range(400)]
+    consumed = []
+
+    def read_pieces() -> Iterator[str]:
+        for i, sentence in enumerate(sentences):
+            consumed.append(i)
+            yield sentence if i == 0 else f" {sentence}"
+
+    llm = LocalLLM(max_tokens=500, output_tokens=50, segmenter=RegexSegmenter())
+    consumed_at_calls = []
+
+    def ask(prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        consumed_at_calls.append(len(consumed))
+        return LocalLLM.ask(llm, prompt, max_retries, backoff_seconds)
+
+    with patch.object(llm, "ask", side_effect=ask):
+        answer = llm.ask_prompt(Prompt.SUMMARY, read_pieces())
+
+    assert consumed_at_calls[0] < len(sentences)
+    assert answer == LocalLLM(max_tokens=500, output_tokens=50, segmenter=RegexSegmenter()).ask_prompt(
+        Prompt.SUMMARY, TRANSCRIPT
+    )
@@ -0,0 +1,147 @@
+from unittest.mock import patch
+
+import pytest
+
+from ytsum.llms.utils import Partial, balance_chunks, ensure_nltk_resource, group_partials, pack_sentences
+
+
+def prompt(text: str) -> str:
+    """Prompt template with a fixed overhead of two words."""
+    return f"Summarize: {text}"
+
+
+def count_words(text: str) -> int:
+    """Count words as tokens."""
+    return len(text.split())
+
+
+def test_pack_sentences_fills_chunks_up_to_the_limit() -> None:
+    """Packs sentences greedily without any prompt exceeding the limit."""
+    sentences = [f"sentence number {i}." for i in range(100)]
+
+    chunks = pack_sentences(
+        sentences=sentences,
+        get_token_count=count_words,
+        max_tokens=20,
+        generate_prompt=prompt,
+        estimate_token_count=count_words,
+    )
+
+    assert " ".join(chunks) == " ".join(sentences)
+    assert all(count_words(prompt(chunk)) <= 20 for chunk in chunks)
+    assert len(chunks) == 17
+
+
+def test_pack_sentences_splits_oversized_sentence_at_words() -> None:
+    """Splits a sentence longer than the budget at word boundaries."""
+    sentence = " ".join(f"w{i}" for i in range(50))
+
+    chunks = pack_sentences(
+        sentences=[sentence],
+        get_token_count=count_words,
+        max_tokens=12,
+        generate_prompt=prompt,
+        estimate_token_count=count_words,
+    )
+
+    assert " ".join(chunks) == sentence
+    assert all(count_words(prompt(chunk)) <= 12 for chunk in chunks)
+
+
+def test_pack_sentences_bounds_exact_counts_when_estimates_are_low() -> None:
+    """Learns from oversized chunks so exact verifications stay bounded by the chunk count."""
+    calls = 0
+
+    def exact(text: str) -> int:
+        nonlocal calls
+        calls += 1
+        return 2 * count_words(text)
+
+    chunks = pack_sentences(
+        sentences=[f"sentence number {i}." for i in range(300)],
+        get_token_count=exact,
+        max_tokens=40,
+        generate_prompt=prompt,
+        estimate_token_count=count_words,
+    )
+
+    assert all(exact(prompt(chunk)) <= 40 for chunk in chunks)
+    assert calls <= 2 * len(chunks) + 3
+
+
+def test_pack_sentences_splits_chunks_still_over_the_limit_after_verifications() -> None:
+    """Splits a chunk by its exact count instead of yielding it over the limit once verifications run out."""
+    sentences = [f"sentence number {i}." for i in range(60)]
+
+    def exact(text: str) -> int:
+        return count_words(text) ** 2
+
+    chunks = pack_sentences(
+        sentences=sentences,
+        get_token_count=exact,
+        max_tokens=40,
+        generate_prompt=prompt,
+        estimate_token_count=count_words,
+        max_verifications=1,
+    )
+
+    assert " ".join(chunks) == " ".join(sentences)
+    assert all(exact(prompt(chunk)) <= 40 for chunk in chunks)
+
+
+def test_pack_sentences_rejects_template_over_limit() -> None:
+    """Raises when the prompt template alone does not fit."""
+    with pytest.raises(ValueError):
+        pack_sentences(
+            sentences=["text"],
+            get_token_count=count_words,
+            max_tokens=1,
+            generate_prompt=prompt,
+            estimate_token_count=count_words,
+        )
+
+
+def test_balance_chunks_cuts_at_nearby_chapters() -> None:
+    """Plans chunks of similar size that fit the limit, cover the text and move cuts to nearby chapter starts."""
+    cues = [f"cue {i} has five words" for i in range(60)]
+    text = "\n".join(cues)
+    breaks = [text.index(cue) for cue in cues]
+    chapter = breaks[22]
+
+    spans = balance_chunks(
+        text=text,
+        breaks=breaks,
+        preferred={chapter},
+        max_tokens=122,
+        generate_prompt=prompt,
+        estimate_token_count=count_words,
+    )
+
+    assert spans == [(0, chapter), (chapter, breaks[40]), (breaks[40], len(text))]
+    assert all(count_words(prompt(text[start:end])) <= 122 for start, end in spans)
+
+
+def test_group_partials_respects_fan_in_and_budget() -> None:
+    """Starts a new group when the fan-in or the token budget would be exceeded."""
+    partials = [Partial(f"p{i}", tokens) for i, tokens in enumerate([2, 2, 2, 2, 2, 9, 2])]
+
+    groups = group_partials(partials, fan_in=3, budget=10)
+
+    assert [[partial.text for partial in group] for group in groups] == [
+        ["p0", "p1", "p2"],
+        ["p3", "p4"],
+        ["p5"],
+        ["p6"],
+    ]
+
+
+def test_ensure_nltk_resource_skips_download_when_installed() -> None:
+    """Looks the resource up once and downloads nothing if it is already installed."""
+    ensure_nltk_resource.cache_clear()
+    with patch("nltk.data.find") as mock_find, patch("nltk.download") as mock_download:
+        ensure_nltk_resource("punkt_tab")
+        ensure_nltk_resource("punkt_tab")
+
+    mock_find.assert_called_once_with("tokenizers/punkt_tab")
+    mock_download.assert_not_called()
+    ensure_nltk_resource.cache_clear()
@@ -1,5 +1,9 @@
+import subprocess
+import sys
+import threading
 from argparse import Namespace
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from typing import Any
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
@@ -14,39 +18,52 @@ def mock_dependencies() -> Generator[dict[str, MagicMock], None, None]:
     with (
         patch("ytsum.__main__.get_args") as mock_get_args,
         patch("ytsum.__main__.configure_logging") as mock_configure_logging,
-        patch("ytsum.__main__.get_video_name") as mock_get_video_name,
-        patch("ytsum.__main__.get_video_subtitles") as mock_get_video_subtitles,
-        patch("ytsum.__main__.Gemini") as mock_gemini,
+        patch("ytsum.youtube.youtube_manager.get_video_name") as mock_get_video_name,
+        patch("ytsum.youtube.youtube_manager.stream_video_subtitles") as mock_stream_video_subtitles,
+        patch("ytsum.llms.registry.get_llm") as mock_get_llm,
     ):
 
         mock_get_video_name.return_value = "Test Video Title"
-        mock_get_video_subtitles.return_value = "some subtitle text"
+        mock_stream_video_subtitles.return_value = "some subtitle text"
 
-        mock_gemini_instance = MagicMock()
-        mock_gemini_instance.ask_prompt.return_value = "AI-generated summary."
-        mock_gemini.return_value = mock_gemini_instance
+        mock_llm = MagicMock()
+        mock_llm.get_model_name.return_value = "test-model"
+        mock_llm.ask_prompt.return_value = "AI-generated summary."
+        mock_get_llm.return_value = mock_llm
 
         yield {
             "get_args": mock_get_args,
             "configure_logging": mock_configure_logging,
             "get_video_name": mock_get_video_name,
-            "get_video_subtitles": mock_get_video_subtitles,
-            "Gemini": mock_gemini,
-            "gemini_instance": mock_gemini_instance,
+            "stream_video_subtitles": mock_stream_video_subtitles,
+            "get_llm": mock_get_llm,
+            "llm": mock_llm,
         }
 
 
 def test_main_prints_to_stdout_by_default(mock_dependencies: dict[str, MagicMock]) -> None:
     """Tests the default behavior of printing the summary to stdout."""
     video_url = "https://a.test.url"
-    mock_dependencies["get_args"].return_value = Namespace(url=video_url, output_file=None, verbose=False)
+    mock_dependencies["get_args"].return_value = Namespace(
+        url=video_url,
+        output_file=None,
+        verbose=False,
+        no_cache=True,
+        refresh=False,
+        stream=False,
+        progress=False,
+        backend="local",
+    )
 
     with patch("sys.stdout.write") as mock_stdout:
         main()
 
         mock_dependencies["configure_logging"].assert_called_once_with(False)
-        mock_dependencies["get_video_subtitles"].assert_called_once_with(video_url)
-        mock_dependencies["gemini_instance"].ask_prompt.assert_called_once_with(Prompt.SUMMARY, "some subtitle text")
+        mock_dependencies["stream_video_subtitles"].assert_called_once_with(video_url, None)
+        mock_dependencies["get_llm"].assert_called_once_with("local", chunk_cache=None)
+        mock_dependencies["llm"].ask_prompt.assert_called_once_with(
+            Prompt.SUMMARY, "some subtitle text", spans=None, refresh=False
+        )
         expected_output = "AI-generated summary.\n\nOriginal video: [**Test Video Title**](https://a.test.url)\n"
         mock_stdout.assert_called_once_with(expected_output)
 
@@ -55,7 +72,14 @@ def test_main_saves_to_output_file(mock_dependencies: dict[str, MagicMock]) -> N
     """Tests saving the summary to a file when --output-file is provided."""
     output_filename = "summary.md"
     mock_dependencies["get_args"].return_value = Namespace(
-        url="https://a.test.url", output_file=output_filename, verbose=True
+        url="https://a.test.url",
+        output_file=output_filename,
+        verbose=True,
+        no_cache=True,
+        refresh=False,
+        stream=False,
+        progress=False,
+        backend=None,
     )
 
     m = mock_open()
@@ -67,3 +91,73 @@ def test_main_saves_to_output_file(mock_dependencies: dict[str, MagicMock]) -> N
         handle = m()
         expected_output = "AI-generated summary.\n\nOriginal video: [**Test Video Title**](https://a.test.url)\n"
         handle.write.assert_called_once_with(expected_output)
+
+
+def test_main_streams_summary_to_stdout(mock_dependencies: dict[str, MagicMock]) -> None:
+    """Tests writing the summary piece by piece when --stream is provided."""
+    mock_dependencies["get_args"].return_value = Namespace(
+        url="https://a.test.url",
+        output_file=None,
+        verbose=False,
+        no_cache=True,
+        refresh=False,
+        stream=True,
+        progress=False,
+        backend=None,
+    )
+    mock_dependencies["llm"].ask_prompt_stream.return_value = iter(["AI-generated ", "summary."])
+
+    with patch("sys.stdout.write") as mock_stdout:
+        main()
+
+        mock_dependencies["llm"].ask_prompt.assert_not_called()
+        assert [call.args[0] for call in mock_stdout.call_args_list] == [
+            "AI-generated ",
+            "summary.",
+            "\n\nOriginal video: [**Test Video Title**](https://a.test.url)\n",
+        ]
+
+
+def test_main_overlaps_title_subtitles_and_backend_setup(mock_dependencies: dict[str, MagicMock]) -> None:
+    """Runs the independent steps concurrently and falls back to the URL when the title lookup fails."""
+    mock_dependencies["get_args"].return_value = Namespace(
+        url="https://a.test.url",
+        output_file=None,
+        verbose=False,
+        no_cache=True,
+        refresh=False,
+        stream=False,
+        progress=False,
+        backend=None,
+    )
+    # Each step waits until all three have started, so running them one after another breaks the barrier.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def after_barrier(result: Any) -> Callable[..., Any]:
+        def step(*args: Any, **kwargs: Any) -> Any:
+            barrier.wait()
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return step
+
+    mock_dependencies["get_video_name"].side_effect = after_barrier(RuntimeError("title lookup failed"))
+    mock_dependencies["stream_video_subtitles"].side_effect = after_barrier("some subtitle text")
+    mock_dependencies["get_llm"].side_effect = after_barrier(mock_dependencies["llm"])
+
+    with patch("sys.stdout.write") as mock_stdout:
+        main()
+
+        expected_output = "AI-generated summary.\n\nOriginal video: [**https://a.test.url**](https://a.test.url)\n"
+        mock_stdout.assert_called_once_with(expected_output)
+
+
+def test_cli_import_skips_heavy_dependencies() -> None:
+    """Importing the CLI entry points loads neither the API clients nor NLTK, keeping `--help` fast."""
+    code = (
+        "import sys, ytsum.__main__, ytsum.batch; print(sorted({'google.genai', 'yt_dlp', 'nltk'} & set(sys.modules)))"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert completed.stdout.strip() == "[]"
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from ytsum.batch import write_metrics
+from ytsum.llms.local import LocalLLM
+from ytsum.llms.segmenters import RegexSegmenter
+from ytsum.utils.metrics import Metrics, get_metrics, timed
+from ytsum.utils.prompts.prompt_factory import Prompt
+
+TRANSCRIPT = " ".join(f"Sentence number {i} of the transcript." for i in range(400))
+
+
+def test_metrics_report_spans_and_counters() -> None:
+    """Aggregates span durations and errors per span and labels, and sums counters per series."""
+    metrics = Metrics()
+    with metrics.span("llm_generate", model="test-model"):
+        pass
+    with pytest.raises(ValueError), metrics.span("llm_generate", model="test-model"):
+        raise ValueError("quota exhausted")
+    metrics.increment("llm_input_tokens_total", 100, model="test-model")
+    metrics.increment("llm_input_tokens_total", 20, model="test-model")
+
+    report = metrics.report()
+
+    span = report["spans"]['llm_generate{model="test-model"}']
+    assert (span["count"], span["errors"]) == (2, 1)
+    assert span["max_seconds"] <= span["total_seconds"]
+    assert report["counters"]['llm_input_tokens_total{model="test-model"}'] == 120
+
+
+def test_metrics_export_prometheus_histograms() -> None:
+    """Writes cumulative buckets, sum and count for every histogram series, and escapes label values."""
+    metrics = Metrics()
+    metrics.observe("span_duration_seconds", 0.2, span="chunk_text")
+    metrics.observe("span_duration_seconds", 1000, span="chunk_text")
+    metrics.increment("llm_requests_total", model='quoted "model"')
+
+    lines = metrics.to_prometheus().splitlines()
+
+    assert "# TYPE ytsum_span_duration_seconds histogram" in lines
+    assert 'ytsum_span_duration_seconds_bucket{span="chunk_text",le="0.1"} 0' in lines
+    assert 'ytsum_span_duration_seconds_bucket{span="chunk_text",le="0.25"} 1' in lines
+    assert 'ytsum_span_duration_seconds_bucket{span="chunk_text",le="+Inf"} 2' in lines
+    assert 'ytsum_span_duration_seconds_count{span="chunk_text"} 2' in lines
+    assert 'ytsum_llm_requests_total{model="quoted \\"model\\""} 1' in lines
+
+
+def test_llm_pipeline_records_stages_and_tokens(tmp_path: Path) -> None:
+    """Records chunking and generation spans and token counts of a map-reduce summary, and writes them out."""
+    metrics = Metrics()
+    llm = LocalLLM(max_tokens=500, output_tokens=50, segmenter=RegexSegmenter(), model_name="metrics-test")
+
+    with patch("ytsum.utils.metrics._metrics", metrics):
+        timed("outer")(llm.ask_prompt)(Prompt.SUMMARY, TRANSCRIPT)
+        assert get_metrics() is metrics
+        write_metrics(str(tmp_path / "report.json"), str(tmp_path / "metrics.prom"))
+
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    usage = llm.get_usage()
+    assert report["spans"]["outer"]["count"] == 1
+    assert report["spans"]["chunk_text"]["count"] >= 1
+    assert report["spans"]['llm_generate{model="metrics-test"}']["count"] == usage["calls"]
+    assert report["counters"]['llm_input_tokens_total{model="metrics-test"}'] == usage["input_tokens"]
+    assert report["counters"]['llm_output_tokens_total{model="metrics-test"}'] == usage["output_tokens"]
+    assert 'ytsum_llm_requests_total{model="metrics-test"}' in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+from ytsum.llms.local import LocalLLM
+from ytsum.llms.optimizer import LatencyStats, choose_parallelism, get_latency_stats, plan_map
+from ytsum.llms.rate_limiter import RateLimiter
+from ytsum.utils.prompts.prompt_factory import Prompt
+
+
+def make_stats() -> LatencyStats:
+    """Statistics of a model answering in one second plus one second per 1000 input tokens."""
+    stats = LatencyStats()
+    for tokens in (1000, 3000, 6000, 2000):
+        stats.observe(tokens, 200, 1 + tokens / 1000)
+    return stats
+
+
+def test_latency_stats_fit_fixed_and_per_token_cost() -> None:
+    """Separates the fixed cost of a request from its cost per input token."""
+    fixed, per_token = make_stats().fit()
+
+    assert fixed == pytest.approx(1.0)
+    assert per_token == pytest.approx(0.001)
+
+
+def test_local_llm_records_latency_of_its_answers() -> None:
+    """Feeds the latency of every answered request to the model's statistics."""
+    llm = LocalLLM(model_name="local-latency-test")
+
+    llm.ask("Some prompt.")
+    list(llm.ask_stream("Some prompt."))
+
+    stats = get_latency_stats("local-latency-test")
+    assert stats.samples == 2
+    assert stats.time_to_first_token is not None
+
+
+def test_latency_stats_persist_across_runs(tmp_path: Path) -> None:
+    """Loads the statistics a model learned in an earlier run, kept apart from those of other models."""
+    path = str(tmp_path / "latency.json")
+    stats = LatencyStats("model-a", path)
+    for tokens in (1000, 3000, 6000):
+        stats.observe(tokens, 200, 1 + tokens / 1000)
+
+    reloaded = LatencyStats("model-a", path)
+
+    assert reloaded.samples == 3
+    assert reloaded.fit() == pytest.approx(stats.fit())
+    assert LatencyStats("model-b", path).samples == 0
+
+
+def test_plan_map_adapts_parallelism_but_not_chunks() -> None:
+    """Keeps the planned chunks whatever the statistics, and prices the job once they are known."""
+    settings = {"chunk_count": 4, "prompt_tokens": 5500, "template_tokens": 150, "max_tokens": 6000, "fan_in": 4}
+
+    cold = plan_map(**settings, max_parallelism=8, stats=None, rate_limiter=RateLimiter())
+    warm = plan_map(**settings, max_parallelism=8, stats=make_stats(), rate_limiter=RateLimiter())
+    narrow = plan_map(**settings, max_parallelism=2, stats=make_stats(), rate_limiter=RateLimiter())
+
+    assert (cold.chunks, cold.parallelism, cold.expected_seconds) == (4, 4, 0.0)
+    assert (warm.chunks, warm.parallelism) == (4, 4)
+    assert (narrow.chunks, narrow.parallelism) == (4, 2)
+    assert narrow.expected_seconds > warm.expected_seconds > 0
+
+
+def test_choose_parallelism_respects_rate_limit_headroom() -> None:
+    """Answers no more chunks at once than the remaining request quota admits."""
+    limiter = RateLimiter(requests_per_minute=10)
+    for _ in range(8):
+        limiter.reserve(tokens=1)
+
+    parallelism = choose_parallelism(
+        chunk_count=8, prompt_tokens=5000, max_parallelism=8, stats=make_stats(), rate_limiter=limiter
+    )
+
+    assert parallelism == 2
+
+
+def test_plan_chunks_does_not_depend_on_latency_statistics() -> None:
+    """Splits a text the same way before and after the model's latency is known, so cached chunks stay valid."""
+    llm = LocalLLM(max_tokens=400, model_name="local-chunking-test")
+    text = "".join(f"Sentence number {index} of the talk. " for index in range(200))
+    breaks = [index for index in range(1, len(text)) if text[index - 1] == " " and text[index - 2] == "."]
+    cold = llm.plan_chunks(Prompt.SUMMARY, text, breaks)
+
+    stats = get_latency_stats("local-chunking-test")
+    for tokens in (100, 200, 400, 300):
+        stats.observe(tokens, 50, 1 + tokens / 100)
+
+    assert llm.plan_chunks(Prompt.SUMMARY, text, breaks) == cold
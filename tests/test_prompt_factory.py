@@ -1,7 +1,12 @@
-from ytsum.utils.prompts.prompt_factory import Prompt, get_prompt_generator
+from ytsum.utils.prompts.prompt_factory import Prompt, get_prompt_generator, get_prompt_preamble
 from ytsum.utils.prompts.prompt_generators import generate_summary_prompt
 
 
 def test_get_prompt_generator_summary() -> None:
     """Returns summary generator for SUMMARY."""
     assert get_prompt_generator(Prompt.SUMMARY) is generate_summary_prompt
+
+
+def test_get_prompt_preamble_summary() -> None:
+    """Returns the fixed start of every summary prompt, followed by the text."""
+    assert generate_summary_prompt("some text") == get_prompt_preamble(Prompt.SUMMARY) + "some text"
@@ -0,0 +1,51 @@
+import pytest
+from google.genai.errors import ClientError
+
+from ytsum.llms.rate_limiter import RateLimiter, backoff_delay, get_retry_after, is_quota_error
+
+QUOTA_ERROR = ClientError(
+    429,
+    {
+        "error": {
+            "code": 429,
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "37s"}],
+        }
+    },
+)
+
+
+def test_rate_limiter_spreads_requests_over_the_minute() -> None:
+    """Admits a full bucket immediately and staggers the following requests at the configured rate."""
+    limiter = RateLimiter(requests_per_minute=60)
+
+    delays = [limiter.reserve(tokens=1) for _ in range(63)]
+
+    assert delays[:60] == [0.0] * 60
+    assert delays[60:] == pytest.approx([1.0, 2.0, 3.0], abs=0.05)
+
+
+def test_rate_limiter_enforces_token_quota_and_pauses() -> None:
+    """Delays requests exceeding the token quota and holds everything back during a pause."""
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    assert limiter.reserve(tokens=600) == 0.0
+    assert limiter.reserve(tokens=60) == pytest.approx(6.0, abs=0.05)
+    assert limiter.headroom() == 0.0
+
+    unlimited = RateLimiter()
+    unlimited.pause(10)
+    assert unlimited.reserve(tokens=1) == pytest.approx(10.0, abs=0.05)
+
+
+def test_get_retry_after_reads_google_retry_info() -> None:
+    """Extracts the retry delay from a quota error's details."""
+    assert is_quota_error(QUOTA_ERROR)
+    assert get_retry_after(QUOTA_ERROR) == 37.0
+    assert get_retry_after(ClientError(400, {"error": {"code": 400}})) is None
+
+
+def test_backoff_delay_is_jittered_and_capped() -> None:
+    """Keeps exponential backoff within its cap and adds only a small jitter to server hints."""
+    assert all(0 <= backoff_delay(attempt, 30) <= 30 for attempt in range(1, 10))
+    assert 37 <= backoff_delay(1, 30, retry_after=37) <= 39
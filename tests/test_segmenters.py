@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+import pytest
+
+from ytsum.llms.segmenters import RegexSegmenter, get_segmenter
+from ytsum.llms.utils import chunk_text
+
+
+def test_regex_segmenter_splits_after_sentence_punctuation() -> None:
+    """Splits after sentence-ending punctuation, keeping closing quotes with their sentence."""
+    segments = RegexSegmenter().split('He said "stop." Then what? It ended!\nNext line')
+
+    assert segments == ['He said "stop."', "Then what?", "It ended!", "Next line"]
+
+
+def test_regex_segmenter_falls_back_to_pauses_and_cues() -> None:
+    """Splits unpunctuated captions at pauses first, then packs cue lines up to the length limit."""
+    text = "so today we\nare talking about\ncaching and why\n\nit matters a lot\nfor latency"
+
+    segments = RegexSegmenter(max_chars=30).split(text)
+
+    assert segments == ["so today we\nare talking about", "caching and why", "it matters a lot\nfor latency"]
+
+
+def test_regex_segmenter_splits_long_lines_between_words() -> None:
+    """Splits a single line without punctuation or breaks between words."""
+    segments = RegexSegmenter(max_chars=10).split("one two three four five")
+
+    assert segments == ["one two", "three four", "five"]
+    assert all(len(segment) <= 10 for segment in segments)
+
+
+def test_get_segmenter_rejects_unknown_name() -> None:
+    """Raises a ValueError naming the available segmenters."""
+    with pytest.raises(ValueError, match="nltk, regex"):
+        get_segmenter("missing")
+
+
+def test_chunk_text_with_regex_segmenter_balances_unpunctuated_captions() -> None:
+    """Chunks unpunctuated captions at cue boundaries without exceeding the token limit."""
+    text = "\n".join(f"caption line number {i} without any punctuation" for i in range(200))
+
+    chunks = chunk_text(
+        text=text,
+        get_token_count=lambda prompt: len(prompt.split()),
+        max_tokens=300,
+        generate_prompt=lambda chunk: f"Summarize: {chunk}",
+        estimate_token_count=lambda prompt: len(prompt.split()),
+        segmenter=RegexSegmenter(),
+    )
+
+    assert all(len(chunk.split()) + 1 <= 300 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+    assert all(chunk.split()[0] == "caption" for chunk in chunks)
+
+
+@patch("ytsum.llms.segmenters.STREAM_WINDOW_CHARS", 50)
+def test_iter_segments_stream_matches_whole_text_across_piece_boundaries() -> None:
+    """Yields the segments of the whole text, even when pieces split words and sentences."""
+    text = "First sentence here. Second one follows!\nA third line without punctuation " * 20
+    pieces = [text[i : i + 7] for i in range(0, len(text), 7)]
+    segmenter = RegexSegmenter(max_chars=40)
+
+    segments = list(segmenter.iter_segments_stream(pieces))
+
+    assert segments == list(segmenter.iter_segments(text))
+    assert all(len(segment) <= 40 for segment in segments)
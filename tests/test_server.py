@@ -0,0 +1,188 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Generator
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ytsum.server import QueueFullError, SummaryServer
+from ytsum.utils.metrics import Metrics
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import TimedTranscript
+
+URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+
+@pytest.fixture
+def mock_stages() -> Generator[dict[str, MagicMock], None, None]:
+    """Fixture to mock the title and subtitle lookups of the server."""
+    with (
+        patch("ytsum.server.get_video_name") as mock_get_video_name,
+        patch("ytsum.server.get_video_transcript") as mock_get_video_transcript,
+    ):
+        mock_get_video_name.side_effect = lambda url, store: f"Title of {url[-11:]}"
+        mock_get_video_transcript.return_value = TimedTranscript.from_text("some subtitle text")
+        yield {"get_video_name": mock_get_video_name, "get_video_transcript": mock_get_video_transcript}
+
+
+async def stream_pieces(*pieces: str) -> AsyncIterator[str]:
+    """Yield the pieces of a mocked summary."""
+    for piece in pieces:
+        yield piece
+
+
+async def request(server: SummaryServer, method: str, path: str, payload: Any = None) -> tuple[int, bytes]:
+    """Send one HTTP request over a loopback connection and return the status and raw body."""
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), body
+
+
+def test_server_deduplicates_in_flight_jobs_and_serves_results(mock_stages: dict[str, MagicMock]) -> None:
+    """Joins identical submissions into one job and returns its summary once done."""
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt_stream_async.side_effect = lambda *args: stream_pieces("AI-generated ", "summary.")
+
+    async def run() -> tuple[Any, ...]:
+        server = SummaryServer(llm, workers=1)
+        first_status, first = await request(server, "POST", "/jobs", {"url": URL})
+        second_status, second = await request(server, "POST", "/jobs", {"url": URL})
+        server.start()
+        job = server.get_job(json.loads(first)["id"])
+        assert job is not None
+        while not job.done:
+            await asyncio.sleep(0.01)
+        _, polled = await request(server, "GET", f"/jobs/{job.id}")
+        await server.stop()
+        return first_status, json.loads(first), second_status, json.loads(second), json.loads(polled)
+
+    first_status, first, second_status, second, polled = asyncio.run(run())
+
+    assert first_status == second_status == 202
+    assert second["id"] == first["id"]
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert polled["status"] == "done"
+    assert polled["summary"] == f"AI-generated summary.\n\nOriginal video: [**Title of aaaaaaaaaaa**]({URL})\n"
+    llm.ask_prompt_stream_async.assert_called_once()
+
+
+def test_server_never_joins_an_in_flight_job_on_refresh(mock_stages: dict[str, MagicMock]) -> None:
+    """Queues a new job for a refresh, which later submissions of the same video then join."""
+
+    async def run() -> None:
+        server = SummaryServer(MagicMock())
+        queued, _ = server.submit(URL)
+        refreshed, created = server.submit(URL, refresh=True)
+        joined, joined_created = server.submit(URL)
+
+        assert created and refreshed is not queued and refreshed.refresh
+        assert joined is refreshed and not joined_created
+
+    asyncio.run(run())
+
+
+def test_server_streams_summary_while_it_is_written(mock_stages: dict[str, MagicMock]) -> None:
+    """Streams every piece of the summary as a chunk, followed by the link to the video."""
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+
+    async def run() -> tuple[int, bytes]:
+        release = asyncio.Event()
+
+        async def stream(*args: Any) -> AsyncIterator[str]:
+            yield "AI-generated "
+            await release.wait()
+            yield "summary."
+
+        llm.ask_prompt_stream_async.side_effect = stream
+        server = SummaryServer(llm)
+        server.start()
+        job, _ = server.submit(URL)
+        while not job.pieces:
+            await asyncio.sleep(0.01)
+        streamed = asyncio.create_task(request(server, "GET", f"/jobs/{job.id}/stream"))
+        await asyncio.sleep(0.05)
+        release.set()
+        result = await streamed
+        await server.stop()
+        return result
+
+    status, body = asyncio.run(run())
+
+    chunks = []
+    while body:
+        size, _, body = body.partition(b"\r\n")
+        chunks.append(body[: int(size, 16)].decode())
+        body = body[int(size, 16) + 2 :]
+    assert status == 200
+    assert chunks == ["AI-generated ", "summary.", f"\n\nOriginal video: [**Title of aaaaaaaaaaa**]({URL})\n", ""]
+
+
+def test_server_rejects_jobs_when_the_queue_is_full(mock_stages: dict[str, MagicMock]) -> None:
+    """Raises QueueFullError for a new video once the queue holds `queue_size` jobs, and reports 503 over HTTP."""
+
+    async def run() -> int:
+        server = SummaryServer(MagicMock(), queue_size=1)
+        server.submit(URL)
+        with pytest.raises(QueueFullError):
+            server.submit("https://www.youtube.com/watch?v=bbbbbbbbbbb")
+        status, _ = await request(server, "POST", "/jobs", {"url": "https://www.youtube.com/watch?v=ccccccccccc"})
+        return status
+
+    assert asyncio.run(run()) == 503
+
+
+def test_server_reports_failed_jobs_and_bad_requests(mock_stages: dict[str, MagicMock]) -> None:
+    """Marks jobs without subtitles as failed and rejects malformed submissions and unknown jobs."""
+    mock_stages["get_video_transcript"].return_value = None
+
+    async def run() -> tuple[Any, ...]:
+        server = SummaryServer(MagicMock())
+        server.start()
+        job, _ = server.submit(URL)
+        while not job.done:
+            await asyncio.sleep(0.01)
+        bad_status, _ = await request(server, "POST", "/jobs", {"link": URL})
+        missing_status, _ = await request(server, "GET", "/jobs/unknown")
+        await server.stop()
+        return job.to_dict(), bad_status, missing_status
+
+    job, bad_status, missing_status = asyncio.run(run())
+
+    assert job["status"] == "failed"
+    assert "Failed to retrieve subtitles" in job["error"]
+    assert (bad_status, missing_status) == (400, 404)
+
+
+def test_server_exports_metrics(mock_stages: dict[str, MagicMock]) -> None:
+    """Serves the job span in the Prometheus format and in the JSON report."""
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt_stream_async.side_effect = lambda *args: stream_pieces("AI-generated summary.")
+
+    async def run() -> tuple[bytes, dict[str, Any]]:
+        server = SummaryServer(llm, workers=1)
+        server.start()
+        job, _ = server.submit(URL, Prompt.SUMMARY, False)
+        while not job.done:
+            await asyncio.sleep(0.01)
+        _, metrics = await request(server, "GET", "/metrics")
+        _, report = await request(server, "GET", "/report")
+        await server.stop()
+        return metrics, json.loads(report)
+
+    with patch("ytsum.utils.metrics._metrics", Metrics()):
+        metrics, report = asyncio.run(run())
+
+    assert b'ytsum_span_duration_seconds_count{span="job"} 1' in metrics
+    assert report["spans"]["job"]["count"] == 1
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ytsum.utils.cache import summarize_transcript
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.utils.single_flight import FileSingleFlight, SingleFlight
+from ytsum.youtube.captions import TimedTranscript
+from ytsum.youtube.transcript_store import TranscriptStore
+from ytsum.youtube.youtube_manager import get_video_transcript
+
+
+class CountingFlight(SingleFlight[str]):
+    """Single flight counting the callers that have joined, so tests can wait for all of them."""
+
+    def __init__(self) -> None:
+        """Initialize the flight with no callers."""
+        super().__init__()
+        self.joined = 0
+        self._count_lock = threading.Lock()
+
+    def join(self, key: str) -> tuple["Future[str]", bool]:
+        """Join the computation and count the caller."""
+        result = super().join(key)
+        with self._count_lock:
+            self.joined += 1
+        return result
+
+
+def test_single_flight_shares_one_computation_between_concurrent_callers() -> None:
+    """Runs the computation once for callers arriving while it is in flight, and again once it finished."""
+    flight = CountingFlight()
+    release = threading.Event()
+    calls = 0
+
+    def compute() -> str:
+        nonlocal calls
+        calls += 1
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", compute) for _ in range(4)]
+        while flight.joined < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["result"] * 4
+    assert calls == 1
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_single_flight_raises_the_leaders_error_in_followers() -> None:
+    """Hands the leader's exception to every caller that joined it."""
+    flight: SingleFlight[int] = SingleFlight()
+    future, leader = flight.join("key")
+    follower, follower_is_leader = flight.join("key")
+
+    flight.set_exception("key", future, RuntimeError("quota exhausted"))
+
+    assert (leader, follower_is_leader) == (True, False)
+    with pytest.raises(RuntimeError, match="quota exhausted"):
+        follower.result()
+    assert flight.join("key")[1]
+
+
+def test_file_single_flight_serializes_leaders_across_instances(tmp_path: Path) -> None:
+    """Makes a leader of another flight, as in another process, wait for the file lock of the same key."""
+    first: FileSingleFlight[int] = FileSingleFlight(str(tmp_path))
+    second: FileSingleFlight[int] = FileSingleFlight(str(tmp_path))
+    events: list[str] = []
+
+    def wait_for_lock() -> None:
+        with second.leader_lock("key"):
+            events.append("second")
+
+    with first.leader_lock("key"):
+        waiter = threading.Thread(target=wait_for_lock)
+        waiter.start()
+        time.sleep(0.05)
+        events.append("first")
+    waiter.join(5)
+
+    assert events == ["first", "second"]
+
+
+def test_summarize_transcript_coalesces_concurrent_calls() -> None:
+    """Calls the LLM once for concurrent summaries of the same transcript, model and prompt."""
+    release = threading.Event()
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.side_effect = (
+        lambda prompt_type, text, spans=None, refresh=False: release.wait(5) and "AI-generated summary."
+    )
+
+    flight = CountingFlight()
+
+    with ThreadPoolExecutor(4) as pool, patch("ytsum.utils.cache.get_single_flight", return_value=flight):
+        futures = [pool.submit(summarize_transcript, llm, Prompt.SUMMARY, "some subtitle text") for _ in range(4)]
+        while flight.joined < 4:
+            time.sleep(0.01)
+        release.set()
+        summaries = [future.result() for future in futures]
+
+    assert summaries == ["AI-generated summary."] * 4
+    llm.ask_prompt.assert_called_once()
+
+
+def test_summarize_transcript_refresh_does_not_join_a_plain_call() -> None:
+    """Runs a refresh on its own, as a concurrent plain call may return the cached summary."""
+    release = threading.Event()
+    llm = MagicMock()
+    llm.get_model_name.return_value = "test-model"
+    llm.ask_prompt.side_effect = (
+        lambda prompt_type, text, spans=None, refresh=False: release.wait(5) and f"Summary, refresh={refresh}."
+    )
+
+    flight = CountingFlight()
+
+    with ThreadPoolExecutor(2) as pool, patch("ytsum.utils.cache.get_single_flight", return_value=flight):
+        futures = [
+            pool.submit(summarize_transcript, llm, Prompt.SUMMARY, "some subtitle text", refresh=refresh)
+            for refresh in (False, True)
+        ]
+        while flight.joined < 2:
+            time.sleep(0.01)
+        release.set()
+        summaries = [future.result() for future in futures]
+
+    assert summaries == ["Summary, refresh=False.", "Summary, refresh=True."]
+    assert llm.ask_prompt.call_count == 2
+
+
+def test_get_video_transcript_does_not_join_a_download_into_another_store(tmp_path: Path) -> None:
+    """Downloads once per store, as only the leader's store receives the transcript of a shared download."""
+    release = threading.Event()
+    stores = [
+        TranscriptStore(str(tmp_path / "a")),
+        TranscriptStore(str(tmp_path / "a")),
+        TranscriptStore(str(tmp_path / "b")),
+    ]
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    def download(youtube_url: str, store: TranscriptStore | None) -> TimedTranscript:
+        release.wait(5)
+        return TimedTranscript.from_text("Subtitles.")
+
+    flight = CountingFlight()
+
+    with (
+        ThreadPoolExecutor(3) as pool,
+        patch("ytsum.youtube.youtube_manager.get_single_flight", return_value=flight),
+        patch("ytsum.youtube.youtube_manager._download_subtitles", side_effect=download) as mock_download,
+    ):
+        futures = [pool.submit(get_video_transcript, url, store) for store in stores]
+        while flight.joined < 3:
+            time.sleep(0.01)
+        release.set()
+        transcripts = [future.result() for future in futures]
+
+    assert [transcript.text if transcript else None for transcript in transcripts] == ["Subtitles."] * 3
+    assert sorted(call.args[1].index_path for call in mock_download.call_args_list) == [
+        stores[0].index_path,
+        stores[2].index_path,
+    ]
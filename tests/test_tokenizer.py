@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from ytsum.llms.tokenizer import CharRatioTokenCounter
+
+
+def test_char_ratio_token_counter_learns_and_persists_ratio(tmp_path: Path) -> None:
+    """Moves the ratio towards calibration samples and restores it in a new instance."""
+    path = str(tmp_path / "ratios.json")
+    counter = CharRatioTokenCounter("model-a", path=path)
+    assert counter.count("x" * 40) == 10
+
+    for _ in range(20):
+        counter.calibrate("x" * 300, 100)
+
+    assert abs(counter.ratio - 3.0) < 0.1
+    assert CharRatioTokenCounter("model-a", path=path).ratio == counter.ratio
+    assert CharRatioTokenCounter("model-b", path=path).ratio == 4.0
+
+
+def test_char_ratio_token_counter_empty_text(tmp_path: Path) -> None:
+    """Counts no tokens in empty text."""
+    assert CharRatioTokenCounter("model", path=str(tmp_path / "ratios.json")).count("") == 0
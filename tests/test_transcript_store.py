@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from ytsum.youtube.captions import Chapter, Cue, TimedTranscript
+from ytsum.youtube.transcript_store import TranscriptStore
+
+
+def test_transcript_store_round_trip(tmp_path: Path) -> None:
+    """Stores a transcript with its metadata and reads both back from a fresh store instance."""
+    TranscriptStore(str(tmp_path)).put("abcdefghijk", "some subtitle text", "Title", 61.0, "en", "official")
+
+    store = TranscriptStore(str(tmp_path))
+    entry = store.get_entry("abcdefghijk")
+
+    assert entry is not None
+    assert (entry.title, entry.duration, entry.language, entry.source) == ("Title", 61.0, "en", "official")
+    assert not store.is_stale(entry)
+    assert store.read_transcript("abcdefghijk") == "some subtitle text"
+    assert store.get_entry("missing0000") is None
+
+
+def test_transcript_store_keeps_cue_timing(tmp_path: Path) -> None:
+    """Saves the cue timing of a transcript next to it and drops it when a transcript without timing replaces it."""
+    transcript = TimedTranscript.from_cues([Cue(0, 1, "Hello."), Cue(30, 31, "Next.")], [Chapter(30, 60, "Next")])
+    store = TranscriptStore(str(tmp_path))
+    store.put("abcdefghijk", transcript, "Title", 61.0, "en", "official")
+
+    restored = TranscriptStore(str(tmp_path)).read_timed_transcript("abcdefghijk")
+
+    assert restored is not None
+    assert (restored.text, restored.to_dict()) == (transcript.text, transcript.to_dict())
+    store.put("abcdefghijk", "Hello. Next.", "Title", 61.0, "en", "official")
+    plain = store.read_timed_transcript("abcdefghijk")
+    assert plain is not None and plain.cue_count == 0
+
+
+def test_transcript_store_marks_old_entries_stale(tmp_path: Path) -> None:
+    """Reports entries older than the TTL as stale until they are revalidated with the current metadata."""
+    store = TranscriptStore(str(tmp_path), ttl_seconds=60)
+    store.put("abcdefghijk", "text", "Title", None, "en", "automatic")
+    entry = store.get_entry("abcdefghijk")
+    assert entry is not None
+    entry.fetched_at = time.time() - 120
+
+    assert store.is_stale(entry)
+    store.revalidate("abcdefghijk", "Renamed", 212)
+    assert not store.is_stale(entry)
+    assert entry.title == "Renamed" and entry.duration == 212
+
+
+def test_transcript_store_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Evicts the least recently read transcript once the size limit is exceeded."""
+    store = TranscriptStore(str(tmp_path), max_bytes=10)
+    store.put("aaaaaaaaaaa", "first", "A", None, "en", "official")
+    store.put("bbbbbbbbbbb", "other", "B", None, "en", "official")
+    os.utime(tmp_path / "bbbbbbbbbbb.txt", (time.time() - 60, time.time()))
+    assert store.read_transcript("aaaaaaaaaaa") == "first"
+
+    store.put("ccccccccccc", "third", "C", None, "en", "official")
+
+    assert store.get_entry("bbbbbbbbbbb") is None
+    assert not (tmp_path / "bbbbbbbbbbb.txt").exists()
+    assert store.get_entry("aaaaaaaaaaa") is not None
+    assert store.get_entry("ccccccccccc") is not None
+
+
+def test_transcript_store_keeps_entries_written_concurrently_by_other_processes(tmp_path: Path) -> None:
+    """Loses no entry when stores without a shared in-process lock, as in separate processes, write together."""
+    stores = [TranscriptStore(str(tmp_path)), TranscriptStore(str(tmp_path))]
+
+    def put_all(store: TranscriptStore, prefix: str) -> None:
+        for i in range(30):
+            store.put(f"{prefix}{i}", "text", title="", duration=None, language="en", source="official")
+
+    writers = [
+        threading.Thread(target=put_all, args=(store, prefix)) for store, prefix in zip(stores, "ab", strict=True)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(10)
+
+    reader = TranscriptStore(str(tmp_path))
+    assert all(reader.get_entry(f"{prefix}{i}") is not None for prefix in "ab" for i in range(30))
@@ -1,12 +1,33 @@
 # tests/test_youtube_manager.py
+import io
+from collections.abc import Generator
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
 import yt_dlp
 
-from ytsum.youtube.youtube_manager import get_video_name, get_video_subtitles
+from ytsum.youtube import youtube_manager
+from ytsum.youtube.captions import TimedTranscript
+from ytsum.youtube.transcript_store import TranscriptStore
+from ytsum.youtube.youtube_manager import (
+    SubtitleStream,
+    get_video_info,
+    get_video_name,
+    get_video_subtitles,
+    stream_video_subtitles,
+)
 
 YOUTUBE_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+VTT_CONTENT = "WEBVTT\nKind: captions\n\n00:00:01.000 --> 00:00:03.000 align:start\nOfficial <c>subtitles.</c>\n"
+
+
+@pytest.fixture(autouse=True)
+def clear_info_cache() -> Generator[None, None, None]:
+    """Fixture to start every test without previously extracted video info."""
+    youtube_manager._info_cache.clear()
+    yield
+    youtube_manager._info_cache.clear()
 
 
 @patch("yt_dlp.YoutubeDL")
@@ -31,35 +52,157 @@ def test_get_video_name_failure(mock_youtube_dl: MagicMock) -> None:
         get_video_name(YOUTUBE_URL)
 
 
-@patch("ytsum.youtube.youtube_manager.get_raw_text_from_srt", return_value="Cleaned Subtitles")
-@patch("builtins.open")
-@patch("glob.glob")
 @patch("yt_dlp.YoutubeDL")
-def test_get_video_subtitles_official_found(
-    mock_youtube_dl: MagicMock, mock_glob: MagicMock, mock_open: MagicMock, mock_get_raw: MagicMock
-) -> None:
-    """Tests finding official English subtitles successfully."""
-    mock_glob.return_value = ["/tmp/subs.en.srt"]
-    mock_youtube_dl_instance = mock_youtube_dl.return_value.__enter__.return_value
+def test_get_video_subtitles_official_found(mock_youtube_dl: MagicMock) -> None:
+    """Tests fetching official English subtitles from the same extraction that provides the title."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {
+        "title": "Test Video Title",
+        "subtitles": {"en": [{"ext": "srt", "url": "https://subs/srt"}, {"ext": "vtt", "url": "https://subs/vtt"}]},
+        "automatic_captions": {"en": [{"ext": "vtt", "url": "https://auto/vtt"}]},
+    }
+    mock_instance.urlopen.return_value = io.BytesIO(VTT_CONTENT.encode("utf-8"))
 
+    title = get_video_name(YOUTUBE_URL)
     result = get_video_subtitles(YOUTUBE_URL)
 
-    assert result == "Cleaned Subtitles"
+    assert title == "Test Video Title"
+    assert result == "Official subtitles."
+    mock_instance.extract_info.assert_called_once_with(YOUTUBE_URL, download=False)
+    mock_instance.urlopen.assert_called_once_with("https://subs/vtt")
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_get_video_subtitles_falls_back_to_automatic_captions(mock_youtube_dl: MagicMock) -> None:
+    """Tests choosing English automatic captions when no official subtitles exist."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {
+        "title": "Test Video Title",
+        "subtitles": {"de": [{"ext": "vtt", "url": "https://subs/de"}]},
+        "automatic_captions": {"en-US": [{"ext": "vtt", "url": "https://auto/vtt"}]},
+    }
+    mock_instance.urlopen.return_value = io.BytesIO(VTT_CONTENT.encode("utf-8"))
 
-    mock_youtube_dl_instance.download.assert_called_once_with([YOUTUBE_URL])
-    mock_glob.assert_called_once()
-    mock_open.assert_called_once_with("/tmp/subs.en.srt", encoding="utf-8")
-    mock_get_raw.assert_called_once()
+    assert get_video_subtitles(YOUTUBE_URL) == "Official subtitles."
+    mock_instance.urlopen.assert_called_once_with("https://auto/vtt")
 
 
-@patch("glob.glob", return_value=[])
 @patch("yt_dlp.YoutubeDL")
-def test_get_video_subtitles_none_found(mock_youtube_dl: MagicMock, mock_glob: MagicMock) -> None:
+def test_get_video_subtitles_none_found(mock_youtube_dl: MagicMock) -> None:
     """Tests the case where no subtitles (official or auto) are found."""
-    mock_youtube_dl_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {"title": "Test Video Title", "subtitles": {}}
 
     result = get_video_subtitles(YOUTUBE_URL)
 
     assert result is None
-    assert mock_youtube_dl_instance.download.call_count == 2
-    assert mock_glob.call_count == 2
+    mock_instance.urlopen.assert_not_called()
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_get_video_subtitles_prefers_json3(mock_youtube_dl: MagicMock) -> None:
+    """Tests that the json3 track is preferred and parsed from the response without touching the filesystem."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {
+        "title": "Test Video Title",
+        "automatic_captions": {
+            "en": [{"ext": "vtt", "url": "https://auto/vtt"}, {"ext": "json3", "url": "https://auto/json3"}]
+        },
+    }
+    json3 = (
+        '{"events": [{"segs": [{"utf8": "Hello"}, {"utf8": " world"}]}, {"segs": [{"utf8": "\\n"}]}, {"tStartMs": 1}]}'
+    )
+    mock_instance.urlopen.return_value = io.BytesIO(json3.encode("utf-8"))
+
+    assert get_video_subtitles(YOUTUBE_URL) == "Hello world"
+    mock_instance.urlopen.assert_called_once_with("https://auto/json3")
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_get_video_subtitles_uses_transcript_store(mock_youtube_dl: MagicMock, tmp_path: Path) -> None:
+    """Tests that a stored video is served without yt-dlp and that a stale one is revalidated unless re-cut."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {
+        "title": "Test Video Title",
+        "duration": 212,
+        "subtitles": {"en": [{"ext": "vtt", "url": "https://subs/vtt"}]},
+    }
+    mock_instance.urlopen.return_value = io.BytesIO(VTT_CONTENT.encode("utf-8"))
+    store = TranscriptStore(str(tmp_path), ttl_seconds=60)
+
+    assert get_video_subtitles(YOUTUBE_URL, store) == "Official subtitles."
+    youtube_manager._info_cache.clear()
+    assert get_video_name(YOUTUBE_URL, store) == "Test Video Title"
+    assert get_video_subtitles(YOUTUBE_URL, store) == "Official subtitles."
+    mock_instance.extract_info.assert_called_once()
+
+    entry = store.get_entry("dQw4w9WgXcQ")
+    assert entry is not None and entry.duration == 212
+    entry.fetched_at -= 120
+    mock_instance.extract_info.return_value["title"] = "Renamed Video Title"
+    assert get_video_subtitles(YOUTUBE_URL, store) == "Official subtitles."
+    assert mock_instance.extract_info.call_count == 2
+    mock_instance.urlopen.assert_called_once()
+    assert get_video_name(YOUTUBE_URL, store) == "Renamed Video Title"
+
+    # A stale transcript of a video whose duration changed was made from a different cut and is downloaded again.
+    entry = store.get_entry("dQw4w9WgXcQ")
+    assert entry is not None
+    entry.fetched_at -= 120
+    mock_instance.extract_info.return_value["duration"] = 300
+    mock_instance.urlopen.return_value = io.BytesIO(VTT_CONTENT.encode("utf-8"))
+    assert get_video_subtitles(YOUTUBE_URL, store) == "Official subtitles."
+    assert mock_instance.urlopen.call_count == 2
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_stream_video_subtitles_downloads_lazily_and_stores_the_transcript(
+    mock_youtube_dl: MagicMock, tmp_path: Path
+) -> None:
+    """Tests that a streamed track is only downloaded when consumed and is served whole from the store afterwards."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {"subtitles": {"en": [{"ext": "vtt", "url": "https://subs/vtt"}]}}
+    mock_instance.urlopen.return_value = io.BytesIO(VTT_CONTENT.encode("utf-8"))
+    store = TranscriptStore(str(tmp_path))
+
+    pieces = stream_video_subtitles(YOUTUBE_URL, store)
+
+    assert isinstance(pieces, SubtitleStream)
+    assert pieces.track_key == "dQw4w9WgXcQ:en:official"
+    mock_instance.urlopen.assert_not_called()
+    assert "".join(pieces) == "Official subtitles."
+    stored = stream_video_subtitles(YOUTUBE_URL, store)
+    assert isinstance(stored, TimedTranscript)
+    assert stored.text == "Official subtitles."
+    mock_instance.urlopen.assert_called_once_with("https://subs/vtt")
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_get_video_info_reuses_results_only_briefly(mock_youtube_dl: MagicMock) -> None:
+    """Tests that extracted info is shared for a short while, then extracted again, and skipped when fresh."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.return_value = {"title": "Test Video Title"}
+
+    get_video_info(YOUTUBE_URL)
+    get_video_info(YOUTUBE_URL)
+    assert mock_instance.extract_info.call_count == 1
+    get_video_info(YOUTUBE_URL, fresh=True)
+    assert mock_instance.extract_info.call_count == 2
+
+    with patch.object(youtube_manager, "INFO_CACHE_TTL_SECONDS", 0):
+        get_video_info(YOUTUBE_URL, fresh=True)
+        get_video_info(YOUTUBE_URL)
+    assert mock_instance.extract_info.call_count == 4
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_get_video_info_forgets_an_interrupted_extraction(mock_youtube_dl: MagicMock) -> None:
+    """Tests that an extraction interrupted by Ctrl+C is propagated and not left in flight for later calls."""
+    mock_instance = mock_youtube_dl.return_value.__enter__.return_value
+    mock_instance.extract_info.side_effect = [KeyboardInterrupt, {"title": "Test Video Title"}]
+
+    with pytest.raises(KeyboardInterrupt):
+        get_video_info(YOUTUBE_URL)
+
+    assert YOUTUBE_URL not in youtube_manager._info_cache
+    assert get_video_info(YOUTUBE_URL) == {"title": "Test Video Title"}
@@ -1,6 +1,16 @@
+import io
+
 import pytest
 
-from ytsum.youtube.utils import get_raw_text_from_srt
+from ytsum.youtube.utils import (
+    get_raw_text_from_json3,
+    get_raw_text_from_srt,
+    get_raw_text_from_vtt,
+    get_timestamp_url,
+    get_video_id,
+    iter_subtitle_cues,
+    parse_subtitle_stream,
+)
 
 SRT_STANDARD = (
     "1\n00:00:01,000 --> 00:00:03,000\nFirst subtitle.\n"
@@ -12,7 +22,7 @@ SRT_WITH_ANNOTATIONS = "1\n00:00:10,000 --> 00:00:12,000\n[music] Let's begin. [
 @pytest.mark.parametrize(
     "srt_input, expected_output",
     [
-        (SRT_STANDARD, "First subtitle. Second multi-line subtitle."),
+        (SRT_STANDARD, "First subtitle.\nSecond multi-line subtitle."),
         (SRT_WITH_ANNOTATIONS, "Let's begin."),
         ("", ""),
         ("Malformed text", ""),
@@ -21,3 +31,72 @@ SRT_WITH_ANNOTATIONS = "1\n00:00:10,000 --> 00:00:12,000\n[music] Let's begin. [
 def test_get_raw_text_from_srt(srt_input: str, expected_output: str) -> None:
     """Parses SRT to raw text."""
     assert get_raw_text_from_srt(srt_input) == expected_output
+
+
+@pytest.mark.parametrize(
+    "url, expected_id",
+    [
+        ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+        ("https://youtu.be/dQw4w9WgXcQ?t=10", "dQw4w9WgXcQ"),
+        ("https://www.youtube.com/shorts/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+        ("https://www.youtube.com/@channel", None),
+    ],
+)
+def test_get_video_id(url: str, expected_id: str | None) -> None:
+    """Extracts the video ID from common URL forms."""
+    assert get_video_id(url) == expected_id
+
+
+def test_get_timestamp_url() -> None:
+    """Links to a whole second of the video, and keeps URLs without a video ID unchanged."""
+    assert (
+        get_timestamp_url("https://youtu.be/dQw4w9WgXcQ?si=x", 61.9)
+        == "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=61s"
+    )
+    assert get_timestamp_url("https://example.com/video", 5) == "https://example.com/video"
+
+
+def test_get_raw_text_from_vtt() -> None:
+    """Parses WebVTT to raw text, dropping the header, cue settings and inline tags."""
+    vtt = (
+        "WEBVTT\nKind: captions\nLanguage: en\n\n"
+        "00:00:00.000 --> 00:00:02.000 align:start position:0%\nHello<00:00:00.500><c> world</c>\n\n"
+        "cue-2\n00:00:02.000 --> 00:00:04.000\n[music] Goodbye.\n"
+    )
+    assert get_raw_text_from_vtt(vtt) == "Hello world\nGoodbye."
+
+
+def test_get_raw_text_from_json3() -> None:
+    """Parses json3 timed text to raw text, skipping line-break-only events."""
+    json3 = (
+        '{"events": [{"segs": [{"utf8": "[music] Hello"}]}, {"segs": [{"utf8": "\\n"}]}, '
+        '{"segs": [{"utf8": "world"}]}]}'
+    )
+    assert get_raw_text_from_json3(json3) == "Hello\nworld"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_parse_subtitle_stream_srt_with_crlf(chunk_size: int) -> None:
+    """Parses an SRT byte stream with Windows line endings regardless of how the reads are chunked."""
+    stream = io.BytesIO(SRT_STANDARD.replace("\n", "\r\n").encode("utf-8"))
+    assert parse_subtitle_stream(stream, "srt", chunk_size=chunk_size) == "First subtitle.\nSecond multi-line subtitle."
+
+
+def test_parse_subtitle_stream_srv3() -> None:
+    """Parses srv3 timed-text XML to raw text."""
+    srv3 = '<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>'
+    srv3 += (
+        '<p t="0" d="1000"><s>Hello</s><s t="500"> world</s></p><p t="1000" d="1000">[applause]</p></body></timedtext>'
+    )
+    assert parse_subtitle_stream(io.BytesIO(srv3.encode("utf-8")), "srv3") == "Hello world"
+
+
+def test_iter_subtitle_cues_merges_rolling_text_of_automatic_captions_only() -> None:
+    """Keeps a line an official track repeats, while dropping it from automatic captions."""
+    srt = "1\n00:00:01,000 --> 00:00:02,000\nNo, no, no.\n\n2\n00:00:02,000 --> 00:00:03,000\nNo, no, no.\n"
+
+    official = iter_subtitle_cues(io.BytesIO(srt.encode("utf-8")), "srt", automatic=False)
+    automatic = iter_subtitle_cues(io.BytesIO(srt.encode("utf-8")), "srt", automatic=True)
+
+    assert [cue.text for cue in official] == ["No, no, no.", "No, no, no."]
+    assert [cue.text for cue in automatic] == ["No, no, no."]
@@ -1,12 +1,12 @@
 import logging
 import sys
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 
-from ytsum.config import APP_NAME
-from ytsum.llms.gemini import Gemini
+from ytsum.config import APP_NAME, ensure_dirs, load_environment
 from ytsum.utils.input_parser import get_args
 from ytsum.utils.logging_config import configure_logging
-from ytsum.utils.prompts.prompt_factory import Prompt
-from ytsum.youtube.youtube_manager import get_video_name, get_video_subtitles
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +18,16 @@ def main() -> None:
 
     Workflow:
         1. Parse CLI arguments including video URL and output file path.
-        2. Retrieve the title of the YouTube video.
-        3. Fetch subtitles for the given video.
-        4. Generate a summary using the Gemini LLM based on the transcript.
-        5. Write the summary to the specified output file or print to stdout.
+        2. Concurrently, retrieve the title of the YouTube video, fetch its subtitles and create the selected
+           LLM backend, Gemini by default. The transcript store is consulted for the title and subtitles first.
+        3. Generate a summary as soon as the subtitle track is found and the backend is ready. A downloaded
+           track is parsed as it arrives and each chunk is sent to the LLM once it is complete, unless a summary
+           of the same track is already cached; a stored transcript is chunked on its cue and chapter
+           boundaries, unless its summary is already cached.
+        4. Write the summary, with links to the sections of a stored transcript, to the specified output
+           file or print to stdout, either at once or, with
+           `--stream`, piece by piece as the final LLM call produces it. The title is only waited for when
+           the link to the video is appended; if its lookup failed, the URL is used instead.
 
     Raises:
         RuntimeError: If subtitles cannot be retrieved.
@@ -29,7 +35,25 @@ def main() -> None:
     """
     try:
         args = get_args()
+        load_environment()
+        ensure_dirs()
         configure_logging(args.verbose)
+
+        # Imported only now, so `--help` stays fast and environment defaults come from the loaded `.env` file.
+        from ytsum.llms.registry import get_llm
+        from ytsum.utils.cache import (
+            ChunkCache,
+            SummaryCache,
+            plan_sections,
+            stream_transcript_summary,
+            summarize_transcript,
+        )
+        from ytsum.utils.output import format_summary, format_summary_stream, write_pieces
+        from ytsum.utils.prompts.prompt_factory import Prompt
+        from ytsum.youtube.captions import TimedTranscript
+        from ytsum.youtube.transcript_store import TranscriptStore
+        from ytsum.youtube.youtube_manager import SubtitleStream, get_video_name, stream_video_subtitles
+
         video_url = args.url
         output_file = args.output_file
 
@@ -37,22 +61,53 @@ def main() -> None:
         logger.debug(f"Video URL: {video_url}")
         logger.debug(f"Output file: {output_file}")
 
-        video_title = get_video_name(video_url)
+        transcript_store = None if args.no_cache else TranscriptStore()
+        summary_cache = None if args.no_cache else SummaryCache()
+        chunk_cache = None if args.no_cache else ChunkCache()
+
+        # The title lookup and the backend's client setup do not depend on the transcript, so they run
+        # while the subtitles are downloaded.
+        with ThreadPoolExecutor(3, thread_name_prefix="main") as pool:
+            title_future = pool.submit(get_video_name, video_url, transcript_store)
+            subtitles_future = pool.submit(stream_video_subtitles, video_url, transcript_store)
+            llm_future = pool.submit(get_llm, args.backend, chunk_cache=chunk_cache)
 
-        subtitles = get_video_subtitles(video_url)
-        if not subtitles:
-            raise RuntimeError(f"Failed to retrieve subtitles from video: {video_url}")
+            subtitles = subtitles_future.result()
+            if subtitles is None:
+                raise RuntimeError(f"Failed to retrieve subtitles from video: {video_url}")
+            llm = llm_future.result()
 
-        llm = Gemini()
-        summary = llm.ask_prompt(Prompt.SUMMARY, subtitles)
-        summary_text = summary + f"\n\nOriginal video: [**{video_title}**]({video_url})\n"
+            # A stored transcript has the timing of its cues, while a download is only streamed as text.
+            if isinstance(subtitles, TimedTranscript):
+                sections = plan_sections(llm, Prompt.SUMMARY, subtitles, summary_cache, args.refresh)
+                transcript: str | Iterator[str] = subtitles.text
+            else:
+                sections, transcript = [], subtitles
+            spans = [section.span for section in sections] or None
+            # A download is looked up by its track before it starts, as its text is only known once read.
+            source_key = subtitles.track_key if isinstance(subtitles, SubtitleStream) else None
+
+            if args.stream:
+                on_progress = _report_progress if args.progress else None
+                summary_pieces = stream_transcript_summary(
+                    llm, Prompt.SUMMARY, transcript, summary_cache, args.refresh, on_progress, spans, source_key
+                )
+                title = partial(_get_title, title_future, video_url)
+                write_pieces(format_summary_stream(summary_pieces, title, video_url, sections), output_file)
+            else:
+                summary = summarize_transcript(
+                    llm, Prompt.SUMMARY, transcript, summary_cache, args.refresh, spans, source_key
+                )
+                summary_text = format_summary(summary, _get_title(title_future, video_url), video_url, sections)
+
+                if output_file:
+                    with open(output_file, "w", encoding="utf-8") as f:
+                        f.write(summary_text)
+                else:
+                    sys.stdout.write(summary_text)
 
         if output_file:
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(summary_text)
             logger.info(f"Summary saved to: {output_file}")
-        else:
-            sys.stdout.write(summary_text)
     except KeyboardInterrupt:
         logger.warning("Process interrupted by user.")
         print("Process interrupted by user.", file=sys.stderr)
@@ -67,5 +122,19 @@ def main() -> None:
         sys.exit(2)
 
 
+def _get_title(title_future: "Future[str]", video_url: str) -> str:
+    """Wait for the title lookup of a video, falling back to its URL if the lookup failed."""
+    try:
+        return title_future.result()
+    except Exception as e:
+        logger.warning(f"Title lookup failed for {video_url}, using the URL instead: {e}")
+        return video_url
+
+
+def _report_progress(completed: int, total: int) -> None:
+    """Print the progress of the map stage to stderr."""
+    print(f"Summarized chunk {completed}/{total}", file=sys.stderr, flush=True)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from ytsum.config import APP_NAME, ensure_dirs, load_environment
+from ytsum.utils.input_parser import get_batch_args
+from ytsum.utils.logging_config import configure_logging
+from ytsum.utils.metrics import get_metrics
+from ytsum.utils.output import format_summary
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import Section, TimedTranscript
+from ytsum.youtube.utils import get_video_id, is_collection_url
+from ytsum.youtube.youtube_manager import get_playlist_video_urls, get_video_name, get_video_transcript
+
+if TYPE_CHECKING:
+    from ytsum.llms.llm import LLM
+    from ytsum.utils.cache import SummaryCache
+    from ytsum.youtube.transcript_store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+@dataclass
+class VideoResult:
+    """Outcome of summarizing a single video in a batch run, as recorded in the manifest."""
+
+    url: str
+    video_id: str
+    status: str
+    output_file: str | None = None
+    error: str | None = None
+    elapsed_seconds: float = 0.0
+
+
+@dataclass
+class _Job:
+    """Book-keeping for a video travelling through the pipeline stages."""
+
+    url: str
+    video_id: str
+    title_future: "Future[str]"
+    started: float = field(default_factory=time.perf_counter)
+
+
+class BatchPipeline:
+    """
+    Summarizes many videos in one process by overlapping the pipeline stages across videos.
+
+    Title lookup, subtitle download and LLM summarization run in separate thread pools, each with its own
+    concurrency limit. A video enters the LLM stage as soon as its subtitles are available, and its summary
+    is written to the output directory, together with a manifest entry, as soon as the LLM returns.
+    """
+
+    def __init__(
+        self,
+        llm: "LLM",
+        output_dir: str,
+        *,
+        subtitle_workers: int = 4,
+        title_workers: int = 4,
+        llm_workers: int = 2,
+        prompt_type: Prompt = Prompt.SUMMARY,
+        summary_cache: "SummaryCache | None" = None,
+        transcript_store: "TranscriptStore | None" = None,
+        refresh: bool = False,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            llm (LLM): Language model shared by all videos of the run.
+            output_dir (str): Directory where summaries and the manifest are written.
+            subtitle_workers (int, optional): Concurrent subtitle downloads. Defaults to 4.
+            title_workers (int, optional): Concurrent title lookups. Defaults to 4.
+            llm_workers (int, optional): Videos summarized concurrently. Defaults to 2.
+            prompt_type (Prompt, optional): Prompt used for summarization. Defaults to Prompt.SUMMARY.
+            summary_cache (SummaryCache | None, optional): Cache consulted before calling the LLM. Defaults to None.
+            transcript_store (TranscriptStore | None, optional): Store of transcripts and titles consulted before
+                yt-dlp. Defaults to None.
+            refresh (bool, optional): Overwrite cached summaries instead of reading them. Defaults to False.
+        """
+        self._llm = llm
+        self._output_dir = output_dir
+        self._subtitle_workers = subtitle_workers
+        self._title_workers = title_workers
+        self._llm_workers = llm_workers
+        self._prompt_type = prompt_type
+        self._summary_cache = summary_cache
+        self._transcript_store = transcript_store
+        self._refresh = refresh
+        # Bounds the number of transcripts held in memory while waiting for the LLM stage.
+        self._max_in_flight = subtitle_workers + 2 * llm_workers
+
+    @property
+    def manifest_path(self) -> str:
+        """Path of the JSON Lines manifest with one entry per processed video."""
+        return os.path.join(self._output_dir, MANIFEST_NAME)
+
+    def run(self, urls: Iterable[str]) -> list[VideoResult]:
+        """
+        Summarize every video URL and return the per-video results in completion order.
+
+        Args:
+            urls (Iterable[str]): Video URLs. Consumed lazily, so it may be a generator.
+
+        Returns:
+            list[VideoResult]: Result of every video, successful or not.
+        """
+        os.makedirs(self._output_dir, exist_ok=True)
+        url_iter = iter(urls)
+        results: list[VideoResult] = []
+
+        with (
+            ThreadPoolExecutor(self._title_workers, thread_name_prefix="title") as title_pool,
+            ThreadPoolExecutor(self._subtitle_workers, thread_name_prefix="subtitles") as subtitle_pool,
+            ThreadPoolExecutor(self._llm_workers, thread_name_prefix="llm") as llm_pool,
+            open(self.manifest_path, "a", encoding="utf-8") as manifest,
+        ):
+            pending: dict[Future[Any], tuple[_Job, str]] = {}
+            in_flight = 0
+
+            def finish(result: VideoResult) -> None:
+                nonlocal in_flight
+                in_flight -= 1
+                results.append(result)
+                manifest.write(json.dumps(asdict(result)) + "\n")
+                manifest.flush()
+                logger.info(f"[{len(results)}] {result.status}: {result.url}")
+
+            def fill() -> None:
+                nonlocal in_flight
+                while in_flight < self._max_in_flight:
+                    url = next(url_iter, None)
+                    if url is None:
+                        return
+                    title_future = title_pool.submit(get_video_name, url, self._transcript_store)
+                    job = _Job(url, _video_key(url), title_future)
+                    pending[subtitle_pool.submit(get_video_transcript, url, self._transcript_store)] = (
+                        job,
+                        "subtitles",
+                    )
+                    in_flight += 1
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, stage = pending.pop(future)
+                    try:
+                        if stage == "subtitles":
+                            transcript = future.result()
+                            if transcript is None:
+                                raise RuntimeError(f"Failed to retrieve subtitles from video: {job.url}")
+                            llm_future = llm_pool.submit(self._summarize, transcript)
+                            pending[llm_future] = (job, "llm")
+                        else:
+                            finish(self._write_summary(job, *future.result()))
+                    except Exception as e:
+                        logger.error(f"Failed to summarize {job.url}: {e}")
+                        job.title_future.cancel()
+                        finish(self._result(job, "failed", error=str(e)))
+                fill()
+
+        return results
+
+    def _summarize(self, transcript: TimedTranscript) -> tuple[str, list[Section]]:
+        """Summarize a transcript in chunks planned on its cues, going through the summary cache if enabled."""
+        from ytsum.utils.cache import plan_sections, summarize_transcript
+
+        sections = plan_sections(self._llm, self._prompt_type, transcript, self._summary_cache, self._refresh)
+        summary = summarize_transcript(
+            self._llm,
+            self._prompt_type,
+            transcript.text,
+            self._summary_cache,
+            self._refresh,
+            [section.span for section in sections] or None,
+        )
+        return summary, sections
+
+    def _write_summary(self, job: _Job, summary: str, sections: list[Section]) -> VideoResult:
+        """Write the finished summary of a job to the output directory."""
+        try:
+            video_title = job.title_future.result()
+        except Exception as e:
+            logger.warning(f"Title lookup failed for {job.url}, using the URL instead: {e}")
+            video_title = job.url
+
+        output_file = os.path.join(self._output_dir, f"{job.video_id}.md")
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(format_summary(summary, video_title, job.url, sections))
+        return self._result(job, "ok", output_file=output_file)
+
+    @staticmethod
+    def _result(job: _Job, status: str, **kwargs: Any) -> VideoResult:
+        """Build the manifest entry of a job."""
+        elapsed = round(time.perf_counter() - job.started, 3)
+        return VideoResult(job.url, job.video_id, status, elapsed_seconds=elapsed, **kwargs)
+
+
+def _video_key(url: str) -> str:
+    """Return the video ID of a URL, or a stable hash of the URL if no ID can be found."""
+    return get_video_id(url) or hashlib.sha1(url.encode("utf-8")).hexdigest()[:11]
+
+
+def read_sources(urls: list[str], input_file: str | None) -> Iterator[str]:
+    """
+    Yield source URLs from the command line and from an input file or stdin.
+
+    Blank lines and lines starting with '#' are skipped.
+    """
+    yield from urls
+    if input_file is None:
+        return
+    with sys.stdin if input_file == "-" else open(input_file, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def expand_sources(sources: Iterable[str]) -> Iterator[str]:
+    """
+    Yield unique video URLs, expanding playlist and channel URLs into their videos.
+
+    Collections that cannot be expanded are logged and skipped.
+    """
+    seen: set[str] = set()
+    for source in sources:
+        try:
+            video_urls = get_playlist_video_urls(source) if is_collection_url(source) else [source]
+        except RuntimeError as e:
+            logger.error(str(e))
+            print(e, file=sys.stderr)
+            continue
+        for url in video_urls:
+            key = _video_key(url)
+            if key not in seen:
+                seen.add(key)
+                yield url
+
+
+def write_metrics(report_path: str | None, textfile_path: str | None) -> None:
+    """
+    Write the metrics of the run as a JSON report and in the Prometheus text format.
+
+    Args:
+        report_path (str | None): File for the JSON run report, or None to skip it.
+        textfile_path (str | None): File for the Prometheus exposition, or None to skip it.
+    """
+    if report_path is not None:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(get_metrics().report(), f, indent=2)
+    if textfile_path is not None:
+        # Written to a temporary file first, so a collector never reads a partial exposition.
+        with open(f"{textfile_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(get_metrics().to_prometheus())
+        os.replace(f"{textfile_path}.tmp", textfile_path)
+
+
+def main() -> None:
+    """
+    Summarize every video given on the command line, in an input file or on stdin, in a single process.
+
+    Playlist and channel URLs are expanded into their videos. Each summary is written to the output
+    directory as soon as it is ready, and the outcome of every video is appended to the run manifest.
+    Exits with status 1 if any video failed.
+    """
+    try:
+        args = get_batch_args()
+        load_environment()
+        ensure_dirs()
+        configure_logging(args.verbose)
+        logger.info(f"Starting batch run: {APP_NAME}")
+
+        # Imported only now, so environment defaults come from the loaded `.env` file.
+        from ytsum.llms.registry import get_llm
+        from ytsum.utils.cache import ChunkCache, SummaryCache
+        from ytsum.youtube.transcript_store import TranscriptStore
+
+        summary_cache = None if args.no_cache else SummaryCache()
+        chunk_cache = None if args.no_cache else ChunkCache()
+        pipeline = BatchPipeline(
+            get_llm(args.backend, chunk_cache=chunk_cache),
+            args.output_dir,
+            subtitle_workers=args.subtitle_workers,
+            title_workers=args.title_workers,
+            llm_workers=args.llm_workers,
+            summary_cache=summary_cache,
+            transcript_store=None if args.no_cache else TranscriptStore(),
+            refresh=args.refresh,
+        )
+        results = pipeline.run(expand_sources(read_sources(args.urls, args.input_file)))
+        write_metrics(args.metrics_report, args.metrics_textfile)
+
+        failed = sum(result.status != "ok" for result in results)
+        print(
+            f"Summarized {len(results) - failed}/{len(results)} videos. Manifest: {pipeline.manifest_path}",
+            file=sys.stderr,
+        )
+        if failed:
+            sys.exit(1)
+    except KeyboardInterrupt:
+        logger.warning("Process interrupted by user.")
+        print("Process interrupted by user.", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        logger.exception(f"An unknown error occurred during execution: {e}")
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 import os.path
+from functools import cache
 
-from dotenv import load_dotenv
 from platformdirs import user_data_dir, user_log_dir
 
-load_dotenv()
-
 APP_NAME = "youtube-summarizer"
 AUTHOR = "mateusz_kow"
 
 APP_DIR = user_data_dir(APP_NAME, AUTHOR)
 LOG_DIR = user_log_dir(APP_NAME, AUTHOR)
 OUTPUT_DIR = os.path.join(APP_DIR, "Output")
+CACHE_DIR = os.path.join(APP_DIR, "Cache")
+SUMMARY_CACHE_DIR = os.path.join(CACHE_DIR, "summaries")
+CHUNK_CACHE_DIR = os.path.join(CACHE_DIR, "chunks")
+TRANSCRIPT_CACHE_DIR = os.path.join(CACHE_DIR, "transcripts")
+LOCK_DIR = os.path.join(CACHE_DIR, "locks")
+TOKEN_RATIOS_PATH = os.path.join(APP_DIR, "token_ratios.json")
+LATENCY_STATS_PATH = os.path.join(APP_DIR, "latency_stats.json")
 
 try:
     # noqa: F403
@@ -18,7 +23,24 @@ try:
 except ImportError:
     pass
 
-KEY_DIRS = (APP_DIR, OUTPUT_DIR, LOG_DIR)
+KEY_DIRS = (APP_DIR, OUTPUT_DIR, LOG_DIR, CACHE_DIR)
+
+
+@cache
+def load_environment() -> None:
+    """
+    Load environment variables from a `.env` file, once per process.
+
+    Several modules read their defaults from the environment when they are imported, so entry points call this
+    before importing them.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
 
-for directory in KEY_DIRS:
-    os.makedirs(directory, exist_ok=True)
+@cache
+def ensure_dirs() -> None:
+    """Create the application directories, once per process."""
+    for directory in KEY_DIRS:
+        os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from ytsum.llms.gemini import Gemini
+from ytsum.llms.limits import get_async_limiter
+from ytsum.llms.rate_limiter import get_rate_limiter, is_quota_error
+from ytsum.utils.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from google import genai
+
+logger = logging.getLogger(__name__)
+
+_clients: dict[str | None, "genai.Client"] = {}
+_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key: str | None) -> "genai.Client":
+    """
+    Return the process-wide Gemini client for an API key, creating it on first use.
+
+    Sharing the client shares its pooled HTTP connections between every model instance in the process.
+
+    Args:
+        api_key (str | None): Google AI API key.
+
+    Returns:
+        genai.Client: The shared client.
+    """
+    from google import genai
+
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+class AsyncGemini(Gemini):
+    """
+    Gemini implementation with native asynchronous requests.
+
+    Requests go through the asynchronous API of a client shared by the whole process, and are admitted by the
+    event loop's `AsyncRequestLimiter`, bounding requests in flight, and by the model's process-wide rate
+    limiter, bounding requests and tokens per minute, across every video and every reduce level. Backoff on
+    quota exhaustion awaits instead of blocking a thread.
+    """
+
+    def _create_client(self) -> "genai.Client":
+        """
+        Return the process-wide Gemini client.
+
+        Returns:
+            genai.Client: Client shared by every `AsyncGemini` instance.
+        """
+        return get_shared_client(os.getenv("GOOGLE_API_KEY"))
+
+    async def ask_async(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Send prompt to Gemini model asynchronously and retrieve response with retry on quota errors.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Calling Gemini asynchronously with a prompt of ~{tokens} tokens")
+        return await self._generate_async(prompt, tokens, max_retries, backoff_seconds)
+
+    async def ask_with_preamble_async(
+        self, prompt: str, preamble: str, max_retries: int = 5, backoff_seconds: int = 30
+    ) -> str:
+        """
+        Asynchronous variant of `ask_with_preamble`, sending only the rest of the prompt after a cached preamble.
+
+        The context cache is looked up, and uploaded if needed, in a worker thread, so an upload does not block
+        the event loop.
+
+        Args:
+            prompt (str): The whole prompt, starting with the preamble.
+            preamble (str): Start of the prompt shared by many prompts, or an empty string for none.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        from google.genai.errors import ClientError
+
+        cache_name = None
+        if preamble and prompt.startswith(preamble):
+            cache_name = await asyncio.to_thread(self._get_context_cache, preamble)
+        if cache_name is None:
+            return await self.ask_async(prompt, max_retries, backoff_seconds)
+
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Calling Gemini asynchronously with a prompt of ~{tokens} tokens, preamble in {cache_name}")
+        try:
+            return await self._generate_async(prompt[len(preamble) :], tokens, max_retries, backoff_seconds, cache_name)
+        except ClientError as e:
+            if is_quota_error(e):
+                raise
+            logger.warning(f"Context cache {cache_name} was rejected: {e}. Sending whole prompts instead.")
+            with self._context_caches_lock:
+                self._context_caches[preamble] = None
+            return await self.ask_async(prompt, max_retries, backoff_seconds)
+
+    async def _generate_async(
+        self, contents: str, tokens: int, max_retries: int, backoff_seconds: int, cached_content: str | None = None
+    ) -> str:
+        """
+        Asynchronous variant of `_generate`, also holding a slot of the event loop's `AsyncRequestLimiter`.
+
+        Args:
+            contents (str): Text sent with the request, the whole prompt or the rest of it after a cached preamble.
+            tokens (int): Tokens of the whole prompt, including a cached preamble.
+            max_retries (int): Maximum retry attempts on quota exhaustion.
+            backoff_seconds (int): Upper bound of the wait between retries in seconds.
+            cached_content (str | None, optional): Name of the context cache holding the preamble, or None.
+                Defaults to None.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        from google.genai import types
+        from google.genai.errors import ClientError
+
+        config = types.GenerateContentConfig(cached_content=cached_content) if cached_content else None
+        limiter = get_async_limiter()
+        rate_limiter = get_rate_limiter(self._model_name)
+
+        for attempt in range(1, max_retries + 1):
+            await rate_limiter.acquire_async(tokens)
+            try:
+                async with limiter.slot():
+                    sent = time.perf_counter()
+                    with get_metrics().span("llm_generate", model=self._model_name):
+                        response = await self._client.aio.models.generate_content(
+                            model=self._model_name, contents=contents, config=config
+                        )
+                if not response or not response.text:
+                    raise ValueError("Empty response from Gemini model.")
+                output_tokens = self._get_output_tokens(response, response.text)
+                self._record_usage(tokens, output_tokens, time.perf_counter() - sent)
+                cached_tokens = getattr(getattr(response, "usage_metadata", None), "cached_content_token_count", None)
+                if isinstance(cached_tokens, int) and cached_tokens:
+                    get_metrics().increment("llm_cached_input_tokens_total", cached_tokens, model=self._model_name)
+                return response.text.strip()
+            except ClientError as e:
+                await asyncio.sleep(self._get_retry_delay(e, attempt, max_retries, backoff_seconds))
+
+        raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
@@ -1,14 +1,29 @@
+import asyncio
+import hashlib
 import logging
 import os
+import threading
 import time
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
 
-from google import genai
-from google.genai.errors import ClientError
-
+from ytsum.llms.limits import get_async_limiter
 from ytsum.llms.llm import LLM
+from ytsum.llms.rate_limiter import get_rate_limiter, is_quota_error
+from ytsum.llms.segmenters import Segmenter
+from ytsum.llms.tokenizer import CharRatioTokenCounter, TokenCounter
+from ytsum.utils.cache import ChunkCache
+from ytsum.utils.metrics import get_metrics
+from ytsum.utils.single_flight import get_single_flight
+
+if TYPE_CHECKING:
+    from google import genai
 
 logger = logging.getLogger(__name__)
 
+# Share of a context cache's TTL after which it is replaced, so no request references a cache about to expire.
+CONTEXT_CACHE_REFRESH_FRACTION = 0.9
+
 
 class Gemini(LLM):
     """
@@ -18,27 +33,69 @@ class Gemini(LLM):
     token counting, request retries on quota exhaustion, and response handling.
     """
 
-    def __init__(self, max_tokens: int = int(os.getenv("GOOGLE_LLM_MAX_INPUT_TOKENS", 6000))):
+    def __init__(
+        self,
+        max_tokens: int = int(os.getenv("GOOGLE_LLM_MAX_INPUT_TOKENS", 6000)),
+        chunk_cache: ChunkCache | None = None,
+        token_counter: TokenCounter | None = None,
+        count_margin: float = float(os.getenv("GOOGLE_TOKEN_COUNT_MARGIN", 0.15)),
+        segmenter: Segmenter | None = None,
+        context_cache_min_tokens: int = int(os.getenv("GOOGLE_CONTEXT_CACHE_MIN_TOKENS", 1024)),
+        context_cache_ttl_seconds: int = int(os.getenv("GOOGLE_CONTEXT_CACHE_TTL_SECONDS", 600)),
+    ):
         """
         Initialize Gemini LLM client with max token limit and model configuration.
 
         Args:
             max_tokens (int, optional): Maximum tokens allowed per prompt. Defaults to 6000 or environment variable.
+            chunk_cache (ChunkCache | None, optional): Cache of chunk answers reused across runs. Defaults to None.
+            token_counter (TokenCounter | None, optional): Offline token counter. Defaults to a chars-per-token
+                ratio calibrated against the API and persisted for the model.
+            count_margin (float, optional): Relative distance from the token limit within which the exact API
+                count is used instead of the local estimate. Defaults to 0.15 or environment variable.
+            segmenter (Segmenter | None, optional): Splitter of long texts into sentences before chunking.
+                Defaults to the one selected by the `TEXT_SEGMENTER` environment variable.
+            context_cache_min_tokens (int, optional): Shortest preamble uploaded to a context cache, which the
+                API rejects below a model-specific minimum. The shipped summary instructions are about 150
+                tokens, so they are only cached if this is lowered for a model that accepts them. Defaults to
+                1024 or environment variable.
+            context_cache_ttl_seconds (int, optional): Lifetime of a context cache on the server. Defaults to 600
+                or environment variable.
         """
-        super().__init__(logger)
+        super().__init__(logger, chunk_cache, segmenter=segmenter)
         self._max_tokens = max_tokens
-        self._client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._client = self._create_client()
         self._model_name = os.getenv("GOOGLE_MODEL_NAME", "gemma-3n-e4b-it")
+        self._token_counter = token_counter or CharRatioTokenCounter(self._model_name)
+        self._count_margin = count_margin
+        self._context_cache_min_tokens = context_cache_min_tokens
+        self._context_cache_ttl_seconds = context_cache_ttl_seconds
+        self._context_caches: dict[str, tuple[str, float] | None] = {}
+        self._context_caches_lock = threading.Lock()
         logger.info(f"Gemini initialized with max token limit: {self._max_tokens}")
 
+    def _create_client(self) -> "genai.Client":
+        """
+        Create the Gemini API client.
+
+        Returns:
+            genai.Client: Client authenticated with the `GOOGLE_API_KEY` environment variable.
+        """
+        from google import genai
+
+        return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
     def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
         """
         Send prompt to Gemini model and retrieve response with retry on quota errors.
 
+        Requests are admitted by the model's shared rate limiter. On quota exhaustion the server's retry-after
+        hint is honoured if present, otherwise the wait grows exponentially with full jitter.
+
         Args:
             prompt (str): The input prompt string.
             max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
-            backoff_seconds (int, optional): Wait time between retries in seconds. Defaults to 30.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
 
         Raises:
             RuntimeError: If all retry attempts fail due to quota exhaustion.
@@ -47,34 +104,248 @@ class Gemini(LLM):
         Returns:
             str: The model's response text.
         """
-        tokens = self.get_token_count(prompt)
+        tokens = self._token_counter.count(prompt)
         logger.debug(f"Calling Gemini with prompt: {prompt} and tokens {tokens}")
+        return self._generate(prompt, tokens, max_retries, backoff_seconds)
+
+    def ask_with_preamble(self, prompt: str, preamble: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Send a prompt whose preamble is stored in a Gemini context cache, sending only the rest of the prompt.
+
+        The preamble is uploaded once with `client.caches.create` and referenced by every prompt starting with it
+        until the cache is close to its TTL, when it is uploaded again. Preambles shorter than
+        `context_cache_min_tokens` and models without context caching send the whole prompt with `ask`, as do
+        requests whose cache the server no longer accepts, after which the cache is not used again.
+
+        Args:
+            prompt (str): The whole prompt, starting with the preamble.
+            preamble (str): Start of the prompt shared by many prompts, or an empty string for none.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        from google.genai.errors import ClientError
+
+        cache_name = self._get_context_cache(preamble) if preamble and prompt.startswith(preamble) else None
+        if cache_name is None:
+            return self.ask(prompt, max_retries, backoff_seconds)
+
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Calling Gemini with a prompt of ~{tokens} tokens and the preamble cached in {cache_name}")
+        try:
+            return self._generate(prompt[len(preamble) :], tokens, max_retries, backoff_seconds, cache_name)
+        except ClientError as e:
+            if is_quota_error(e):
+                raise
+            logger.warning(f"Context cache {cache_name} was rejected: {e}. Sending whole prompts instead.")
+            with self._context_caches_lock:
+                self._context_caches[preamble] = None
+            return self.ask(prompt, max_retries, backoff_seconds)
+
+    async def ask_with_preamble_async(
+        self, prompt: str, preamble: str, max_retries: int = 5, backoff_seconds: int = 30
+    ) -> str:
+        """
+        Asynchronous variant of `ask_with_preamble`, run in a worker thread as `ask_async` runs `ask`.
+
+        Args:
+            prompt (str): The whole prompt, starting with the preamble.
+            preamble (str): Start of the prompt shared by many prompts, or an empty string for none.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Returns:
+            str: The model's response text.
+        """
+        async with get_async_limiter().slot():
+            return await asyncio.to_thread(self.ask_with_preamble, prompt, preamble, max_retries, backoff_seconds)
+
+    def _generate(
+        self, contents: str, tokens: int, max_retries: int, backoff_seconds: int, cached_content: str | None = None
+    ) -> str:
+        """
+        Generate an answer with retry on quota errors, admitted by the model's shared rate limiter.
+
+        Args:
+            contents (str): Text sent with the request, the whole prompt or the rest of it after a cached preamble.
+            tokens (int): Tokens of the whole prompt, including a cached preamble.
+            max_retries (int): Maximum retry attempts on quota exhaustion.
+            backoff_seconds (int): Upper bound of the wait between retries in seconds.
+            cached_content (str | None, optional): Name of the context cache holding the preamble, or None.
+                Defaults to None.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        from google.genai import types
+        from google.genai.errors import ClientError
+
+        config = types.GenerateContentConfig(cached_content=cached_content) if cached_content else None
+        rate_limiter = get_rate_limiter(self._model_name)
 
         for attempt in range(1, max_retries + 1):
+            rate_limiter.acquire(tokens)
             try:
-                response = self._client.models.generate_content(model=self._model_name, contents=prompt)
+                sent = time.perf_counter()
+                with get_metrics().span("llm_generate", model=self._model_name):
+                    response = self._client.models.generate_content(
+                        model=self._model_name, contents=contents, config=config
+                    )
                 if not response or not response.text:
                     raise ValueError("Empty response from Gemini model.")
+                output_tokens = self._get_output_tokens(response, response.text)
+                self._record_usage(tokens, output_tokens, time.perf_counter() - sent)
+                cached_tokens = getattr(getattr(response, "usage_metadata", None), "cached_content_token_count", None)
+                if isinstance(cached_tokens, int) and cached_tokens:
+                    get_metrics().increment("llm_cached_input_tokens_total", cached_tokens, model=self._model_name)
                 return response.text.strip()
             except ClientError as e:
-                error_msg = str(e)
-                if "RESOURCE_EXHAUSTED" in error_msg:
-                    logger.warning(
-                        f"Quota exceeded (attempt {attempt}/{max_retries}). "
-                        f"Retrying in {backoff_seconds} seconds..."
-                    )
-                    time.sleep(backoff_seconds)
-                else:
-                    logger.error(f"Unexpected API error: {e}")
+                time.sleep(self._get_retry_delay(e, attempt, max_retries, backoff_seconds))
+
+        raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
+
+    def _get_context_cache(self, preamble: str) -> str | None:
+        """
+        Return the name of a live context cache holding the preamble, uploading it if there is none.
+
+        Concurrent requests missing the same cache share one upload, made without holding the lock of the
+        other preambles' caches.
+
+        Args:
+            preamble (str): Preamble shared by many prompts.
+
+        Returns:
+            str | None: Name of the cache, or None if the preamble is too short to be cached or caching failed.
+        """
+        # A token spans at least one character, so shorter preambles are rejected without counting them.
+        if len(preamble) < self._context_cache_min_tokens:
+            return None
+
+        with self._context_caches_lock:
+            if preamble in self._context_caches:
+                entry = self._context_caches[preamble]
+                if entry is None:
+                    return None
+                if time.monotonic() < entry[1]:
+                    return entry[0]
+            elif self._token_counter.count(preamble) < self._context_cache_min_tokens:
+                self._context_caches[preamble] = None
+                return None
+
+        # Caches belong to the API key's project, so only requests through the same client share an upload.
+        key = f"{id(self._client)}:{self._model_name}:{hashlib.sha256(preamble.encode('utf-8')).hexdigest()}"
+        entry = get_single_flight("context_caches").do(key, lambda: self._create_context_cache(preamble))
+        with self._context_caches_lock:
+            self._context_caches[preamble] = entry
+        return entry[0] if entry is not None else None
+
+    def _create_context_cache(self, preamble: str) -> tuple[str, float] | None:
+        """
+        Upload the preamble to a new context cache.
+
+        Args:
+            preamble (str): Preamble shared by many prompts.
+
+        Returns:
+            tuple[str, float] | None: Name of the cache and the monotonic time to replace it at, or None if
+                caching failed.
+        """
+        from google.genai import types
+
+        try:
+            cache = self._client.caches.create(
+                model=self._model_name,
+                config=types.CreateCachedContentConfig(contents=[preamble], ttl=f"{self._context_cache_ttl_seconds}s"),
+            )
+        except Exception as e:
+            logger.warning(f"Context caching failed for {self._model_name}: {e}. Sending whole prompts instead.")
+            return None
+        if not cache.name:
+            return None
+
+        get_metrics().increment("llm_context_caches_total", model=self._model_name)
+        logger.info(f"Cached the prompt preamble for {self._model_name} in {cache.name}.")
+        return cache.name, time.monotonic() + self._context_cache_ttl_seconds * CONTEXT_CACHE_REFRESH_FRACTION
+
+    def ask_stream(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> Iterator[str]:
+        """
+        Send prompt to Gemini model and yield the response as it is generated.
+
+        Quota errors are retried as in `ask` as long as nothing has been yielded yet; errors after the
+        first piece are raised, since a partially delivered response cannot be retried transparently.
+        Surrounding whitespace of the whole response is stripped, as in `ask`.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            Exception: On unexpected API errors.
+
+        Yields:
+            str: Consecutive pieces of the model's response text.
+        """
+        from google.genai.errors import ClientError
+
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Streaming Gemini response to a prompt of ~{tokens} tokens")
+        rate_limiter = get_rate_limiter(self._model_name)
+
+        for attempt in range(1, max_retries + 1):
+            rate_limiter.acquire(tokens)
+            started = False
+            sent = time.perf_counter()
+            first_token_seconds = None
+            try:
+                with get_metrics().span("llm_generate", model=self._model_name):
+                    stream = self._client.models.generate_content_stream(model=self._model_name, contents=prompt)
+                    pending_whitespace = ""
+                    output: list[str] = []
+                    for response in stream:
+                        text = response.text or ""
+                        if not started:
+                            text = text.lstrip()
+                        stripped = text.rstrip()
+                        if stripped:
+                            if not started:
+                                first_token_seconds = time.perf_counter() - sent
+                            started = True
+                            output.append(pending_whitespace + stripped)
+                            yield output[-1]
+                            pending_whitespace = text[len(stripped) :]
+                        else:
+                            pending_whitespace += text
+                    if not started:
+                        raise ValueError("Empty response from Gemini model.")
+                output_tokens = self._token_counter.count("".join(output))
+                self._record_usage(tokens, output_tokens, time.perf_counter() - sent, first_token_seconds)
+                return
+            except ClientError as e:
+                if started:
                     raise
+                time.sleep(self._get_retry_delay(e, attempt, max_retries, backoff_seconds))
 
         raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
 
     def get_token_count(self, text: str) -> int:
         """
-        Return the number of tokens in the input text, using Gemini token counting API.
+        Return the number of tokens in the input text.
 
-        Falls back to a heuristic estimate if the API call fails.
+        The offline token counter is used unless its estimate is within `count_margin` of the token limit,
+        where an exact count matters. Only then is the Gemini token counting API called, and its result is
+        used to calibrate the offline counter. Falls back to the estimate if the API call fails.
 
         Args:
             text (str): Input text to count tokens for.
@@ -84,12 +355,46 @@ class Gemini(LLM):
         """
         if not text:
             return 0
+        estimate = self._token_counter.count(text)
+        if abs(estimate - self._max_tokens) > self._max_tokens * self._count_margin:
+            return estimate
         try:
-            count = self._client.models.count_tokens(model=self._model_name, contents=text).total_tokens
-            return count or 0
+            get_metrics().increment("token_count_api_calls_total", model=self._model_name)
+            with get_metrics().span("count_tokens", model=self._model_name):
+                count = self._client.models.count_tokens(model=self._model_name, contents=text).total_tokens
         except Exception as e:
-            logger.warning(f"Token counting API failed: {e}. Falling back to heuristic.")
-            return self._estimate_token_count(text)
+            logger.warning(f"Token counting API failed: {e}. Falling back to the local estimate.")
+            return estimate
+        if not count:
+            return estimate
+        self._token_counter.calibrate(text, count)
+        return count
+
+    def _get_output_tokens(self, response: Any, text: str) -> int:
+        """
+        Return the tokens of an answer as reported by the API, or estimated if the response has no usage data.
+
+        Args:
+            response (Any): Response of the Gemini API.
+            text (str): Text of the answer.
+
+        Returns:
+            int: Number of output tokens.
+        """
+        count = getattr(getattr(response, "usage_metadata", None), "candidates_token_count", None)
+        return count if isinstance(count, int) else self._token_counter.count(text)
+
+    def _estimate_token_count(self, text: str) -> int:
+        """
+        Estimate the number of tokens with the offline token counter.
+
+        Args:
+            text (str): The input text.
+
+        Returns:
+            int: Estimated token count.
+        """
+        return max(self._token_counter.count(text), 1)
 
     def get_token_limit(self) -> int:
         """
@@ -99,3 +404,12 @@ class Gemini(LLM):
             int: Maximum token limit configured for Gemini client.
         """
         return self._max_tokens
+
+    def get_model_name(self) -> str:
+        """
+        Return the name of the Gemini model used for generation.
+
+        Returns:
+            str: Model name configured for Gemini client.
+        """
+        return self._model_name
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import weakref
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncRequestLimiter]" = weakref.WeakKeyDictionary()
+
+
+class AsyncRequestLimiter:
+    """
+    Limits the number of asynchronous LLM requests in flight.
+
+    Request and token rates are enforced separately by the model's `RateLimiter`; this limiter only bounds
+    concurrency, so a burst of chunks from many videos cannot open an unbounded number of connections.
+    """
+
+    def __init__(self, max_in_flight: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_in_flight (int): Maximum number of concurrent requests.
+        """
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold an in-flight slot while a request runs, waiting for one to free up if necessary."""
+        async with self._semaphore:
+            yield
+
+
+def get_async_limiter() -> AsyncRequestLimiter:
+    """
+    Return the limiter of the running event loop, creating it on first use.
+
+    Each event loop has its own limiter, as an `asyncio.Semaphore` cannot be shared between loops. The server
+    runs a single loop, so its limit applies to the whole process. The limit is read from `LLM_MAX_IN_FLIGHT`
+    (default 16).
+
+    Returns:
+        AsyncRequestLimiter: Limiter shared by every asynchronous LLM call on the loop.
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = AsyncRequestLimiter(max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", 16)))
+    return limiter
@@ -1,43 +1,657 @@
+import asyncio
+import os
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import AsyncIterator, Callable, Collection, Generator, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import chain, islice
 from logging import Logger
 
-from ytsum.llms.utils import chunk_text
-from ytsum.utils.prompts.prompt_factory import Prompt, get_prompt_generator
+from ytsum.llms.limits import get_async_limiter
+from ytsum.llms.optimizer import choose_parallelism, get_latency_stats, plan_map
+from ytsum.llms.rate_limiter import backoff_delay, get_rate_limiter, get_retry_after, is_quota_error
+from ytsum.llms.segmenters import Segmenter, get_segmenter
+from ytsum.llms.utils import Partial, balance_chunks, chunk_text, group_partials, iter_packed_chunks
+from ytsum.utils.cache import ChunkCache
+from ytsum.utils.metrics import get_metrics
+from ytsum.utils.prompts.prompt_factory import Prompt, get_prompt_generator, get_prompt_preamble
+
+ProgressCallback = Callable[[int, int], None]
+# A level of the tree reduce: the texts to answer, each with whether it must be reduced to fit a prompt first.
+ReduceLevel = list[tuple[str, bool]]
+ReducePlan = Generator[ReduceLevel, list[str], str]
+
+MAX_REDUCE_LEVELS = 10
 
 
 class LLM(ABC):
     """Abstract base class for language models used in summarization workflows."""
 
-    def __init__(self, logger: Logger):
+    def __init__(
+        self,
+        logger: Logger,
+        chunk_cache: ChunkCache | None = None,
+        reduce_fan_in: int = int(os.getenv("LLM_REDUCE_FAN_IN", 4)),
+        segmenter: Segmenter | None = None,
+        max_parallelism: int = int(os.getenv("LLM_MAX_PARALLELISM", 4)),
+        adaptive: bool = os.getenv("LLM_ADAPTIVE_PARALLELISM", "1") == "1",
+    ):
         """
         Initialize the LLM instance with a logger.
 
         Args:
             logger (Logger): Logger instance for capturing debug or runtime information.
+            chunk_cache (ChunkCache | None, optional): Cache of chunk answers reused across runs. Defaults to None.
+            reduce_fan_in (int, optional): Maximum number of partial answers merged by one reduce call.
+                Defaults to 4 or environment variable.
+            segmenter (Segmenter | None, optional): Splitter of long texts into sentences before chunking.
+                Defaults to the one selected by the `TEXT_SEGMENTER` environment variable.
+            max_parallelism (int, optional): Most chunks answered at the same time. Defaults to 4 or environment
+                variable.
+            adaptive (bool, optional): Whether the map-stage parallelism adapts to the model's observed latency
+                and rate limit headroom. Defaults to True, or False if `LLM_ADAPTIVE_PARALLELISM` is "0".
         """
         self._logger = logger
+        self._chunk_cache = chunk_cache
+        self._reduce_fan_in = max(reduce_fan_in, 2)
+        self._segmenter = segmenter or get_segmenter()
+        self._max_parallelism = max(max_parallelism, 1)
+        self._adaptive = adaptive
 
-    def ask_prompt(self, prompt_type: Prompt, text: str) -> str:
+    def ask_prompt(
+        self,
+        prompt_type: Prompt,
+        text: str | Iterable[str],
+        on_progress: ProgressCallback | None = None,
+        spans: Sequence[tuple[int, int]] | None = None,
+        refresh: bool = False,
+    ) -> str:
         """
         Construct and submit a prompt to the language model.
 
-        If the input text exceeds the token limit, it is split into chunks and processed in parallel.
+        If the input text exceeds the token limit, it is split into chunks and processed in parallel, and the
+        chunk answers are merged by a tree reduce before the final call.
+
+        The text may also be given as consecutive pieces, e.g. a transcript while it is being downloaded and
+        parsed. Its chunks are then packed as the pieces arrive and each is submitted as soon as it is complete,
+        so the map stage starts before the whole text is known and the text is never held in full.
+
+        Args:
+            prompt_type (Prompt): The type of prompt to generate.
+            text (str | Iterable[str]): Input text to query the model with, whole or in consecutive pieces.
+            on_progress (ProgressCallback | None, optional): Called with the number of completed and total
+                chunks each time a chunk is answered. Defaults to None.
+            spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of a whole text,
+                as planned by `plan_chunks`, instead of splitting it into sentences. Defaults to None.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers, still caching
+                the new ones. Defaults to False.
+
+        Returns:
+            str: The model's response to the prompt.
+        """
+        prompt_generator = get_prompt_generator(prompt_type)
+        preamble = get_prompt_preamble(prompt_type)
+        return self.ask(
+            prompt_generator(self._map_until_fits(prompt_generator, text, on_progress, spans, preamble, refresh))
+        )
+
+    def ask_prompt_stream(
+        self,
+        prompt_type: Prompt,
+        text: str | Iterable[str],
+        on_progress: ProgressCallback | None = None,
+        spans: Sequence[tuple[int, int]] | None = None,
+        refresh: bool = False,
+    ) -> Iterator[str]:
+        """
+        Streaming variant of `ask_prompt`.
+
+        Chunks are processed as in `ask_prompt`, and the final call's response is yielded piece by piece
+        as the model produces it.
+
+        Args:
+            prompt_type (Prompt): The type of prompt to generate.
+            text (str | Iterable[str]): Input text to query the model with, whole or in consecutive pieces.
+            on_progress (ProgressCallback | None, optional): Called with the number of completed and total
+                chunks each time a chunk is answered. Defaults to None.
+            spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of a whole text,
+                as planned by `plan_chunks`. Defaults to None.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers, still caching
+                the new ones. Defaults to False.
+
+        Yields:
+            str: Consecutive pieces of the model's response.
+        """
+        prompt_generator = get_prompt_generator(prompt_type)
+        preamble = get_prompt_preamble(prompt_type)
+        yield from self.ask_stream(
+            prompt_generator(self._map_until_fits(prompt_generator, text, on_progress, spans, preamble, refresh))
+        )
+
+    def plan_chunks(
+        self, prompt_type: Prompt, text: str, breaks: Sequence[int], preferred: Collection[int] = ()
+    ) -> list[tuple[int, int]]:
+        """
+        Plan balanced chunks of a text that is only split at the given offsets, e.g. caption cue boundaries.
+
+        The plan is made from token estimates alone, so it costs no API calls; `ask_prompt` verifies every
+        chunk once before sending it. Chunks are packed up to the token limit.
+
+        Args:
+            prompt_type (Prompt): The type of prompt the chunks are sent with.
+            text (str): Input text.
+            breaks (Sequence[int]): Offsets in the text where a chunk may start.
+            preferred (Collection[int], optional): Offsets where chunks preferably start, e.g. chapter starts.
+                Defaults to none.
+
+        Returns:
+            list[tuple[int, int]]: Character spans of the chunks, covering the text in order; a single span
+                if the text is estimated to fit within one prompt.
+        """
+        prompt_generator = get_prompt_generator(prompt_type)
+        return balance_chunks(
+            text=text,
+            breaks=breaks,
+            preferred=preferred,
+            max_tokens=self.get_token_limit(),
+            generate_prompt=prompt_generator,
+            estimate_token_count=self._estimate_token_count,
+        )
+
+    async def ask_prompt_async(
+        self, prompt_type: Prompt, text: str, spans: Sequence[tuple[int, int]] | None = None, refresh: bool = False
+    ) -> str:
+        """
+        Asynchronous variant of `ask_prompt`.
+
+        Chunks are submitted concurrently through `ask_async`, so their concurrency is governed by the
+        backend's limits rather than by a per-call thread pool.
 
         Args:
             prompt_type (Prompt): The type of prompt to generate.
             text (str): Input text to query the model with.
+            spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of the text,
+                as planned by `plan_chunks`. Defaults to None.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers, still caching
+                the new ones. Defaults to False.
 
         Returns:
             str: The model's response to the prompt.
         """
         prompt_generator = get_prompt_generator(prompt_type)
-        prompt = prompt_generator(text)
+        preamble = get_prompt_preamble(prompt_type)
+        return await self.ask_async(
+            prompt_generator(await self._map_until_fits_async(prompt_generator, text, spans, preamble, refresh))
+        )
+
+    async def ask_prompt_stream_async(
+        self, prompt_type: Prompt, text: str, spans: Sequence[tuple[int, int]] | None = None, refresh: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of `ask_prompt_async`.
+
+        Chunks are processed as in `ask_prompt_async`, and the final call's response is yielded piece by piece
+        through `ask_stream_async`.
+
+        Args:
+            prompt_type (Prompt): The type of prompt to generate.
+            text (str): Input text to query the model with.
+            spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of the text,
+                as planned by `plan_chunks`. Defaults to None.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers, still caching
+                the new ones. Defaults to False.
+
+        Yields:
+            str: Consecutive pieces of the model's response.
+        """
+        prompt_generator = get_prompt_generator(prompt_type)
+        preamble = get_prompt_preamble(prompt_type)
+        prompt = prompt_generator(await self._map_until_fits_async(prompt_generator, text, spans, preamble, refresh))
+        async for piece in self.ask_stream_async(prompt):
+            yield piece
+
+    def ask_stream(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> Iterator[str]:
+        """
+        Submit a prompt to the model and yield its response as it is produced.
+
+        Backends without a streaming API yield the complete response of `ask` at once.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            max_retries (int): Number of times to retry on failure. Defaults to 5.
+            backoff_seconds (int): Seconds to wait between retries. Defaults to 30.
+
+        Yields:
+            str: Consecutive pieces of the model's response.
+        """
+        yield self.ask(prompt, max_retries, backoff_seconds)
+
+    def ask_with_preamble(self, prompt: str, preamble: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Submit a prompt that starts with a preamble shared by many prompts, e.g. the instructions of every chunk.
+
+        Backends with context caching upload the preamble once and send only the rest of each prompt with a
+        reference to it. Others, and backends whose cache cannot be used, send the whole prompt with `ask`.
+
+        Args:
+            prompt (str): The whole prompt, starting with the preamble.
+            preamble (str): Start of the prompt shared by many prompts, or an empty string for none.
+            max_retries (int): Number of times to retry on failure. Defaults to 5.
+            backoff_seconds (int): Seconds to wait between retries. Defaults to 30.
+
+        Returns:
+            str: The model's response.
+        """
+        return self.ask(prompt, max_retries, backoff_seconds)
+
+    async def ask_async(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Asynchronous variant of `ask`.
+
+        Backends without a native asynchronous client run the blocking `ask` in a worker thread, holding a slot
+        of the event loop's `AsyncRequestLimiter` meanwhile.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            max_retries (int): Number of times to retry on failure. Defaults to 5.
+            backoff_seconds (int): Seconds to wait between retries. Defaults to 30.
+
+        Returns:
+            str: The model's response.
+        """
+        async with get_async_limiter().slot():
+            return await asyncio.to_thread(self.ask, prompt, max_retries, backoff_seconds)
+
+    async def ask_with_preamble_async(
+        self, prompt: str, preamble: str, max_retries: int = 5, backoff_seconds: int = 30
+    ) -> str:
+        """
+        Asynchronous variant of `ask_with_preamble`.
+
+        Backends without context caching send the whole prompt with `ask_async`.
+
+        Args:
+            prompt (str): The whole prompt, starting with the preamble.
+            preamble (str): Start of the prompt shared by many prompts, or an empty string for none.
+            max_retries (int): Number of times to retry on failure. Defaults to 5.
+            backoff_seconds (int): Seconds to wait between retries. Defaults to 30.
+
+        Returns:
+            str: The model's response.
+        """
+        return await self.ask_async(prompt, max_retries, backoff_seconds)
+
+    async def ask_stream_async(
+        self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30
+    ) -> AsyncIterator[str]:
+        """
+        Asynchronous variant of `ask_stream`.
+
+        Backends without a native asynchronous client read each piece of the blocking `ask_stream` in a worker
+        thread, holding a slot of the event loop's `AsyncRequestLimiter` until the response ends.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            max_retries (int): Number of times to retry on failure. Defaults to 5.
+            backoff_seconds (int): Seconds to wait between retries. Defaults to 30.
+
+        Yields:
+            str: Consecutive pieces of the model's response.
+        """
+        async with get_async_limiter().slot():
+            pieces = self.ask_stream(prompt, max_retries, backoff_seconds)
+            while (piece := await asyncio.to_thread(next, pieces, None)) is not None:
+                yield piece
+
+    def _map_until_fits(
+        self,
+        prompt_generator: Callable[[str], str],
+        text: str | Iterable[str],
+        on_progress: ProgressCallback | None,
+        spans: Sequence[tuple[int, int]] | None = None,
+        preamble: str = "",
+        refresh: bool = False,
+    ) -> str:
+        """
+        Reduce text exceeding the token limit to text that fits within a single prompt.
+
+        The text is split into chunks answered in parallel (the map stage), and the answers are merged
+        level by level in groups of at most `reduce_fan_in` (the tree reduce) until their combination fits.
+        Text given in pieces is packed into chunks as the pieces arrive; if it makes up a single chunk, that
+        chunk is returned as the text.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            text (str | Iterable[str]): Input text, whole or in consecutive pieces.
+            on_progress (ProgressCallback | None): Called each time a chunk of the map stage is answered.
+            spans (Sequence[tuple[int, int]] | None, optional): Planned chunks of a whole text, or None to
+                split it into sentences. Defaults to None.
+            preamble (str, optional): Fixed start of every prompt made by `prompt_generator`, sent through
+                `ask_with_preamble`. Defaults to none.
+            refresh (bool, optional): Answer every prompt anew instead of reusing cached answers. Defaults to False.
+
+        Returns:
+            str: Text that fits within a single prompt.
+        """
+        chunks: Iterable[str] | None
+        if isinstance(text, str):
+            chunks = self._plan_text_chunks(prompt_generator, text, spans)
+            if chunks is None:
+                return text
+        else:
+            chunks = self._iter_chunks(prompt_generator, text)
+            # The first chunk waits for the second, as a text of a single chunk needs no map stage.
+            head = list(islice(chunks, 2))
+            if len(head) < 2:
+                return head[0] if head else ""
+            chunks = chain(head, chunks)
+
+        answers = self._map_chunks(prompt_generator, chunks, on_progress, preamble, refresh)
+        plan = self._reduce_levels(prompt_generator, answers)
+        step = _advance(plan, None)
+        while not isinstance(step, str):
+            texts = [
+                (
+                    self._map_until_fits(prompt_generator, text, None, preamble=preamble, refresh=refresh)
+                    if oversized
+                    else text
+                )
+                for text, oversized in step
+            ]
+            step = _advance(plan, self._map_chunks(prompt_generator, texts, None, preamble, refresh))
+        return step
+
+    async def _map_until_fits_async(
+        self,
+        prompt_generator: Callable[[str], str],
+        text: str,
+        spans: Sequence[tuple[int, int]] | None = None,
+        preamble: str = "",
+        refresh: bool = False,
+    ) -> str:
+        """
+        Asynchronous variant of `_map_until_fits` for a whole text.
+
+        Chunking, token counting and the reduce planning run in worker threads, so they never block the event loop.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            text (str): Input text.
+            spans (Sequence[tuple[int, int]] | None, optional): Planned chunks of the text, or None to split it
+                into sentences. Defaults to None.
+            preamble (str, optional): Fixed start of every prompt made by `prompt_generator`, sent through
+                `ask_with_preamble_async`. Defaults to none.
+            refresh (bool, optional): Answer every prompt anew instead of reusing cached answers. Defaults to False.
+
+        Returns:
+            str: Text that fits within a single prompt.
+        """
+        chunks = await asyncio.to_thread(self._plan_text_chunks, prompt_generator, text, spans)
+        if chunks is None:
+            return text
+
+        answers = await self._map_chunks_async(prompt_generator, chunks, preamble, refresh)
+        plan = await asyncio.to_thread(self._reduce_levels, prompt_generator, answers)
+        step = await asyncio.to_thread(_advance, plan, None)
+        while not isinstance(step, str):
+            texts = [
+                (
+                    await self._map_until_fits_async(prompt_generator, text, preamble=preamble, refresh=refresh)
+                    if oversized
+                    else text
+                )
+                for text, oversized in step
+            ]
+            answers = await self._map_chunks_async(prompt_generator, texts, preamble, refresh)
+            step = await asyncio.to_thread(_advance, plan, answers)
+        return step
+
+    def _plan_text_chunks(
+        self, prompt_generator: Callable[[str], str], text: str, spans: Sequence[tuple[int, int]] | None
+    ) -> list[str] | None:
+        """
+        Return the chunks of a whole text: its planned spans if there are several, or else its sentences packed.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            text (str): Input text.
+            spans (Sequence[tuple[int, int]] | None): Planned chunks of the text, or None to split it into sentences.
+
+        Returns:
+            list[str] | None: The chunks, or None if the text fits within a single prompt.
+        """
+        if spans is not None and len(spans) > 1:
+            return self._verify_chunks(prompt_generator, [text[start:end].strip() for start, end in spans])
+        return self._split_into_chunks(prompt_generator, text)
+
+    def _reduce_levels(self, prompt_generator: Callable[[str], str], answers: list[str]) -> ReducePlan:
+        """
+        Plan the tree reduce of the map stage's answers, for both the blocking and the asynchronous driver.
+
+        Every level merges the partial answers in groups of at most `reduce_fan_in`. It is yielded as the texts
+        to answer, and the driver sends their answers back. A group whose first partial alone exceeds the budget
+        is flagged, so the driver reduces it to fit first. Once the partials are estimated to fit into the final
+        prompt, the prompt is counted exactly, as `_verify_chunks` does for chunks. If it is over the limit, the
+        budget is shrunk by the observed ratio, at least enough for one more level, and the level is planned again.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each text.
+            answers (list[str]): Answers of the map stage.
+
+        Raises:
+            RuntimeError: If the partial answers still do not fit after `MAX_REDUCE_LEVELS` levels.
+
+        Yields:
+            ReduceLevel: The texts of the next level, each with whether it must be reduced first.
+
+        Returns:
+            str: Text that fits within the final prompt.
+        """
+        partials = self._to_partials(answers)
+        budget = self._get_reduce_budget(prompt_generator)
+        limit = self.get_token_limit()
+        for level in range(1, MAX_REDUCE_LEVELS + 1):
+            while (groups := self._plan_reduce_level(partials, budget)) is None:
+                text = "\n\n".join(partial.text for partial in partials)
+                tokens = self.get_token_count(prompt_generator(text))
+                if tokens <= limit:
+                    return text
+                self._logger.warning(f"The final prompt has {tokens} tokens, over the limit of {limit}; reducing more.")
+                # Shrink the budget by the observed ratio, at least enough to force one more level.
+                estimate = sum(partial.tokens + 1 for partial in partials)
+                budget = max(min(estimate - 1, budget * limit // tokens), 1)
+
+            answers = yield [
+                ("\n\n".join(partial.text for partial in group), group[0].tokens > budget) for group in groups
+            ]
+            partials = self._to_partials(answers)
+            self._logger.info(f"Reduce level {level}: merged {sum(map(len, groups))} partials into {len(partials)}.")
+
+        raise RuntimeError(f"Partial answers still exceed the token limit after {MAX_REDUCE_LEVELS} reduce levels.")
+
+    def _plan_reduce_level(self, partials: list[Partial], budget: int) -> list[list[Partial]] | None:
+        """
+        Plan the groups merged by the next level of the tree reduce.
+
+        Args:
+            partials (list[Partial]): Partial answers of the previous level.
+            budget (int): Tokens available for the text of a single prompt.
+
+        Returns:
+            list[list[Partial]] | None: Groups to merge, or None if all partials fit into the final prompt.
+        """
+        if sum(partial.tokens + 1 for partial in partials) <= budget:
+            return None
+        groups = group_partials(partials, self._reduce_fan_in, budget)
+        if len(groups) == len(partials):
+            # No two neighbours fit together: condense each partial on its own so the next level can merge them.
+            self._logger.warning("Partial answers are too long to be merged, condensing them individually.")
+        return groups
+
+    def _get_reduce_budget(self, prompt_generator: Callable[[str], str]) -> int:
+        """
+        Return the tokens available for the text of a single prompt, excluding the prompt template.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping the text.
+
+        Returns:
+            int: Token budget.
+        """
+        return self.get_token_limit() - self._estimate_token_count(prompt_generator(""))
+
+    def _to_partials(self, answers: list[str]) -> list[Partial]:
+        """
+        Pair answers with their token counts, estimated once and carried forward through the reduce levels.
+
+        Args:
+            answers (list[str]): Answers of the map stage or of a reduce level.
+
+        Returns:
+            list[Partial]: Partial answers.
+        """
+        return [Partial(answer, self._estimate_token_count(answer)) for answer in answers]
+
+    def _map_chunks(
+        self,
+        prompt_generator: Callable[[str], str],
+        chunks: Iterable[str],
+        on_progress: ProgressCallback | None,
+        preamble: str = "",
+        refresh: bool = False,
+    ) -> list[str]:
+        """
+        Answer every chunk in parallel, reusing cached answers.
+
+        Up to `max_parallelism` chunks are answered at a time, fewer if the model's rate limit quota would only
+        hold the others back.
+
+        Each chunk is submitted as soon as it is taken from `chunks`, so a lazily packed text is answered
+        while the rest of it is still being packed. Until all chunks are known, progress reports count the
+        chunks taken so far as the total. Errors are raised only once every chunk has been submitted, so the
+        answers of the other chunks are still cached for a re-run.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            chunks (Iterable[str]): Chunks of the input text.
+            on_progress (ProgressCallback | None): Called each time a chunk is answered.
+            preamble (str, optional): Fixed start of every chunk prompt. Defaults to none.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers. Defaults to False.
+
+        Returns:
+            list[str]: Answers in chunk order.
+        """
+        answers: list[str] = []
+        futures: dict[Future[str], int] = {}
+        total = len(chunks) if isinstance(chunks, Sequence) else None
+        cached_count = 0
+        completed = 0
+        workers = self._choose_parallelism(prompt_generator, chunks)
+
+        def collect(future: "Future[str]") -> None:
+            nonlocal completed
+            answers[futures.pop(future)] = future.result()
+            completed += 1
+            if on_progress is not None:
+                on_progress(completed, total or len(answers))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, chunk in enumerate(chunks):
+                chunk_prompt = prompt_generator(chunk)
+                cached = None if refresh else self._get_cached_answer(chunk_prompt)
+                answers.append(cached or "")
+                if cached is not None:
+                    cached_count += 1
+                    completed += 1
+                else:
+                    futures[executor.submit(self._ask_chunk, chunk_prompt, preamble)] = index
+                for future in [future for future in futures if future.done() and future.exception() is None]:
+                    collect(future)
+
+            if cached_count:
+                self._logger.info(f"Reusing {cached_count} cached chunk answers.")
+            for future in as_completed(list(futures)):
+                collect(future)
+
+        return answers
+
+    async def _map_chunks_async(
+        self, prompt_generator: Callable[[str], str], chunks: Sequence[str], preamble: str = "", refresh: bool = False
+    ) -> list[str]:
+        """
+        Asynchronous variant of `_map_chunks`, answering at most as many chunks at a time as it would.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            chunks (Sequence[str]): Chunks of the input text.
+            preamble (str, optional): Fixed start of every chunk prompt. Defaults to none.
+            refresh (bool, optional): Answer every chunk anew instead of reusing cached answers. Defaults to False.
+
+        Returns:
+            list[str]: Answers in chunk order.
+        """
+        slots = asyncio.Semaphore(self._choose_parallelism(prompt_generator, chunks))
+
+        async def answer(chunk: str) -> str:
+            async with slots:
+                return await self._ask_chunk_async(prompt_generator(chunk), preamble, refresh)
+
+        return list(await asyncio.gather(*(answer(chunk) for chunk in chunks)))
+
+    def _choose_parallelism(self, prompt_generator: Callable[[str], str], chunks: Iterable[str]) -> int:
+        """
+        Choose how many chunks of a map stage to answer at a time, see `ytsum.llms.optimizer.plan_map`.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            chunks (Iterable[str]): Chunks of the input text, whose size is only used if they are all known.
+
+        Returns:
+            int: Number of chunks answered at a time.
+        """
+        stats = get_latency_stats(self.get_model_name()) if self._adaptive else None
+        rate_limiter = get_rate_limiter(self.get_model_name())
+        if not isinstance(chunks, Sequence) or not chunks:
+            # Chunks still being packed are at most as large as the token limit.
+            total = None
+            workers = choose_parallelism(
+                chunk_count=None,
+                prompt_tokens=self.get_token_limit(),
+                max_parallelism=self._max_parallelism,
+                stats=stats,
+                rate_limiter=rate_limiter,
+            )
+        else:
+            total = len(chunks)
+            workers = plan_map(
+                chunk_count=total,
+                prompt_tokens=max(self._estimate_token_count(prompt_generator(chunk)) for chunk in chunks),
+                template_tokens=self._estimate_token_count(prompt_generator("")),
+                max_tokens=self.get_token_limit(),
+                max_parallelism=self._max_parallelism,
+                fan_in=self._reduce_fan_in,
+                stats=stats,
+                rate_limiter=rate_limiter,
+            ).parallelism
+        if workers < min(total or self._max_parallelism, self._max_parallelism):
+            self._logger.info(f"Answering chunks {workers} at a time, as many as the rate limit quota lets through.")
+        return workers
+
+    def _split_into_chunks(self, prompt_generator: Callable[[str], str], text: str) -> list[str] | None:
+        """
+        Split text that exceeds the token limit into chunks.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            text (str): Input text.
+
+        Returns:
+            list[str] | None: The chunks, or None if the text fits within a single prompt.
+        """
         total_tokens = self.get_token_count(text)
-        self._logger.debug(f"Total token count: {total_tokens}, prompt: {prompt}")
+        self._logger.debug(f"Total token count: {total_tokens}")
 
-        if total_tokens <= self.get_token_limit():
-            return self.ask(prompt)
+        if total_tokens + self.get_token_count(prompt_generator("")) <= self.get_token_limit():
+            return None
 
         chunks = chunk_text(
             text=text,
@@ -45,18 +659,175 @@ class LLM(ABC):
             max_tokens=self.get_token_limit(),
             generate_prompt=prompt_generator,
             estimate_token_count=self._estimate_token_count,
+            segmenter=self._segmenter,
         )
 
         self._logger.debug(f"Text split into {len(chunks)} chunks for summarization.")
+        return chunks
 
-        answers = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(self.ask, prompt_generator(chunk), 5, 30) for chunk in chunks]
-            for future in futures:
-                answers.append(future.result())
+    def _verify_chunks(self, prompt_generator: Callable[[str], str], chunks: list[str]) -> list[str]:
+        """
+        Count the exact tokens of every planned chunk once, splitting the rare chunk over the limit into sentences.
+
+        The prompt template is counted once for all chunks rather than again with every chunk.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            chunks (list[str]): Planned chunks.
+
+        Returns:
+            list[str]: Chunks that fit within a single prompt.
+        """
+        template_tokens = self.get_token_count(prompt_generator(""))
+        verified: list[str] = []
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if template_tokens + self.get_token_count(chunk) <= self.get_token_limit():
+                verified.append(chunk)
+                continue
+            self._logger.warning("A planned chunk exceeds the token limit, splitting it into sentences.")
+            verified.extend(
+                chunk_text(
+                    text=chunk,
+                    get_token_count=self.get_token_count,
+                    max_tokens=self.get_token_limit(),
+                    generate_prompt=prompt_generator,
+                    estimate_token_count=self._estimate_token_count,
+                    segmenter=self._segmenter,
+                )
+            )
+        self._logger.debug(f"Text split into {len(verified)} planned chunks for summarization.")
+        return verified
+
+    def _iter_chunks(self, prompt_generator: Callable[[str], str], pieces: Iterable[str]) -> Iterator[str]:
+        """
+        Pack text arriving in pieces into chunks, yielding each as soon as it is complete.
+
+        Args:
+            prompt_generator (Callable[[str], str]): Generator of the prompt wrapping each chunk.
+            pieces (Iterable[str]): Consecutive pieces of the input text.
+
+        Returns:
+            Iterator[str]: The chunks.
+        """
+        return iter_packed_chunks(
+            sentences=self._segmenter.iter_segments_stream(pieces),
+            get_token_count=self.get_token_count,
+            max_tokens=self.get_token_limit(),
+            generate_prompt=prompt_generator,
+            estimate_token_count=self._estimate_token_count,
+        )
+
+    def _ask_chunk(self, prompt: str, preamble: str = "") -> str:
+        """
+        Ask the model for a single chunk and persist the answer as soon as it arrives.
+
+        Args:
+            prompt (str): The chunk prompt.
+            preamble (str, optional): Fixed start of the chunk prompt. Defaults to none.
+
+        Returns:
+            str: The model's response.
+        """
+        answer = self.ask_with_preamble(prompt, preamble, 5, 30)
+        if self._chunk_cache is not None:
+            self._chunk_cache.put(ChunkCache.make_key(prompt, self.get_model_name()), answer)
+        return answer
+
+    async def _ask_chunk_async(self, prompt: str, preamble: str = "", refresh: bool = False) -> str:
+        """
+        Asynchronous variant of `_ask_chunk`, answering from the chunk cache when possible.
+
+        The chunk cache is read and written in worker threads, so its disk access never blocks the event loop.
+
+        Args:
+            prompt (str): The chunk prompt.
+            preamble (str, optional): Fixed start of the chunk prompt. Defaults to none.
+            refresh (bool, optional): Answer the chunk anew instead of reusing a cached answer. Defaults to False.
+
+        Returns:
+            str: The model's response.
+        """
+        if not refresh and (cached := await asyncio.to_thread(self._get_cached_answer, prompt)) is not None:
+            return cached
+        answer = await self.ask_with_preamble_async(prompt, preamble, 5, 30)
+        if self._chunk_cache is not None:
+            await asyncio.to_thread(self._chunk_cache.put, ChunkCache.make_key(prompt, self.get_model_name()), answer)
+        return answer
+
+    def _get_cached_answer(self, prompt: str) -> str | None:
+        """
+        Return a previously persisted answer to a chunk prompt, if any.
 
-        combined_answers = "\n\n".join(answers)
-        return self.ask_prompt(prompt_type, combined_answers)
+        Args:
+            prompt (str): The chunk prompt.
+
+        Returns:
+            str | None: The cached answer.
+        """
+        if self._chunk_cache is None:
+            return None
+        return self._chunk_cache.get(ChunkCache.make_key(prompt, self.get_model_name()))
+
+    def _get_retry_delay(self, error: Exception, attempt: int, max_retries: int, backoff_seconds: int) -> float:
+        """
+        Decide how long to wait before retrying a failed request, re-raising errors that are not retryable.
+
+        A server retry-after hint also pauses the model's shared rate limiter, so other requests to the model
+        do not hit the exhausted quota in the meantime.
+
+        Args:
+            error (Exception): Error raised by the backend's client.
+            attempt (int): Number of the failed attempt, starting at 1.
+            max_retries (int): Maximum retry attempts.
+            backoff_seconds (int): Upper bound of the exponential backoff.
+
+        Raises:
+            Exception: The error itself if it is not caused by quota exhaustion.
+
+        Returns:
+            float: Delay in seconds.
+        """
+        if not is_quota_error(error):
+            self._logger.error(f"Unexpected API error: {error}")
+            raise error
+
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            get_rate_limiter(self.get_model_name()).pause(retry_after)
+        delay = backoff_delay(attempt, backoff_seconds, retry_after)
+        get_metrics().increment("llm_retries_total", model=self.get_model_name())
+        get_metrics().increment("llm_backoff_seconds_total", delay, model=self.get_model_name())
+        self._logger.warning(f"Quota exceeded (attempt {attempt}/{max_retries}). Retrying in {delay:.1f} seconds...")
+        return delay
+
+    def _record_usage(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        seconds: float | None = None,
+        first_token_seconds: float | None = None,
+    ) -> None:
+        """
+        Add an answered request and its tokens to the process-wide metrics, and its latency to the model's
+        latency statistics that the map-stage parallelism is planned with.
+
+        Args:
+            input_tokens (int): Tokens of the prompt.
+            output_tokens (int): Tokens of the answer.
+            seconds (float | None, optional): Time from sending the request to receiving the whole answer, or
+                None if it was not measured. Defaults to None.
+            first_token_seconds (float | None, optional): Time to the first piece of a streamed answer.
+                Defaults to None.
+        """
+        metrics = get_metrics()
+        model = self.get_model_name()
+        metrics.increment("llm_requests_total", model=model)
+        metrics.increment("llm_input_tokens_total", input_tokens, model=model)
+        metrics.increment("llm_output_tokens_total", output_tokens, model=model)
+        if seconds is not None:
+            get_latency_stats(model).observe(input_tokens, output_tokens, seconds, first_token_seconds)
 
     @abstractmethod
     def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
@@ -86,8 +857,7 @@ class LLM(ABC):
         """
         pass
 
-    @staticmethod
-    def _estimate_token_count(text: str) -> int:
+    def _estimate_token_count(self, text: str) -> int:
         """
         Estimate the number of tokens using a heuristic.
 
@@ -108,3 +878,22 @@ class LLM(ABC):
             int: Token limit for a single input.
         """
         pass
+
+    @abstractmethod
+    def get_model_name(self) -> str:
+        """
+        Return the name of the underlying model.
+
+        Returns:
+            str: Model name, used to key cached results.
+        """
+        pass
+
+
+def _advance(plan: ReducePlan, answers: list[str] | None) -> ReduceLevel | str:
+    """Send the answers of a reduce level to its plan, or start it, returning the next level or the final text."""
+    try:
+        return next(plan) if answers is None else plan.send(answers)
+    except StopIteration as done:
+        text: str = done.value
+        return text
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Generator, Iterator
+
+from ytsum.llms.limits import get_async_limiter
+from ytsum.llms.llm import LLM
+from ytsum.llms.rate_limiter import get_rate_limiter
+from ytsum.llms.segmenters import Segmenter
+from ytsum.utils.cache import ChunkCache
+from ytsum.utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Average length of an English word including the following space, used to pick how many words to sample.
+CHARS_PER_WORD = 6
+
+# Waits of a request before it is answered, ending with the tokens of its prompt and its answer.
+Attempts = Generator[float, None, tuple[int, str]]
+
+
+class QuotaExceededError(RuntimeError):
+    """Simulated quota error of the local backend, retried like the quota errors of real APIs."""
+
+    code = 429
+
+    def __init__(self, retry_after: float | None = None):
+        """
+        Initialize the error.
+
+        Args:
+            retry_after (float | None, optional): Retry-after hint in seconds, or None for none. Defaults to None.
+        """
+        hint = f" (retryDelay: {retry_after}s)" if retry_after is not None else ""
+        super().__init__(f"429 RESOURCE_EXHAUSTED: simulated quota error{hint}")
+
+
+class LocalLLM(LLM):
+    """
+    Deterministic, offline stand-in for a language model, for benchmarks and tests without network access.
+
+    The answer to a prompt is an evenly spaced sample of its words, so it depends only on the prompt and is
+    bounded by `output_tokens`. Latency, generation throughput and quota errors are simulated, so the chunking,
+    concurrency and retry machinery of `LLM` runs as it would against a real backend. Whether an attempt fails
+    with a quota error is decided by the prompt and the attempt number, so runs are reproducible. Tokens are
+    counted as four characters each.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = int(os.getenv("LOCAL_LLM_MAX_INPUT_TOKENS", 6000)),
+        chunk_cache: ChunkCache | None = None,
+        latency_seconds: float = float(os.getenv("LOCAL_LLM_LATENCY_SECONDS", 0)),
+        tokens_per_second: float = float(os.getenv("LOCAL_LLM_TOKENS_PER_SECOND", 0)),
+        output_tokens: int = int(os.getenv("LOCAL_LLM_OUTPUT_TOKENS", 256)),
+        quota_error_rate: float = float(os.getenv("LOCAL_LLM_QUOTA_ERROR_RATE", 0)),
+        retry_after_seconds: float | None = None,
+        segmenter: Segmenter | None = None,
+        model_name: str = "local",
+    ):
+        """
+        Initialize the local model.
+
+        Args:
+            max_tokens (int, optional): Maximum tokens allowed per prompt. Defaults to 6000 or
+                `LOCAL_LLM_MAX_INPUT_TOKENS`.
+            chunk_cache (ChunkCache | None, optional): Cache of chunk answers reused across runs. Defaults to None.
+            latency_seconds (float, optional): Delay before the first token of every answer. Defaults to 0 or
+                `LOCAL_LLM_LATENCY_SECONDS`.
+            tokens_per_second (float, optional): Generation speed after the first token, 0 for instant answers.
+                Defaults to 0 or `LOCAL_LLM_TOKENS_PER_SECOND`.
+            output_tokens (int, optional): Maximum length of an answer. Defaults to 256 or `LOCAL_LLM_OUTPUT_TOKENS`.
+            quota_error_rate (float, optional): Fraction of attempts failing with a quota error. Defaults to 0 or
+                `LOCAL_LLM_QUOTA_ERROR_RATE`.
+            retry_after_seconds (float | None, optional): Retry-after hint of the quota errors. Defaults to None.
+            segmenter (Segmenter | None, optional): Splitter of long texts into sentences before chunking.
+                Defaults to the one selected by the `TEXT_SEGMENTER` environment variable.
+            model_name (str, optional): Name under which answers are cached and rate limited. Defaults to "local".
+        """
+        super().__init__(logger, chunk_cache, segmenter=segmenter)
+        self._max_tokens = max_tokens
+        self._latency_seconds = latency_seconds
+        self._tokens_per_second = tokens_per_second
+        self._output_chars = max(output_tokens, 1) * CHARS_PER_TOKEN
+        self._quota_error_rate = quota_error_rate
+        self._retry_after_seconds = retry_after_seconds
+        self._model_name = model_name
+        self._usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "quota_errors": 0}
+        self._usage_lock = threading.Lock()
+
+    def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Answer a prompt after the simulated latency and generation time, retrying simulated quota errors.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            ValueError: If the prompt exceeds the token limit.
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+
+        Returns:
+            str: The answer.
+        """
+        attempts = self._attempt(prompt, max_retries, backoff_seconds)
+        while not isinstance(step := _advance(attempts), tuple):
+            time.sleep(step)
+        tokens, answer = step
+        sent = time.perf_counter()
+        with get_metrics().span("llm_generate", model=self._model_name):
+            time.sleep(self._latency_seconds + self._generation_seconds(answer))
+        self._record_usage(tokens, self.get_token_count(answer), time.perf_counter() - sent)
+        return answer
+
+    def ask_stream(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> Iterator[str]:
+        """
+        Streaming variant of `ask`, yielding the answer word by word at the simulated generation speed.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            ValueError: If the prompt exceeds the token limit.
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+
+        Yields:
+            str: Consecutive pieces of the answer.
+        """
+        attempts = self._attempt(prompt, max_retries, backoff_seconds)
+        while not isinstance(step := _advance(attempts), tuple):
+            time.sleep(step)
+        tokens, answer = step
+        sent = time.perf_counter()
+        with get_metrics().span("llm_generate", model=self._model_name):
+            time.sleep(self._latency_seconds)
+            first_token_seconds = time.perf_counter() - sent
+            for i, word in enumerate(answer.split(" ")):
+                if i:
+                    time.sleep(self._generation_seconds(word))
+                yield word if i == 0 else f" {word}"
+        self._record_usage(tokens, self.get_token_count(answer), time.perf_counter() - sent, first_token_seconds)
+
+    async def ask_async(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Asynchronous variant of `ask`, simulating latency without blocking a thread.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            ValueError: If the prompt exceeds the token limit.
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+
+        Returns:
+            str: The answer.
+        """
+        attempts = self._attempt(prompt, max_retries, backoff_seconds)
+        while not isinstance(step := _advance(attempts), tuple):
+            await asyncio.sleep(step)
+        tokens, answer = step
+        async with get_async_limiter().slot():
+            sent = time.perf_counter()
+            with get_metrics().span("llm_generate", model=self._model_name):
+                await asyncio.sleep(self._latency_seconds + self._generation_seconds(answer))
+        self._record_usage(tokens, self.get_token_count(answer), time.perf_counter() - sent)
+        return answer
+
+    def _attempt(self, prompt: str, max_retries: int, backoff_seconds: int) -> Attempts:
+        """
+        Build the answer to a prompt, retrying simulated quota errors, for the blocking and asynchronous requests.
+
+        Every wait, for the rate limiter or before a retry, is yielded in seconds for the caller to sleep through
+        in its own way.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int): Maximum retry attempts on quota exhaustion.
+            backoff_seconds (int): Upper bound of the wait between retries in seconds.
+
+        Raises:
+            ValueError: If the prompt exceeds the token limit, as real APIs reject such prompts.
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+
+        Yields:
+            float: Seconds to wait before going on.
+
+        Returns:
+            tuple[int, str]: Tokens of the prompt and the answer.
+        """
+        tokens = self.get_token_count(prompt)
+        if tokens > self._max_tokens:
+            raise ValueError(f"The prompt of {tokens} tokens exceeds the limit of {self._max_tokens} tokens.")
+        rate_limiter = get_rate_limiter(self._model_name)
+        for attempt in range(1, max_retries + 1):
+            delay = rate_limiter.reserve(tokens)
+            if delay > 0:
+                get_metrics().increment("rate_limit_wait_seconds_total", delay)
+                yield delay
+            try:
+                return tokens, self._answer(prompt, attempt)
+            except QuotaExceededError as e:
+                yield self._get_retry_delay(e, attempt, max_retries, backoff_seconds)
+        raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
+
+    def get_usage(self) -> dict[str, int]:
+        """
+        Return the totals of every request answered or rejected so far.
+
+        Returns:
+            dict[str, int]: Answered calls, their input and output tokens, and simulated quota errors.
+        """
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def get_token_count(self, text: str) -> int:
+        """
+        Return the number of tokens in a text, counting four characters per token.
+
+        Args:
+            text (str): Input text to count tokens for.
+
+        Returns:
+            int: Number of tokens.
+        """
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def _estimate_token_count(self, text: str) -> int:
+        """
+        Estimate the number of tokens, which is exact for the local model.
+
+        Args:
+            text (str): The input text.
+
+        Returns:
+            int: Token count.
+        """
+        return max(self.get_token_count(text), 1)
+
+    def get_token_limit(self) -> int:
+        """
+        Return the maximum number of tokens allowed per input prompt.
+
+        Returns:
+            int: Maximum token limit of the local model.
+        """
+        return self._max_tokens
+
+    def get_model_name(self) -> str:
+        """
+        Return the name of the local model.
+
+        Returns:
+            str: Model name.
+        """
+        return self._model_name
+
+    def _answer(self, prompt: str, attempt: int) -> str:
+        """Build the answer to a prompt, or raise the simulated quota error of the attempt, and count its usage."""
+        tokens = self.get_token_count(prompt)
+        if self._quota_error_rate and random.Random(f"{attempt}:{prompt}").random() < self._quota_error_rate:
+            with self._usage_lock:
+                self._usage["quota_errors"] += 1
+            raise QuotaExceededError(self._retry_after_seconds)
+
+        words = prompt.split()
+        answer = " ".join(words[:: max(len(words) * CHARS_PER_WORD // self._output_chars, 1)])
+        if len(answer) > self._output_chars:
+            answer = answer[: answer.rfind(" ", 0, self._output_chars + 1)].rstrip() or answer[: self._output_chars]
+        answer = answer or "."
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["input_tokens"] += tokens
+            self._usage["output_tokens"] += self.get_token_count(answer)
+        return answer
+
+    def _generation_seconds(self, text: str) -> float:
+        """Return the simulated time needed to generate a text."""
+        if not self._tokens_per_second:
+            return 0.0
+        return self.get_token_count(text) / self._tokens_per_second
+
+
+def _advance(attempts: Attempts) -> float | tuple[int, str]:
+    """Return the next wait of a request, or its prompt tokens and answer once it is answered."""
+    try:
+        return next(attempts)
+    except StopIteration as done:
+        result: tuple[int, str] = done.value
+        return result
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from typing import Any
+
+from ytsum.llms.llm import LLM
+from ytsum.llms.rate_limiter import get_rate_limiter
+from ytsum.llms.segmenters import Segmenter
+from ytsum.llms.tokenizer import CharRatioTokenCounter, TokenCounter
+from ytsum.utils.cache import ChunkCache
+from ytsum.utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatible(LLM):
+    """
+    Adapter for any server implementing the OpenAI chat completions API, e.g. a local inference server.
+
+    Requests are sent with `urllib` from the standard library, so no client package is needed. Tokens are
+    estimated offline, as such servers rarely offer a token counting endpoint, and HTTP 429 responses are
+    retried like the quota errors of the Gemini API, honouring their `Retry-After` header.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = int(os.getenv("OPENAI_LLM_MAX_INPUT_TOKENS", 6000)),
+        chunk_cache: ChunkCache | None = None,
+        token_counter: TokenCounter | None = None,
+        segmenter: Segmenter | None = None,
+        base_url: str = os.getenv("OPENAI_BASE_URL", "http://localhost:8080/v1"),
+        timeout_seconds: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 600)),
+    ):
+        """
+        Initialize the adapter.
+
+        Args:
+            max_tokens (int, optional): Maximum tokens allowed per prompt. Defaults to 6000 or
+                `OPENAI_LLM_MAX_INPUT_TOKENS`.
+            chunk_cache (ChunkCache | None, optional): Cache of chunk answers reused across runs. Defaults to None.
+            token_counter (TokenCounter | None, optional): Offline token counter. Defaults to a chars-per-token
+                ratio persisted for the model.
+            segmenter (Segmenter | None, optional): Splitter of long texts into sentences before chunking.
+                Defaults to the one selected by the `TEXT_SEGMENTER` environment variable.
+            base_url (str, optional): Base URL of the API, up to and including the version, e.g.
+                "http://localhost:8080/v1". Defaults to `OPENAI_BASE_URL`.
+            timeout_seconds (float, optional): Timeout of a single request. Defaults to 600 or
+                `OPENAI_TIMEOUT_SECONDS`.
+        """
+        super().__init__(logger, chunk_cache, segmenter=segmenter)
+        self._max_tokens = max_tokens
+        self._url = base_url.rstrip("/") + "/chat/completions"
+        self._timeout_seconds = timeout_seconds
+        self._api_key = os.getenv("OPENAI_API_KEY")
+        self._model_name = os.getenv("OPENAI_MODEL_NAME", "default")
+        self._token_counter = token_counter or CharRatioTokenCounter(self._model_name)
+        logger.info(f"OpenAI-compatible backend initialized for {self._url} with max token limit: {max_tokens}")
+
+    def ask(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> str:
+        """
+        Send a prompt to the chat completions endpoint and return the answer, retrying on quota errors.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            urllib.error.URLError: On unexpected HTTP or connection errors.
+
+        Returns:
+            str: The model's response text.
+        """
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Calling {self._model_name} with a prompt of ~{tokens} tokens")
+        rate_limiter = get_rate_limiter(self._model_name)
+
+        for attempt in range(1, max_retries + 1):
+            rate_limiter.acquire(tokens)
+            try:
+                sent = time.perf_counter()
+                with get_metrics().span("llm_generate", model=self._model_name):
+                    with self._post(prompt, stream=False) as response:
+                        body = json.load(response)
+                text = body["choices"][0]["message"]["content"]
+                if not text or not text.strip():
+                    raise ValueError(f"Empty response from model {self._model_name}.")
+                output_tokens = (body.get("usage") or {}).get("completion_tokens")
+                output_tokens = output_tokens or self._token_counter.count(text)
+                self._record_usage(tokens, output_tokens, time.perf_counter() - sent)
+                return str(text).strip()
+            except urllib.error.HTTPError as e:
+                # The error holds the open response, which must be closed before the connection can be reused.
+                with e:
+                    delay = self._get_retry_delay(e, attempt, max_retries, backoff_seconds)
+                time.sleep(delay)
+
+        raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
+
+    def ask_stream(self, prompt: str, max_retries: int = 5, backoff_seconds: int = 30) -> Iterator[str]:
+        """
+        Send a prompt to the chat completions endpoint and yield the answer as server-sent events arrive.
+
+        Quota errors are retried as in `ask`; the response is only read once the server has accepted the request,
+        so nothing has been yielded when a retry happens.
+
+        Args:
+            prompt (str): The input prompt string.
+            max_retries (int, optional): Maximum retry attempts on quota exhaustion. Defaults to 5.
+            backoff_seconds (int, optional): Upper bound of the wait between retries in seconds. Defaults to 30.
+
+        Raises:
+            RuntimeError: If all retry attempts fail due to quota exhaustion.
+            urllib.error.URLError: On unexpected HTTP or connection errors.
+
+        Yields:
+            str: Consecutive pieces of the model's response text.
+        """
+        tokens = self._token_counter.count(prompt)
+        logger.debug(f"Streaming {self._model_name} response to a prompt of ~{tokens} tokens")
+        rate_limiter = get_rate_limiter(self._model_name)
+
+        for attempt in range(1, max_retries + 1):
+            rate_limiter.acquire(tokens)
+            sent = time.perf_counter()
+            try:
+                response = self._post(prompt, stream=True)
+            except urllib.error.HTTPError as e:
+                # The error holds the open response, which must be closed before the connection can be reused.
+                with e:
+                    delay = self._get_retry_delay(e, attempt, max_retries, backoff_seconds)
+                time.sleep(delay)
+                continue
+
+            started = False
+            first_token_seconds = None
+            output: list[str] = []
+            with response, get_metrics().span("llm_generate", model=self._model_name):
+                for line in response:
+                    data = line.decode("utf-8").strip()
+                    if not data.startswith("data:"):
+                        continue
+                    data = data[len("data:") :].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = (choices[0].get("delta") or {}).get("content") or ""
+                    if not started:
+                        text = text.lstrip()
+                    if text:
+                        if not started:
+                            first_token_seconds = time.perf_counter() - sent
+                        started = True
+                        output.append(text)
+                        yield text
+            if not started:
+                raise ValueError(f"Empty response from model {self._model_name}.")
+            output_tokens = self._token_counter.count("".join(output))
+            self._record_usage(tokens, output_tokens, time.perf_counter() - sent, first_token_seconds)
+            return
+
+        raise RuntimeError("Failed to get response after multiple retries due to quota exhaustion.")
+
+    def get_token_count(self, text: str) -> int:
+        """
+        Return the estimated number of tokens in the input text.
+
+        Args:
+            text (str): Input text to count tokens for.
+
+        Returns:
+            int: Number of tokens estimated by the offline token counter.
+        """
+        return self._token_counter.count(text) if text else 0
+
+    def _estimate_token_count(self, text: str) -> int:
+        """
+        Estimate the number of tokens with the offline token counter.
+
+        Args:
+            text (str): The input text.
+
+        Returns:
+            int: Estimated token count.
+        """
+        return max(self._token_counter.count(text), 1)
+
+    def get_token_limit(self) -> int:
+        """
+        Return the maximum number of tokens allowed per input prompt.
+
+        Returns:
+            int: Maximum token limit configured for the model.
+        """
+        return self._max_tokens
+
+    def get_model_name(self) -> str:
+        """
+        Return the name of the model requested from the server.
+
+        Returns:
+            str: Model name configured by `OPENAI_MODEL_NAME`.
+        """
+        return self._model_name
+
+    def _post(self, prompt: str, stream: bool) -> Any:
+        """Send a chat completion request and return the open HTTP response."""
+        payload = {"model": self._model_name, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        headers = {"Content-Type": "application/json"}
+        if self._api_key:
+            headers["Authorization"] = f"Bearer {self._api_key}"
+        request = urllib.request.Request(self._url, data=json.dumps(payload).encode("utf-8"), headers=headers)
+        return urllib.request.urlopen(request, timeout=self._timeout_seconds)
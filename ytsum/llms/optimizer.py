@@ -0,0 +1,334 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from typing import NamedTuple
+
+from ytsum import config
+from ytsum.config import LATENCY_STATS_PATH
+from ytsum.llms.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Requests a model must have answered before its latency statistics are trusted to plan a job.
+MIN_LATENCY_SAMPLES = 3
+
+_stats: dict[str, "LatencyStats"] = {}
+_stats_lock = threading.Lock()
+
+
+class LatencyStats:
+    """
+    Exponentially weighted latency statistics of a model's requests.
+
+    Request latency is fitted as a fixed cost plus a cost per input token by weighted least squares, so recent
+    requests count most. The mean time to first token of streamed answers and the mean answer length are kept
+    alongside. When all requests had about the same size, the fixed cost is taken from the time to first token,
+    or the whole latency is treated as fixed if no answer was streamed. The statistics are thread-safe.
+
+    The statistics of a named model are persisted in a JSON file shared by all models, so a model's latency
+    learned in one run plans the next ones.
+    """
+
+    _file_lock = threading.Lock()
+
+    def __init__(self, model_name: str | None = None, path: str = LATENCY_STATS_PATH, decay: float = 0.95):
+        """
+        Initialize the statistics, loading those previously persisted for the model.
+
+        Args:
+            model_name (str | None, optional): Model whose requests are observed, or None to keep the statistics
+                in memory only. Defaults to None.
+            path (str, optional): JSON file with the persisted statistics. Defaults to `LATENCY_STATS_PATH`.
+            decay (float, optional): Weight kept by the previous samples each time a sample is added.
+                Defaults to 0.95.
+        """
+        self._model_name = model_name
+        self._path = path
+        self._decay = decay
+        totals = self._load().get(model_name, {}) if model_name is not None else {}
+        self._weight = float(totals.get("weight", 0.0))
+        self._tokens = float(totals.get("tokens", 0.0))
+        self._seconds = float(totals.get("seconds", 0.0))
+        self._tokens_squared = float(totals.get("tokens_squared", 0.0))
+        self._tokens_seconds = float(totals.get("tokens_seconds", 0.0))
+        self._output_tokens = float(totals.get("output_tokens", 0.0))
+        self._first_token_weight = float(totals.get("first_token_weight", 0.0))
+        self._first_token_seconds = float(totals.get("first_token_seconds", 0.0))
+        self._samples = int(totals.get("samples", 0))
+        self._lock = threading.Lock()
+
+    def observe(
+        self, input_tokens: int, output_tokens: int, seconds: float, first_token_seconds: float | None = None
+    ) -> None:
+        """
+        Add an answered request, persisting the statistics of a named model.
+
+        Args:
+            input_tokens (int): Tokens of the prompt.
+            output_tokens (int): Tokens of the answer.
+            seconds (float): Time from sending the request to receiving the whole answer.
+            first_token_seconds (float | None, optional): Time to the first piece of a streamed answer, or None
+                for answers received at once. Defaults to None.
+        """
+        with self._lock:
+            d = self._decay
+            self._weight = self._weight * d + 1
+            self._tokens = self._tokens * d + input_tokens
+            self._seconds = self._seconds * d + seconds
+            self._tokens_squared = self._tokens_squared * d + input_tokens * input_tokens
+            self._tokens_seconds = self._tokens_seconds * d + input_tokens * seconds
+            self._output_tokens = self._output_tokens * d + output_tokens
+            if first_token_seconds is not None:
+                self._first_token_weight = self._first_token_weight * d + 1
+                self._first_token_seconds = self._first_token_seconds * d + first_token_seconds
+            self._samples += 1
+            if self._model_name is not None:
+                with self._file_lock:
+                    stats = self._load()
+                    stats[self._model_name] = {
+                        "weight": self._weight,
+                        "tokens": self._tokens,
+                        "seconds": self._seconds,
+                        "tokens_squared": self._tokens_squared,
+                        "tokens_seconds": self._tokens_seconds,
+                        "output_tokens": self._output_tokens,
+                        "first_token_weight": self._first_token_weight,
+                        "first_token_seconds": self._first_token_seconds,
+                        "samples": self._samples,
+                    }
+                    self._save(stats)
+
+    @property
+    def samples(self) -> int:
+        """Number of requests observed."""
+        return self._samples
+
+    @property
+    def time_to_first_token(self) -> float | None:
+        """Mean time to the first piece of a streamed answer, or None if no answer was streamed."""
+        with self._lock:
+            return self._first_token_seconds / self._first_token_weight if self._first_token_weight else None
+
+    @property
+    def output_tokens(self) -> float:
+        """Mean length of an answer in tokens."""
+        with self._lock:
+            return self._output_tokens / self._weight if self._weight else 0.0
+
+    def fit(self) -> tuple[float, float]:
+        """
+        Fit request latency to the input size.
+
+        Returns:
+            tuple[float, float]: Fixed seconds per request and seconds per input token, both non-negative.
+        """
+        with self._lock:
+            if not self._weight:
+                return 0.0, 0.0
+            mean_tokens = self._tokens / self._weight
+            mean_seconds = self._seconds / self._weight
+            variance = self._tokens_squared / self._weight - mean_tokens**2
+            if variance > (0.05 * mean_tokens) ** 2:
+                per_token = (self._tokens_seconds / self._weight - mean_tokens * mean_seconds) / variance
+                per_token = max(per_token, 0.0)
+                return max(mean_seconds - per_token * mean_tokens, 0.0), per_token
+            if self._first_token_weight and mean_tokens:
+                fixed = min(self._first_token_seconds / self._first_token_weight, mean_seconds)
+                return fixed, (mean_seconds - fixed) / mean_tokens
+            return mean_seconds, 0.0
+
+    def predict(self, input_tokens: float) -> float:
+        """
+        Predict the latency of a request.
+
+        Args:
+            input_tokens (float): Tokens of the prompt.
+
+        Returns:
+            float: Expected seconds until the whole answer is received.
+        """
+        fixed, per_token = self.fit()
+        return fixed + per_token * input_tokens
+
+    def _load(self) -> dict[str, dict[str, float]]:
+        """Read the persisted statistics of all models."""
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data: dict[str, dict[str, float]] = json.load(f)
+                return data
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, stats: dict[str, dict[str, float]]) -> None:
+        """Atomically write the statistics of all models."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"Could not persist latency statistics to {self._path}: {e}")
+
+
+class MapPlan(NamedTuple):
+    """Concurrency of the map stage of a job, with the wall time expected for the whole job."""
+
+    parallelism: int
+    chunks: int
+    expected_seconds: float
+
+
+def get_latency_stats(model_name: str) -> LatencyStats:
+    """
+    Return the process-wide latency statistics of a model, loading those of earlier runs on first use.
+
+    Args:
+        model_name (str): Model whose requests the statistics describe.
+
+    Returns:
+        LatencyStats: Statistics shared by every request to the model.
+    """
+    with _stats_lock:
+        stats = _stats.get(model_name)
+        if stats is None:
+            # Looked up on every call, so tests and benchmarks can point it elsewhere.
+            stats = _stats[model_name] = LatencyStats(model_name, config.LATENCY_STATS_PATH)
+        return stats
+
+
+def plan_map(
+    *,
+    chunk_count: int,
+    prompt_tokens: int,
+    template_tokens: int,
+    max_tokens: int,
+    max_parallelism: int,
+    fan_in: int,
+    stats: LatencyStats | None,
+    rate_limiter: RateLimiter,
+) -> MapPlan:
+    """
+    Choose the parallelism of a map stage and price the job with the model's latency statistics.
+
+    The chunks are planned beforehand as the fewest that fit the model's limit, never from the statistics, so
+    a job is split the same way in every run and the chunk cache and the sections of a cached summary stay
+    valid. Only how many chunks are answered at a time adapts, see `choose_parallelism`. With enough
+    statistics, the expected wall time is the waves of map calls or the wait for quota beyond the rate
+    limiter's headroom, plus the reduce levels and final call needed to merge the answers. The decision is
+    logged.
+
+    Args:
+        chunk_count (int): Number of chunks.
+        prompt_tokens (int): Tokens of the largest chunk prompt.
+        template_tokens (int): Tokens of the prompt template wrapping every chunk.
+        max_tokens (int): Hard limit of tokens per prompt.
+        max_parallelism (int): Most chunks answered at the same time.
+        fan_in (int): Most partial answers merged by one reduce call.
+        stats (LatencyStats | None): Latency statistics of the model, or None not to adapt the plan.
+        rate_limiter (RateLimiter): Rate limiter of the model.
+
+    Returns:
+        MapPlan: The chosen parallelism, with an expected wall time of 0 without enough statistics.
+    """
+    parallelism = choose_parallelism(
+        chunk_count=chunk_count,
+        prompt_tokens=prompt_tokens,
+        max_parallelism=max_parallelism,
+        stats=stats,
+        rate_limiter=rate_limiter,
+    )
+    if stats is None or stats.samples < MIN_LATENCY_SAMPLES:
+        return MapPlan(parallelism, chunk_count, 0.0)
+
+    budget = max(max_tokens - template_tokens, 1)
+    seconds = _expected_seconds(
+        chunk_count, prompt_tokens, parallelism, budget, template_tokens, fan_in, stats, rate_limiter
+    )
+    fixed, per_token = stats.fit()
+    logger.info(
+        f"Map plan: {chunk_count} chunks of up to {prompt_tokens} tokens, {parallelism} in parallel, "
+        f"expected {seconds:.1f}s. Latency {fixed:.2f}s + {per_token * 1000:.3f}s per 1000 tokens, "
+        f"rate limit headroom {rate_limiter.headroom():.0%}."
+    )
+    return MapPlan(parallelism, chunk_count, seconds)
+
+
+def choose_parallelism(
+    *,
+    chunk_count: int | None,
+    prompt_tokens: int,
+    max_parallelism: int,
+    stats: LatencyStats | None,
+    rate_limiter: RateLimiter,
+) -> int:
+    """
+    Choose how many chunks to answer at the same time.
+
+    Up to `max_parallelism` chunks run at once, but no more than the quota lets through: the requests the rate
+    limiter's headroom admits right away, or else those its quota sustains during one request's latency.
+    Further requests would only wait on the rate limiter while holding a worker.
+
+    Args:
+        chunk_count (int | None): Number of chunks, or None if they are still being packed.
+        prompt_tokens (int): Tokens of a chunk prompt.
+        max_parallelism (int): Most chunks answered at the same time.
+        stats (LatencyStats | None): Latency statistics of the model, or None not to adapt the parallelism.
+        rate_limiter (RateLimiter): Rate limiter of the model.
+
+    Returns:
+        int: Number of workers, at least 1.
+    """
+    parallelism = max(min(chunk_count or max_parallelism, max_parallelism), 1)
+    latency = stats.predict(prompt_tokens) if stats is not None and stats.samples >= MIN_LATENCY_SAMPLES else 0.0
+    requests_per_minute = rate_limiter.requests_per_minute
+    tokens_per_minute = rate_limiter.tokens_per_minute
+    if not latency or not (requests_per_minute or tokens_per_minute):
+        return parallelism
+
+    headroom = rate_limiter.headroom()
+    admitted = math.inf
+    if requests_per_minute:
+        admitted = min(admitted, max(headroom * requests_per_minute, requests_per_minute * latency / 60))
+    if tokens_per_minute:
+        admitted = min(admitted, max(headroom * tokens_per_minute, tokens_per_minute * latency / 60) / prompt_tokens)
+    return max(min(parallelism, math.floor(admitted)), 1)
+
+
+def _expected_seconds(
+    chunks: int,
+    prompt_tokens: int,
+    parallelism: int,
+    budget: int,
+    template_tokens: int,
+    fan_in: int,
+    stats: LatencyStats,
+    rate_limiter: RateLimiter,
+) -> float:
+    """Return the expected wall time of a job: its map waves or quota wait, its reduce levels and final call."""
+    latency = stats.predict(prompt_tokens)
+    seconds = max(
+        math.ceil(chunks / parallelism) * latency, _quota_wait(rate_limiter, chunks, chunks * prompt_tokens) + latency
+    )
+
+    answer_tokens = max(stats.output_tokens, 1.0)
+    partials = chunks
+    while partials > 1 and partials * answer_tokens > budget:
+        partials = math.ceil(partials / max(fan_in, 2))
+        seconds += stats.predict(template_tokens + min(fan_in * answer_tokens, budget))
+    return seconds + stats.predict(template_tokens + min(partials * answer_tokens, budget))
+
+
+def _quota_wait(rate_limiter: RateLimiter, requests: int, tokens: int) -> float:
+    """Return the seconds the rate limiter delays the last of the requests beyond its current headroom."""
+    headroom = rate_limiter.headroom()
+    wait = 0.0
+    if rate_limiter.requests_per_minute:
+        per_minute = rate_limiter.requests_per_minute
+        wait = max(wait, (requests - headroom * per_minute) * 60 / per_minute)
+    if rate_limiter.tokens_per_minute:
+        per_minute = rate_limiter.tokens_per_minute
+        wait = max(wait, (tokens - headroom * per_minute) * 60 / per_minute)
+    return wait
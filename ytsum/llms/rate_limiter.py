@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from ytsum.utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 2.0
+
+_RETRY_DELAY_PATTERN = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+_limiters: dict[str, "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Client-side token-bucket limiter of requests per minute and input tokens per minute.
+
+    Every request reserves one request and its estimated tokens up front and is told how long to wait before
+    sending. Reservations may drive a bucket into debt, so concurrent callers are spread out at the configured
+    rate instead of all waking up at the same moment. A server retry-after hint pauses every caller of the
+    limiter until it expires. The limiter is thread-safe and serves both blocking and asynchronous callers.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """
+        Initialize the limiter with full buckets.
+
+        Args:
+            requests_per_minute (int, optional): Request quota, 0 for no limit. Defaults to 0.
+            tokens_per_minute (int, optional): Input token quota, 0 for no limit. Defaults to 0.
+        """
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def requests_per_minute(self) -> int:
+        """Request quota, 0 for no limit."""
+        return self._requests_per_minute
+
+    @property
+    def tokens_per_minute(self) -> int:
+        """Input token quota, 0 for no limit."""
+        return self._tokens_per_minute
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve quota for a request and return how long the caller must wait before sending it.
+
+        Args:
+            tokens (int): Estimated input tokens of the request.
+
+        Returns:
+            float: Delay in seconds, 0 if the request may be sent immediately.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = max(self._paused_until - now, 0.0)
+            if self._requests_per_minute:
+                self._requests -= 1
+                delay = max(delay, -self._requests * 60 / self._requests_per_minute)
+            if self._tokens_per_minute:
+                self._tokens -= min(tokens, self._tokens_per_minute)
+                delay = max(delay, -self._tokens * 60 / self._tokens_per_minute)
+            return delay
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Block until a request of the given size may be sent.
+
+        Args:
+            tokens (int): Estimated input tokens of the request.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            logger.debug(f"Rate limiter delaying request by {delay:.2f} seconds")
+            get_metrics().increment("rate_limit_wait_seconds_total", delay)
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """
+        Wait asynchronously until a request of the given size may be sent.
+
+        Args:
+            tokens (int): Estimated input tokens of the request.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            logger.debug(f"Rate limiter delaying request by {delay:.2f} seconds")
+            get_metrics().increment("rate_limit_wait_seconds_total", delay)
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back every request of the limiter for the given time, e.g. after a server retry-after hint.
+
+        Args:
+            seconds (float): Pause duration.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def headroom(self) -> float:
+        """
+        Return the fraction of the tightest quota currently available.
+
+        Returns:
+            float: Value between 0 (exhausted or in debt) and 1 (full or unlimited).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            fractions = [1.0]
+            if self._requests_per_minute:
+                fractions.append(self._requests / self._requests_per_minute)
+            if self._tokens_per_minute:
+                fractions.append(self._tokens / self._tokens_per_minute)
+            return max(min(fractions), 0.0)
+
+    def _refill(self, now: float) -> None:
+        """Refill both buckets for the time elapsed since the last update. Must hold the lock."""
+        elapsed_minutes = (now - self._updated) / 60
+        self._requests = min(self._requests + elapsed_minutes * self._requests_per_minute, self._requests_per_minute)
+        self._tokens = min(self._tokens + elapsed_minutes * self._tokens_per_minute, self._tokens_per_minute)
+        self._updated = now
+
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    """
+    Return the process-wide rate limiter of a model, creating it on first use.
+
+    Quotas are read from `LLM_REQUESTS_PER_MINUTE` and `LLM_TOKENS_PER_MINUTE` (default 0, no limit).
+
+    Args:
+        model_name (str): Model whose quota the limiter enforces.
+
+    Returns:
+        RateLimiter: Limiter shared by every request to the model.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = _limiters[model_name] = RateLimiter(
+                requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", 0)),
+                tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", 0)),
+            )
+        return limiter
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Return True if an API error reports an exhausted quota.
+
+    Args:
+        error (Exception): Error raised by the API client.
+
+    Returns:
+        bool: Whether the request may succeed after waiting.
+    """
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """
+    Extract the server's retry-after hint from an API error.
+
+    Both the `Retry-After` HTTP header, of the error's response or of an `urllib` HTTP error itself, and the
+    `RetryInfo.retryDelay` field of Google API errors are supported.
+
+    Args:
+        error (Exception): Error raised by the API client.
+
+    Returns:
+        float | None: Seconds to wait, or None if the server gave no hint.
+    """
+    response: Any = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        header = headers.get("retry-after")
+        if header is not None:
+            return float(header)
+    except (TypeError, ValueError):
+        pass
+
+    match = _RETRY_DELAY_PATTERN.search(str(getattr(error, "details", None) or error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, max_seconds: float, retry_after: float | None = None) -> float:
+    """
+    Return the wait before retrying a failed request.
+
+    Honours the server's hint plus a small jitter when there is one, and otherwise uses exponential
+    backoff with full jitter capped at `max_seconds`.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 1.
+        max_seconds (float): Upper bound of the exponential backoff.
+        retry_after (float | None, optional): Server retry-after hint in seconds. Defaults to None.
+
+    Returns:
+        float: Delay in seconds.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE_SECONDS)
+    return random.uniform(0, min(max_seconds, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
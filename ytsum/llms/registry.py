@@ -0,0 +1,40 @@
+import importlib
+import os
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ytsum.llms.llm import LLM
+    from ytsum.utils.cache import ChunkCache
+
+# Backends are imported only when selected, so choosing one never loads the client libraries of the others.
+LLM_BACKENDS: dict[str, str] = {
+    "gemini": "ytsum.llms.gemini:Gemini",
+    "gemini-async": "ytsum.llms.async_gemini:AsyncGemini",
+    "local": "ytsum.llms.local:LocalLLM",
+    "openai": "ytsum.llms.openai_compatible:OpenAICompatible",
+}
+
+
+def get_llm(name: str | None = None, chunk_cache: "ChunkCache | None" = None) -> "LLM":
+    """
+    Create a language model backend by name.
+
+    Args:
+        name (str | None, optional): One of `LLM_BACKENDS`. Defaults to the `LLM_BACKEND` environment variable,
+            or "gemini" if it is not set.
+        chunk_cache (ChunkCache | None, optional): Cache of chunk answers reused across runs. Defaults to None.
+
+    Raises:
+        ValueError: If no backend has the given name.
+
+    Returns:
+        LLM: A new backend instance configured from the environment.
+    """
+    name = name or os.getenv("LLM_BACKEND") or "gemini"
+    try:
+        module_name, class_name = LLM_BACKENDS[name].split(":")
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend: {name}. Choose one of: {', '.join(LLM_BACKENDS)}") from None
+    backend: Callable[..., LLM] = getattr(importlib.import_module(module_name), class_name)
+    return backend(chunk_cache=chunk_cache)
@@ -0,0 +1,182 @@
+import os
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+
+MAX_SEGMENT_CHARS = 400
+# Characters of a streamed text collected before its sentences are split.
+STREAM_WINDOW_CHARS = 64 * 1024
+
+_SENTENCE_END_PATTERN = re.compile(r"([.!?…][\"')\]]*)\s+")
+_PARAGRAPH_PATTERN = re.compile(r"\n[^\S\n]*\n\s*")
+
+
+class Segmenter(ABC):
+    """
+    Abstract base class for splitters of a transcript into sentence-like segments, the units of chunk packing.
+
+    Segments longer than `max_chars` are split further at paragraph breaks, then at line breaks and finally
+    between words. Transcripts put every caption cue on its own line and mark long pauses with a blank line,
+    so captions without punctuation are split at pauses and cue boundaries instead of into arbitrary halves.
+    """
+
+    def __init__(self, max_chars: int = MAX_SEGMENT_CHARS):
+        """
+        Initialize the segmenter.
+
+        Args:
+            max_chars (int, optional): Length above which a segment is split further. Defaults to 400.
+        """
+        self._max_chars = max_chars
+
+    def split(self, text: str) -> list[str]:
+        """
+        Split text into segments.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            list[str]: Non-empty segments in order, none longer than `max_chars` unless a single word is.
+        """
+        return list(self.iter_segments(text))
+
+    def iter_segments(self, text: str) -> Iterator[str]:
+        """
+        Yield the segments of a text one by one.
+
+        Args:
+            text (str): The text to split.
+
+        Yields:
+            str: Consecutive non-empty segments.
+        """
+        for sentence in self._split_sentences(text):
+            yield from self._split_oversized(sentence)
+
+    def iter_segments_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the segments of a text arriving in pieces, e.g. a transcript while it is being parsed.
+
+        The pieces are collected into windows of about `STREAM_WINDOW_CHARS` characters. Every sentence of a
+        window but the last, which may continue in the next pieces, is yielded as soon as the window is full.
+        The last one is carried over to the next window, after yielding all but the last of its segments if it
+        is longer than `max_chars`, so only about one window of the text is held at a time.
+
+        Args:
+            pieces (Iterable[str]): Consecutive pieces of the text.
+
+        Yields:
+            str: Consecutive non-empty segments, as `iter_segments` yields for the whole text.
+        """
+        collected: list[str] = []
+        size = 0
+        for piece in pieces:
+            collected.append(piece)
+            size += len(piece)
+            if size < STREAM_WINDOW_CHARS:
+                continue
+            window = "".join(collected)
+            sentences = list(self._split_sentences(window))
+            carried = sentences.pop() if sentences else ""
+            for sentence in sentences:
+                yield from self._split_oversized(sentence)
+            if len(carried) > self._max_chars:
+                segments = list(self._split_oversized(carried))
+                carried = segments.pop() if segments else ""
+                yield from segments
+            # Segments are stripped, so whitespace ending the window must be kept to separate the next piece.
+            carried += window[len(window.rstrip()) :]
+            collected, size = [carried], len(carried)
+        yield from self.iter_segments("".join(collected))
+
+    @abstractmethod
+    def _split_sentences(self, text: str) -> Iterator[str]:
+        """Yield the sentences of a text, possibly longer than `max_chars`."""
+
+    def _split_oversized(self, sentence: str) -> Iterator[str]:
+        """Split a sentence longer than `max_chars` at paragraph breaks, line breaks and finally between words."""
+        sentence = sentence.strip()
+        if len(sentence) <= self._max_chars:
+            if sentence:
+                yield sentence
+            return
+        for paragraph in _PARAGRAPH_PATTERN.split(sentence):
+            if len(paragraph) <= self._max_chars:
+                if paragraph.strip():
+                    yield paragraph.strip()
+                continue
+            yield from self._pack(paragraph.split("\n"), "\n")
+
+    def _pack(self, pieces: list[str], separator: str) -> Iterator[str]:
+        """Greedily join consecutive pieces into segments of at most `max_chars`, splitting long pieces by words."""
+        current = ""
+        for piece in pieces:
+            piece = piece.strip()
+            if not piece:
+                continue
+            if len(piece) > self._max_chars and separator != " ":
+                if current:
+                    yield current
+                    current = ""
+                yield from self._pack(piece.split(), " ")
+            elif not current:
+                current = piece
+            elif len(current) + len(separator) + len(piece) <= self._max_chars:
+                current = f"{current}{separator}{piece}"
+            else:
+                yield current
+                current = piece
+        if current:
+            yield current
+
+
+class RegexSegmenter(Segmenter):
+    """
+    Dependency-free segmenter splitting after sentence-ending punctuation followed by whitespace.
+
+    It needs no model and runs in a single regular expression pass. Abbreviations may cause extra splits,
+    which is harmless, as the chunk packer joins segments back together.
+    """
+
+    def _split_sentences(self, text: str) -> Iterator[str]:
+        """Yield the sentences of a text split at sentence-ending punctuation."""
+        start = 0
+        for match in _SENTENCE_END_PATTERN.finditer(text):
+            yield text[start : match.end(1)]
+            start = match.end()
+        yield text[start:]
+
+
+class NltkSegmenter(Segmenter):
+    """Segmenter using NLTK's punkt sentence tokenizer, provisioning its data on first use."""
+
+    def _split_sentences(self, text: str) -> Iterator[str]:
+        """Yield the sentences found by the punkt tokenizer."""
+        from ytsum.llms.utils import split_sentences
+
+        yield from split_sentences(text)
+
+
+SEGMENTERS: dict[str, type[Segmenter]] = {"nltk": NltkSegmenter, "regex": RegexSegmenter}
+
+
+def get_segmenter(name: str | None = None) -> Segmenter:
+    """
+    Create a segmenter by name.
+
+    Args:
+        name (str | None, optional): One of `SEGMENTERS`. Defaults to the `TEXT_SEGMENTER` environment variable,
+            or "nltk" if it is not set.
+
+    Raises:
+        ValueError: If no segmenter has the given name.
+
+    Returns:
+        Segmenter: A new segmenter instance.
+    """
+    name = name or os.getenv("TEXT_SEGMENTER") or "nltk"
+    try:
+        return SEGMENTERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown text segmenter: {name}. Choose one of: {', '.join(SEGMENTERS)}") from None
@@ -0,0 +1,125 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+
+from ytsum.config import TOKEN_RATIOS_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter(ABC):
+    """Abstract base class for offline token counters that approximate a model's tokenizer."""
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """
+        Return the estimated number of tokens in a text without any network call.
+
+        Args:
+            text (str): The input text.
+
+        Returns:
+            int: Estimated token count.
+        """
+        pass
+
+    def calibrate(self, text: str, actual_tokens: int) -> None:
+        """
+        Adjust the counter with an exact token count reported by the model's API.
+
+        Counters that cannot learn ignore calibration samples.
+
+        Args:
+            text (str): Text whose tokens were counted.
+            actual_tokens (int): Exact token count of the text.
+        """
+        return None
+
+
+class CharRatioTokenCounter(TokenCounter):
+    """
+    Token counter based on a chars-per-token ratio learned per model.
+
+    Every calibration sample updates exponentially decayed character and token totals, so the ratio
+    follows the most recent text while staying stable. The totals are persisted in a JSON file shared by
+    all models, so the learned ratio survives across runs.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str, path: str = TOKEN_RATIOS_PATH, default_ratio: float = 4.0, decay: float = 0.9):
+        """
+        Initialize the counter, loading the ratio previously learned for the model.
+
+        Args:
+            model_name (str): Model whose tokenizer is approximated.
+            path (str, optional): JSON file with the learned totals. Defaults to `TOKEN_RATIOS_PATH`.
+            default_ratio (float, optional): Chars per token before any calibration. Defaults to 4.0.
+            decay (float, optional): Weight of the previous totals on each calibration. Defaults to 0.9.
+        """
+        self._model_name = model_name
+        self._path = path
+        self._decay = decay
+        totals = self._load().get(model_name, {})
+        self._chars = float(totals.get("chars", default_ratio))
+        self._tokens = float(totals.get("tokens", 1.0))
+
+    @property
+    def ratio(self) -> float:
+        """Current chars-per-token ratio."""
+        return self._chars / self._tokens
+
+    def count(self, text: str) -> int:
+        """
+        Return the estimated number of tokens in a text using the learned ratio.
+
+        Args:
+            text (str): The input text.
+
+        Returns:
+            int: Estimated token count, 0 for empty text.
+        """
+        if not text:
+            return 0
+        return max(math.ceil(len(text) / self.ratio), 1)
+
+    def calibrate(self, text: str, actual_tokens: int) -> None:
+        """
+        Update the learned ratio with an exact count and persist it.
+
+        Args:
+            text (str): Text whose tokens were counted.
+            actual_tokens (int): Exact token count of the text.
+        """
+        if not text or actual_tokens <= 0:
+            return
+        with self._lock:
+            self._chars = self._chars * self._decay + len(text)
+            self._tokens = self._tokens * self._decay + actual_tokens
+            ratios = self._load()
+            ratios[self._model_name] = {"chars": self._chars, "tokens": self._tokens}
+            self._save(ratios)
+        logger.debug(f"Calibrated {self._model_name} tokenizer ratio to {self.ratio:.3f} chars per token")
+
+    def _load(self) -> dict[str, dict[str, float]]:
+        """Read the persisted totals of all models."""
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data: dict[str, dict[str, float]] = json.load(f)
+                return data
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, ratios: dict[str, dict[str, float]]) -> None:
+        """Atomically write the totals of all models."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(ratios, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"Could not persist tokenizer ratios to {self._path}: {e}")
@@ -1,32 +1,70 @@
+import io
 import logging
-import subprocess
-import sys
-from typing import Callable
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Collection, Iterable, Iterator, Sequence
+from functools import cache
+from itertools import pairwise
+from typing import NamedTuple
 
-from nltk.tokenize import sent_tokenize
+from ytsum.llms.segmenters import Segmenter, get_segmenter
+from ytsum.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+MAX_VERIFICATIONS_PER_CHUNK = 3
+# Fraction of a chunk's size by which a cut may move to reach a chapter start.
+CHAPTER_SNAP_FRACTION = 0.25
 
 
-def silent_nltk_download(resource_name: str) -> None:
+@cache
+def ensure_nltk_resource(resource_name: str, category: str = "tokenizers") -> None:
     """
-    Silently download an NLTK resource without printing to stdout or stderr.
+    Make sure an NLTK resource is installed, downloading it quietly only if it cannot be found.
 
-    This function runs a separate Python subprocess to download the specified
-    NLTK resource, while suppressing any output generated during the download.
+    The lookup is cached, so the check runs at most once per process, and no network access happens
+    once the resource is installed, e.g. by `ytsum-setup`.
 
     Args:
-        resource_name (str): The name of the NLTK resource to download.
+        resource_name (str): The name of the NLTK resource, e.g. "punkt_tab".
+        category (str, optional): The resource's directory in the NLTK data path. Defaults to "tokenizers".
+
+    Raises:
+        LookupError: If the resource is missing and cannot be downloaded.
     """
-    subprocess.run(
-        [sys.executable, "-c", f"import nltk; nltk.download('{resource_name}')"],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
+    import nltk
 
+    try:
+        nltk.data.find(f"{category}/{resource_name}")
+    except LookupError:
+        logger.info(f"Downloading NLTK resource {resource_name}")
+        errors = io.StringIO()
+        try:
+            downloaded = nltk.download(resource_name, quiet=True, raise_on_error=True, print_error_to=errors)
+        except Exception as e:
+            raise LookupError(f"Could not download NLTK resource {resource_name}: {e}") from e
+        if not downloaded:
+            raise LookupError(
+                f"Could not download NLTK resource {resource_name}: {errors.getvalue().strip()}"
+            ) from None
 
-silent_nltk_download("punkt_tab")
-logger = logging.getLogger(__name__)
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Split text into sentences with NLTK's punkt tokenizer, provisioning it on first use.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list[str]: The sentences of the text.
+    """
+    ensure_nltk_resource("punkt_tab")
+    from nltk.tokenize import sent_tokenize
+
+    return list(sent_tokenize(text))
 
 
+@timed("chunk_text")
 def chunk_text(
     *,
     text: str,
@@ -34,75 +72,281 @@ def chunk_text(
     max_tokens: int,
     generate_prompt: Callable[[str], str],
     estimate_token_count: Callable[[str], int],
+    segmenter: Segmenter | None = None,
 ) -> list[str]:
     """
-    Splits text into chunks using nltk sentence tokenizer,
-    ensuring no chunk exceeds the token limit.
+    Splits text into chunks of whole sentences, ensuring no chunk exceeds the token limit.
+
+    Sentences come from the given segmenter, or from the one selected by the `TEXT_SEGMENTER`
+    environment variable, NLTK's punkt tokenizer by default.
+    """
+    return pack_sentences(
+        sentences=(segmenter or get_segmenter()).split(text),
+        get_token_count=get_token_count,
+        max_tokens=max_tokens,
+        generate_prompt=generate_prompt,
+        estimate_token_count=estimate_token_count,
+    )
+
+
+def pack_sentences(
+    *,
+    sentences: Sequence[str],
+    get_token_count: Callable[[str], int],
+    max_tokens: int,
+    generate_prompt: Callable[[str], str],
+    estimate_token_count: Callable[[str], int],
+    max_verifications: int = MAX_VERIFICATIONS_PER_CHUNK,
+) -> list[str]:
+    """
+    Packs consecutive sentences into as few chunks as possible whose prompts fit within the token limit.
+
+    See `iter_packed_chunks`, which yields the same chunks one by one.
+    """
+    return list(
+        iter_packed_chunks(
+            sentences=sentences,
+            get_token_count=get_token_count,
+            max_tokens=max_tokens,
+            generate_prompt=generate_prompt,
+            estimate_token_count=estimate_token_count,
+            max_verifications=max_verifications,
+        )
+    )
+
+
+def iter_packed_chunks(
+    *,
+    sentences: Iterable[str],
+    get_token_count: Callable[[str], int],
+    max_tokens: int,
+    generate_prompt: Callable[[str], str],
+    estimate_token_count: Callable[[str], int],
+    max_verifications: int = MAX_VERIFICATIONS_PER_CHUNK,
+) -> Iterator[str]:
+    """
+    Packs consecutive sentences into as few chunks as possible whose prompts fit within the token limit,
+    yielding each chunk as soon as it is complete, so sentences may still be produced while chunks are used.
+
+    The token cost of the prompt template is estimated once and subtracted from the limit, and counted exactly
+    once, so verifying a chunk counts only its own text and never the template again. Every sentence is
+    estimated once, into prefix sums over the sentences not yet packed, and each chunk boundary is found by
+    binary search over them, so packing is linear in the number of sentences. A chunk is packed once the
+    buffered sentences exceed its budget, and only about one chunk of sentences is held at a time. Sentences
+    longer than the remaining budget are split at word boundaries, or at character boundaries for single
+    oversized words.
+
+    Each chunk is verified with the exact `get_token_count` at most `max_verifications` times. When the exact
+    count exceeds the limit, the chunk's budget is shrunk by the observed ratio and the ratio is carried over
+    to the following chunks, so a consistently underestimating `estimate_token_count` costs a few extra
+    verifications in total rather than per chunk. A chunk still over the limit after that is split at word
+    boundaries by its exact count, so no chunk is ever yielded over the limit.
+
+    Raises:
+        ValueError: If the prompt template alone exceeds the limit, or a single character does not fit.
     """
-    sentences = sent_tokenize(text)
-    if not sentences:
-        return []
+    overhead = estimate_token_count(generate_prompt(""))
+    budget = max_tokens - overhead
+    if budget <= 0:
+        raise ValueError(f"The prompt template alone ({overhead} tokens) exceeds the limit of {max_tokens} tokens.")
+
+    template_tokens = get_token_count(generate_prompt(""))
+    pieces: list[str] = []
+    prefix = [0]
+    correction = 1.0
+    verifications = 0
+    packed_pieces = 0
+    packed_chunks = 0
+
+    def pack() -> list[str]:
+        """Pack the next chunk from the front of the buffer, returning it and dropping its pieces."""
+        nonlocal pieces, prefix, correction, verifications
+        for attempt in range(1, max_verifications + 1):
+            chunk_budget = budget / correction
+            end = max(bisect_right(prefix, chunk_budget, lo=1) - 1, 1)
+            chunk = " ".join(pieces[:end])
 
-    if len(sentences) == 1:
-        sentence_text = sentences[0]
-        actual_tokens = get_token_count(generate_prompt(sentence_text))
-        if actual_tokens > max_tokens:
+            actual_tokens = template_tokens + get_token_count(chunk)
+            verifications += 1
+            if actual_tokens <= max_tokens:
+                chunks = [chunk]
+                break
+
+            estimated_tokens = prefix[end] + overhead
+            correction = max(correction * 1.05, correction * actual_tokens / estimated_tokens)
+            logger.debug(
+                f"Chunk of {actual_tokens} tokens exceeds {max_tokens} (attempt {attempt}/{max_verifications}), "
+                f"shrinking estimates by {correction:.3f}."
+            )
+        else:
+            end = max(bisect_right(prefix, budget / correction, lo=1) - 1, 1)
             logger.warning(
-                f"A single sentence of {actual_tokens} tokens exceeds the max limit of {max_tokens}. "
-                "Returning it as a single, oversized chunk."
+                f"Chunk still exceeds {max_tokens} tokens after {max_verifications} verifications, "
+                "splitting it by its exact token count."
             )
-            half = len(sentence_text) // 2
-            return [sentence_text[:half], sentence_text[half:]]
+            chunks = _split_to_fit(" ".join(pieces[:end]), max_tokens - template_tokens, get_token_count)
+            verifications += len(chunks)
 
-    initial_chunks: list[str] = []
-    current_chunk_sentences: list[str] = []
-    current_chunk_tokens = 0
+        pieces = pieces[end:]
+        prefix = [tokens - prefix[end] for tokens in prefix[end:]]
+        return chunks
 
     for sentence in sentences:
-        token_count = estimate_token_count(generate_prompt(sentence))
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        for piece in _split_long_sentence(sentence, budget, estimate_token_count):
+            pieces.append(piece)
+            prefix.append(prefix[-1] + estimate_token_count(piece))
+            packed_pieces += 1
+            # The boundary of the next chunk is known once the buffer holds more than the chunk's budget.
+            while prefix[-1] > budget / correction:
+                for chunk in pack():
+                    packed_chunks += 1
+                    yield chunk
+    while pieces:
+        for chunk in pack():
+            packed_chunks += 1
+            yield chunk
 
-        if current_chunk_tokens + token_count > max_tokens and current_chunk_sentences:
-            initial_chunks.append(" ".join(current_chunk_sentences).strip())
-            current_chunk_sentences = [sentence]
-            current_chunk_tokens = token_count
-        else:
-            current_chunk_sentences.append(sentence)
-            current_chunk_tokens += token_count
+    logger.info(
+        f"Packed {packed_pieces} sentences into {packed_chunks} chunks with {verifications} exact token counts."
+    )
 
-    if current_chunk_sentences:
-        initial_chunks.append(" ".join(current_chunk_sentences).strip())
 
-    logger.info(f"Initial split created {len(initial_chunks)} chunks using estimation. Now verifying...")
+@timed("plan_chunks")
+def balance_chunks(
+    *,
+    text: str,
+    breaks: Sequence[int],
+    preferred: Collection[int],
+    max_tokens: int,
+    generate_prompt: Callable[[str], str],
+    estimate_token_count: Callable[[str], int],
+    snap_fraction: float = CHAPTER_SNAP_FRACTION,
+) -> list[tuple[int, int]]:
+    """
+    Splits text at the given offsets into balanced chunks whose prompts are estimated to fit the token limit.
 
-    final_chunks = []
-    oversized_chunks_count = 0
+    The text is only cut at `breaks`, e.g. the starts of caption cues, so no cue is ever split. The fewest
+    chunks that fit are planned at equal sizes, and every cut is moved to the nearest `preferred` offset,
+    e.g. a chapter start, within `snap_fraction` of a chunk's size, or else to the nearest break. If a moved
+    cut leaves a chunk over the budget, the text is planned again with one chunk more.
 
-    for chunk in initial_chunks:
-        actual_token_count = get_token_count(generate_prompt(chunk))
+    Every span between two breaks is estimated once and no exact token count is taken, so callers are expected
+    to verify each chunk before sending it. A span that alone exceeds the budget becomes a chunk of its own.
+    """
+    overhead = estimate_token_count(generate_prompt(""))
+    budget = max_tokens - overhead
+    if budget <= 0:
+        raise ValueError(f"The prompt template alone ({overhead} tokens) exceeds the limit of {max_tokens} tokens.")
 
-        if actual_token_count > max_tokens:
-            oversized_chunks_count += 1
-            logger.warning(
-                f"Oversized chunk detected (estimated OK, but actual is {actual_token_count} > {max_tokens}). "
-                "Re-chunking it with the precise method."
-            )
-            sub_chunks = chunk_text(
-                text=chunk,
-                get_token_count=get_token_count,
-                max_tokens=max_tokens,
-                generate_prompt=generate_prompt,
-                estimate_token_count=estimate_token_count,
-            )
-            final_chunks.extend(sub_chunks)
-        else:
-            final_chunks.append(chunk)
+    bounds = sorted({0, *(offset for offset in breaks if 0 < offset < len(text))})
+    bounds.append(len(text))
+    prefix = [0]
+    for start, end in pairwise(bounds):
+        prefix.append(prefix[-1] + estimate_token_count(text[start:end]))
+    total = prefix[-1]
+    last = len(bounds) - 1
+    preferred_bounds = set(preferred)
+    snaps = [index for index, offset in enumerate(bounds) if 0 < index < last and offset in preferred_bounds]
 
-    if oversized_chunks_count > 0:
-        logger.info(
-            f"Verification complete. Re-split {oversized_chunks_count} oversized chunks. "
-            f"Final chunk count: {len(final_chunks)}."
-        )
+    for chunk_count in range(max(-(-total // budget), 1), last + 1):
+        size = total / chunk_count
+        cuts = [0]
+        for chunk in range(1, chunk_count):
+            target = size * chunk
+            low = bisect_left(snaps, bisect_left(prefix, target - size * snap_fraction, cuts[-1] + 1, last))
+            high = bisect_right(snaps, bisect_right(prefix, target + size * snap_fraction, cuts[-1] + 1, last) - 1)
+            if low < high:
+                index = min(snaps[low:high], key=lambda snap: abs(prefix[snap] - target))
+            else:
+                index = bisect_left(prefix, target, cuts[-1] + 1, last)
+                if index > cuts[-1] + 1 and target - prefix[index - 1] < prefix[index] - target:
+                    index -= 1
+            cuts.append(index)
+        cuts.append(last)
+        if all(prefix[end] - prefix[start] <= budget for start, end in pairwise(cuts)):
+            break
     else:
-        logger.info("Verification complete. All estimated chunks were within the token limit.")
+        cuts = list(range(last + 1))
 
-    return final_chunks
+    snapped = len(set(cuts) & set(snaps))
+    logger.info(f"Planned {len(cuts) - 1} chunks of ~{total // (len(cuts) - 1)} tokens, {snapped} cut at chapters.")
+    return [(bounds[start], bounds[end]) for start, end in pairwise(cuts)]
+
+
+def _split_long_sentence(sentence: str, budget: int, estimate_token_count: Callable[[str], int]) -> list[str]:
+    """
+    Splits a sentence whose estimated token count exceeds the budget into pieces that fit.
+
+    Words are packed greedily; words that alone exceed the budget are cut into equal character slices.
+    """
+    tokens = estimate_token_count(sentence)
+    budget = max(budget, 1)
+    if tokens <= budget:
+        return [sentence]
+
+    logger.warning(f"A single sentence of ~{tokens} tokens exceeds the budget of {budget}. Splitting it.")
+    max_chars = max(int(len(sentence) * budget / tokens), 1)
+    pieces: list[str] = []
+    current: list[str] = []
+    current_chars = 0
+    for word in sentence.split():
+        if current and current_chars + 1 + len(word) > max_chars:
+            pieces.append(" ".join(current))
+            current, current_chars = [], 0
+        if len(word) > max_chars:
+            pieces.extend(word[i : i + max_chars] for i in range(0, len(word), max_chars))
+            continue
+        current.append(word)
+        current_chars += len(word) + (1 if current_chars else 0)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _split_to_fit(text: str, budget: int, get_token_count: Callable[[str], int]) -> list[str]:
+    """
+    Splits text into pieces whose exact token count fits the budget, splitting again any piece still over it.
+
+    Raises ValueError if a single character exceeds the budget.
+    """
+    tokens = get_token_count(text)
+    if tokens <= budget:
+        return [text]
+    if len(text) <= 1:
+        raise ValueError(f"A single character of {tokens} tokens exceeds the budget of {budget} tokens.")
+    return [
+        fitted
+        for piece in _split_long_sentence(text, budget, lambda _: tokens)
+        for fitted in _split_to_fit(piece, budget, get_token_count)
+    ]
+
+
+class Partial(NamedTuple):
+    """An intermediate answer of the map or reduce stage, with its token count carried forward."""
+
+    text: str
+    tokens: int
+
+
+def group_partials(partials: Sequence[Partial], fan_in: int, budget: int) -> list[list[Partial]]:
+    """
+    Groups consecutive partial answers for one level of a tree reduce.
+
+    Each group holds at most `fan_in` partials whose combined tokens, including one token per separator,
+    fit within `budget`. A partial that alone exceeds the budget forms a group of its own.
+    """
+    groups: list[list[Partial]] = []
+    current: list[Partial] = []
+    current_tokens = 0
+    for partial in partials:
+        if current and (len(current) >= fan_in or current_tokens + partial.tokens + 1 > budget):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(partial)
+        current_tokens += partial.tokens + 1
+    if current:
+        groups.append(current)
+    return groups
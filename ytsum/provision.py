@@ -0,0 +1,30 @@
+import logging
+import sys
+
+from ytsum.config import ensure_dirs, load_environment
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Provision everything the summarizer needs at runtime, once per machine.
+
+    Creates the application directories and downloads the NLTK sentence tokenizer data if it is missing,
+    so later runs, including those on workers without network access, need no setup at all.
+    """
+    load_environment()
+    ensure_dirs()
+
+    from ytsum.llms.utils import ensure_nltk_resource
+
+    try:
+        ensure_nltk_resource("punkt_tab")
+    except Exception as e:
+        print(f"Failed to provision NLTK data: {e}", file=sys.stderr)
+        sys.exit(1)
+    print("All resources are provisioned.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
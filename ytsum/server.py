@@ -0,0 +1,499 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from ytsum.config import APP_NAME, ensure_dirs, load_environment
+from ytsum.utils.input_parser import get_server_args
+from ytsum.utils.logging_config import configure_logging
+from ytsum.utils.metrics import get_metrics
+from ytsum.utils.output import format_summary
+from ytsum.utils.prompts.prompt_factory import Prompt
+from ytsum.youtube.captions import Section, TimedTranscript
+from ytsum.youtube.utils import get_video_id
+from ytsum.youtube.youtube_manager import get_video_name, get_video_transcript
+
+if TYPE_CHECKING:
+    from ytsum.llms.llm import LLM
+    from ytsum.utils.cache import SummaryCache
+    from ytsum.youtube.transcript_store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+REQUEST_TIMEOUT_SECONDS = 30.0
+MAX_FINISHED_JOBS = 1000
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the job queue is full."""
+
+
+@dataclass
+class SummaryJob:
+    """
+    A video summarization request travelling through the server.
+
+    The summary is kept as the pieces produced by the LLM, so streaming clients can follow it while it is
+    being written. Every change sets the `updated` event clients are waiting on.
+    """
+
+    id: str
+    url: str
+    video_id: str
+    prompt_type: Prompt
+    refresh: bool = False
+    status: str = "queued"
+    title: str | None = None
+    error: str | None = None
+    pieces: list[str] = field(default_factory=list)
+    sections: list[Section] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+    _updated: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.status in ("done", "failed")
+
+    def add_piece(self, piece: str) -> None:
+        """Append a piece of the summary and wake up waiting clients. Must run in the event loop."""
+        self.pieces.append(piece)
+        self._notify()
+
+    def finish(self, error: str | None = None) -> None:
+        """Mark the job as done, or as failed if an error is given, and wake up waiting clients."""
+        self.status = "failed" if error else "done"
+        self.error = error
+        self.finished = time.time()
+        self._notify()
+
+    @property
+    def updated(self) -> asyncio.Event:
+        """Event set by the next added piece or by the job finishing."""
+        return self._updated
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the JSON representation of the job, including the formatted summary once done."""
+        summary = None
+        if self.status == "done":
+            summary = format_summary("".join(self.pieces), self.title or self.url, self.url, self.sections)
+        return {
+            "id": self.id,
+            "url": self.url,
+            "video_id": self.video_id,
+            "prompt": self.prompt_type.name.lower(),
+            "status": self.status,
+            "title": self.title,
+            "summary": summary,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def _notify(self) -> None:
+        """Wake up the current waiters and arm a new event for the next update."""
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+
+class SummaryServer:
+    """
+    Asynchronous summarization service keeping the LLM client and the caches warm between requests.
+
+    Jobs are accepted into a bounded queue and processed by a fixed number of workers. Title lookup and
+    subtitle download of a job run concurrently in threads. The chunks of a summary are answered through the
+    backend's asynchronous API, so the chunks of every job share its process-wide limits, and the final
+    answer is streamed into the job piece by piece. A request for a video and prompt that is already queued
+    or running returns the existing job instead of starting another one, unless the request asks for a refresh.
+
+    The HTTP API, served on a TCP port or a Unix socket, is:
+
+    - `POST /jobs` with a JSON body `{"url": ..., "prompt": "summary", "refresh": false}` submits a job
+      and returns it with status 202, or 503 if the queue is full.
+    - `GET /jobs/<id>` returns the job, including the summary once it is done.
+    - `GET /jobs/<id>/stream` streams the summary as chunked markdown while it is being written.
+    - `GET /health` returns the number of queued and running jobs.
+    """
+
+    def __init__(
+        self,
+        llm: "LLM",
+        *,
+        workers: int = 4,
+        queue_size: int = 100,
+        summary_cache: "SummaryCache | None" = None,
+        transcript_store: "TranscriptStore | None" = None,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            llm (LLM): Language model shared by all jobs.
+            workers (int, optional): Jobs processed concurrently. Defaults to 4.
+            queue_size (int, optional): Jobs waiting for a worker before new ones are rejected. Defaults to 100.
+            summary_cache (SummaryCache | None, optional): Cache consulted before calling the LLM. Defaults to None.
+            transcript_store (TranscriptStore | None, optional): Store of transcripts and titles consulted before
+                yt-dlp. Defaults to None.
+        """
+        self._llm = llm
+        self._workers = workers
+        self._summary_cache = summary_cache
+        self._transcript_store = transcript_store
+        self._queue: asyncio.Queue[SummaryJob] = asyncio.Queue(queue_size)
+        self._jobs: OrderedDict[str, SummaryJob] = OrderedDict()
+        self._active: dict[tuple[str, Prompt], SummaryJob] = {}
+        self._finished_jobs = 0
+        self._running = 0
+        self._worker_tasks: list[asyncio.Task[None]] = []
+
+    def submit(self, url: str, prompt_type: Prompt = Prompt.SUMMARY, refresh: bool = False) -> tuple[SummaryJob, bool]:
+        """
+        Queue a summarization job, or return the identical job already in flight unless `refresh` is set.
+
+        Args:
+            url (str): URL of the video to summarize.
+            prompt_type (Prompt, optional): Prompt used for summarization. Defaults to Prompt.SUMMARY.
+            refresh (bool, optional): Overwrite a cached summary instead of reading it, in a new job. Defaults to
+                False.
+
+        Raises:
+            QueueFullError: If the job queue is full.
+
+        Returns:
+            tuple[SummaryJob, bool]: The job, and whether it was newly created.
+        """
+        video_id = get_video_id(url) or url
+        active = self._active.get((video_id, prompt_type))
+        # A refresh must regenerate the summary, so it never joins a job that may serve the cached one.
+        if active is not None and not refresh:
+            logger.info(f"Joining in-flight job {active.id} for {url}")
+            return active, False
+
+        job = SummaryJob(uuid.uuid4().hex, url, video_id, prompt_type, refresh)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} jobs)") from None
+        self._jobs[job.id] = job
+        self._active[(video_id, prompt_type)] = job
+        logger.info(f"Queued job {job.id} for {url}")
+        return job, True
+
+    def get_job(self, job_id: str) -> SummaryJob | None:
+        """
+        Return a queued, running or recently finished job.
+
+        Args:
+            job_id (str): ID of the job.
+
+        Returns:
+            SummaryJob | None: The job, or None if it is unknown or was finished too long ago.
+        """
+        return self._jobs.get(job_id)
+
+    def start(self) -> None:
+        """Start the workers. Must be called from a running event loop."""
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._work(), name=f"summary-worker-{i}") for i in range(self._workers)
+            ]
+
+    async def stop(self) -> None:
+        """Cancel the workers and wait for them to exit."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, unix_socket: str | None = None) -> None:
+        """
+        Start the workers and serve the HTTP API until cancelled.
+
+        Args:
+            host (str, optional): Interface to listen on. Defaults to "127.0.0.1".
+            port (int, optional): TCP port to listen on. Defaults to 8000.
+            unix_socket (str | None, optional): Path of a Unix socket to listen on instead of TCP. Defaults to None.
+        """
+        # Pay the yt-dlp import once at startup instead of on the first request. Its `YoutubeDL` instances are
+        # not thread-safe, so each lookup still creates its own, which is cheap once the module is loaded.
+        await asyncio.to_thread(__import__, "yt_dlp")
+        self.start()
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            logger.info(f"Serving on unix socket {unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            logger.info(f"Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve a single HTTP request and close the connection.
+
+        Args:
+            reader (asyncio.StreamReader): Stream of the request.
+            writer (asyncio.StreamWriter): Stream of the response.
+        """
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(_read_request(reader), REQUEST_TIMEOUT_SECONDS)
+            except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError) as e:
+                await _write_json(writer, HTTPStatus.BAD_REQUEST, {"error": f"Malformed request: {e}"})
+                return
+            await self._route(method, path, body, writer)
+        except ConnectionError:
+            logger.debug("Client disconnected before the response was complete")
+        except Exception as e:
+            logger.exception(f"Failed to handle request: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        """Dispatch a request to its endpoint."""
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            await _write_json(
+                writer, HTTPStatus.OK, {"status": "ok", "queued": self._queue.qsize(), "running": self._running}
+            )
+        elif parts == ["metrics"] and method == "GET":
+            await _write_text(writer, HTTPStatus.OK, get_metrics().to_prometheus(), PROMETHEUS_CONTENT_TYPE)
+        elif parts == ["report"] and method == "GET":
+            await _write_json(writer, HTTPStatus.OK, get_metrics().report())
+        elif parts == ["jobs"] and method == "POST":
+            await self._post_job(body, writer)
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.get_job(parts[1])
+            if job is None:
+                await _write_json(writer, HTTPStatus.NOT_FOUND, {"error": f"Unknown job: {parts[1]}"})
+            elif len(parts) == 2:
+                await _write_json(writer, HTTPStatus.OK, job.to_dict())
+            elif parts[2] == "stream":
+                await self._stream_job(job, writer)
+            else:
+                await _write_json(writer, HTTPStatus.NOT_FOUND, {"error": f"Not found: {path}"})
+        elif parts in (["health"], ["metrics"], ["report"]) or (parts[:1] == ["jobs"] and len(parts) <= 3):
+            await _write_json(writer, HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Method not allowed: {method}"})
+        else:
+            await _write_json(writer, HTTPStatus.NOT_FOUND, {"error": f"Not found: {path}"})
+
+    async def _post_job(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        """Validate a job submission and queue it."""
+        try:
+            request = json.loads(body or b"{}")
+            url = request["url"]
+            prompt_type = Prompt[str(request.get("prompt", "summary")).upper()]
+            refresh = bool(request.get("refresh", False))
+            if not isinstance(url, str) or not url:
+                raise ValueError("url must be a non-empty string")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            await _write_json(writer, HTTPStatus.BAD_REQUEST, {"error": f"Invalid job: {e!r}"})
+            return
+
+        try:
+            job, created = self.submit(url, prompt_type, refresh)
+        except QueueFullError as e:
+            await _write_json(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}, {"Retry-After": "5"})
+            return
+        await _write_json(writer, HTTPStatus.ACCEPTED, {**job.to_dict(), "deduplicated": not created})
+
+    async def _stream_job(self, job: SummaryJob, writer: asyncio.StreamWriter) -> None:
+        """
+        Stream the summary of a job as chunked markdown until the job finishes.
+
+        The stream ends early without the video link if the job fails; the job resource reports the error.
+        """
+        writer.write(
+            _response_head(
+                HTTPStatus.OK, {"Content-Type": "text/markdown; charset=utf-8", "Transfer-Encoding": "chunked"}
+            )
+        )
+        sent = 0
+        while True:
+            # Taken before reading the pieces, so an update arriving while writing them is not missed.
+            updated = job.updated
+            while sent < len(job.pieces):
+                _write_chunk(writer, job.pieces[sent])
+                sent += 1
+            await writer.drain()
+            if job.done:
+                break
+            await updated.wait()
+        if job.status == "done":
+            _write_chunk(writer, format_summary("", job.title or job.url, job.url, job.sections))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _work(self) -> None:
+        """Process queued jobs one at a time until cancelled."""
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            try:
+                with get_metrics().span("job"):
+                    await self._run(job)
+                job.finish()
+                logger.info(f"Finished job {job.id} for {job.url}")
+            except Exception as e:
+                logger.error(f"Failed to summarize {job.url}: {e}")
+                job.finish(str(e))
+            finally:
+                self._running -= 1
+                self._release(job)
+                self._queue.task_done()
+
+    async def _run(self, job: SummaryJob) -> None:
+        """Fetch the title and subtitles of a job concurrently, then stream its summary into the job."""
+        job.status = "running"
+        title, transcript = await asyncio.gather(
+            self._get_title(job.url), asyncio.to_thread(get_video_transcript, job.url, self._transcript_store)
+        )
+        job.title = title
+        if transcript is None:
+            raise RuntimeError(f"Failed to retrieve subtitles from video: {job.url}")
+        await self._summarize(job, transcript)
+
+    async def _get_title(self, url: str) -> str:
+        """Return the title of a video, or its URL if the lookup fails."""
+        try:
+            return await asyncio.to_thread(get_video_name, url, self._transcript_store)
+        except Exception as e:
+            logger.warning(f"Title lookup failed for {url}, using the URL instead: {e}")
+            return url
+
+    async def _summarize(self, job: SummaryJob, transcript: TimedTranscript) -> None:
+        """Stream the summary of a transcript, chunked on its cues, into a job."""
+        from ytsum.utils.cache import plan_sections, stream_transcript_summary_async
+
+        job.sections = await asyncio.to_thread(
+            plan_sections, self._llm, job.prompt_type, transcript, self._summary_cache, job.refresh
+        )
+        spans = [section.span for section in job.sections] or None
+        async for piece in stream_transcript_summary_async(
+            self._llm, job.prompt_type, transcript.text, self._summary_cache, job.refresh, spans
+        ):
+            job.add_piece(piece)
+
+    def _release(self, job: SummaryJob) -> None:
+        """Stop deduplicating against a finished job and forget the oldest finished jobs over the limit."""
+        if self._active.get((job.video_id, job.prompt_type)) is job:
+            del self._active[(job.video_id, job.prompt_type)]
+        self._finished_jobs += 1
+        while self._finished_jobs > MAX_FINISHED_JOBS:
+            oldest = next((job_id for job_id, old in self._jobs.items() if old.done), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+            self._finished_jobs -= 1
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    """Read an HTTP/1.x request and return its method, path and body."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    if len(head) > MAX_HEADER_BYTES:
+        raise ValueError("request head too large")
+    request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+    method, target, version = request_line.split(" ")
+    if not version.startswith("HTTP/1."):
+        raise ValueError(f"unsupported protocol {version}")
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if not 0 <= length <= MAX_BODY_BYTES:
+        raise ValueError(f"invalid body length {length}")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urlsplit(target).path, body
+
+
+def _response_head(status: HTTPStatus, headers: dict[str, str]) -> bytes:
+    """Encode the status line and headers of a response that closes the connection."""
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", *(f"{name}: {value}" for name, value in headers.items())]
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _write_json(
+    writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict[str, Any], headers: dict[str, str] | None = None
+) -> None:
+    """Write a complete JSON response."""
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        _response_head(
+            status, {"Content-Type": "application/json", "Content-Length": str(len(body)), **(headers or {})}
+        )
+        + body
+    )
+    await writer.drain()
+
+
+async def _write_text(writer: asyncio.StreamWriter, status: HTTPStatus, text: str, content_type: str) -> None:
+    """Write a complete text response."""
+    body = text.encode("utf-8")
+    writer.write(_response_head(status, {"Content-Type": content_type, "Content-Length": str(len(body))}) + body)
+    await writer.drain()
+
+
+def _write_chunk(writer: asyncio.StreamWriter, text: str) -> None:
+    """Write a piece of text as one chunk of a chunked response."""
+    data = text.encode("utf-8")
+    if data:
+        writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+
+
+def main() -> None:
+    """
+    Run the summarization server until interrupted.
+
+    The LLM client and the caches are created once at startup and shared by every request, so a request
+    only pays for its own downloads and LLM calls.
+    """
+    try:
+        args = get_server_args()
+        load_environment()
+        ensure_dirs()
+        configure_logging(args.verbose)
+        logger.info(f"Starting server: {APP_NAME}")
+
+        # Imported only now, so environment defaults come from the loaded `.env` file.
+        from ytsum.llms.registry import get_llm
+        from ytsum.utils.cache import ChunkCache, SummaryCache
+        from ytsum.youtube.transcript_store import TranscriptStore
+
+        server = SummaryServer(
+            get_llm(args.backend, chunk_cache=None if args.no_cache else ChunkCache()),
+            workers=args.workers,
+            queue_size=args.queue_size,
+            summary_cache=None if args.no_cache else SummaryCache(),
+            transcript_store=None if args.no_cache else TranscriptStore(),
+        )
+        asyncio.run(server.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        logger.info("Server stopped by user.")
+    except Exception as e:
+        logger.exception(f"An unknown error occurred during execution: {e}")
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Sequence
+from typing import TYPE_CHECKING
+
+from ytsum.config import CHUNK_CACHE_DIR, SUMMARY_CACHE_DIR
+from ytsum.utils.prompts.prompt_factory import Prompt, get_prompt_generator
+from ytsum.utils.prompts.prompt_generators import PROMPT_VERSION
+from ytsum.utils.single_flight import get_single_flight
+
+if TYPE_CHECKING:
+    from ytsum.llms.llm import LLM, ProgressCallback
+    from ytsum.youtube.captions import Section, TimedTranscript
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Persistent key-value store of text entries, one file per key, bounded in size and age.
+
+    An entry's modification time records when it was written and is used for age-based expiry.
+    Its access time is bumped explicitly on every hit and drives least-recently-used eviction
+    once the cache exceeds its size or entry limits.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int, max_age_seconds: float):
+        """
+        Initialize the cache, creating its directory if needed.
+
+        Args:
+            directory (str): Directory holding the cache entries.
+            max_bytes (int): Maximum total size of all entries.
+            max_entries (int): Maximum number of entries.
+            max_age_seconds (float): Entries written longer ago than this are treated as missing.
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> str | None:
+        """
+        Return the cached value for a key, or None if it is missing or expired.
+
+        Args:
+            key (str): Cache key, a hex digest.
+
+        Returns:
+            str | None: The cached text.
+        """
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            if time.time() - written > self._max_age_seconds:
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+            os.utime(path, (time.time(), written))
+            return value
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store a value atomically and evict old entries if the cache exceeds its bounds.
+
+        Args:
+            key (str): Cache key, a hex digest.
+            value (str): Text to store.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones until the size and entry limits hold.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        now = time.time()
+        entries: list[tuple[float, int, str]] = []
+        removed = 0
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt"):
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > self._max_age_seconds:
+                    removed += self._remove(entry.path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        remaining = len(entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self._max_bytes and remaining <= self._max_entries:
+                break
+            removed += self._remove(path)
+            total_bytes -= size
+            remaining -= 1
+
+        if removed:
+            logger.debug(f"Evicted {removed} entries from cache {self._directory}")
+        return removed
+
+    def _path(self, key: str) -> str:
+        """Return the file path of a cache entry."""
+        return os.path.join(self._directory, f"{key}.txt")
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        """Remove an entry file, tolerating concurrent removal, and return 1."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return 1
+
+
+class SummaryCache(DiskCache):
+    """
+    Content-addressed cache of final summaries.
+
+    Entries are keyed on the cleaned transcript, the model name and the source code of the prompt generator,
+    so changing any of them results in a fresh summary. Summaries of streamed transcripts are also keyed on
+    their source, so they are found before the transcript is read.
+    """
+
+    def __init__(
+        self,
+        directory: str = SUMMARY_CACHE_DIR,
+        max_bytes: int = int(os.getenv("SUMMARY_CACHE_MAX_MB", 100)) * 1024 * 1024,
+        max_entries: int = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 10000)),
+        max_age_seconds: float = float(os.getenv("SUMMARY_CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600,
+    ):
+        """
+        Initialize the summary cache.
+
+        Args:
+            directory (str, optional): Cache directory. Defaults to `SUMMARY_CACHE_DIR`.
+            max_bytes (int, optional): Size limit. Defaults to 100 MB or `SUMMARY_CACHE_MAX_MB`.
+            max_entries (int, optional): Entry limit. Defaults to 10000 or `SUMMARY_CACHE_MAX_ENTRIES`.
+            max_age_seconds (float, optional): Age limit. Defaults to 30 days or `SUMMARY_CACHE_MAX_AGE_DAYS`.
+        """
+        super().__init__(directory, max_bytes, max_entries, max_age_seconds)
+
+    @staticmethod
+    def make_key(transcript: str, model_name: str, prompt_type: Prompt) -> str:
+        """
+        Return the cache key of a summary.
+
+        Args:
+            transcript (str): Cleaned transcript the summary is generated from.
+            model_name (str): Name of the model generating the summary.
+            prompt_type (Prompt): Type of the prompt used for the summary.
+
+        Returns:
+            str: SHA-256 hex digest identifying the summary.
+        """
+        return SummaryCache.finish_key(hashlib.sha256(transcript.encode("utf-8")), model_name, prompt_type)
+
+    @staticmethod
+    def make_source_key(source_key: str, model_name: str, prompt_type: Prompt) -> str:
+        """
+        Return the cache key of a summary from what identifies its transcript, instead of the transcript itself.
+
+        Lets the summary of a transcript that has not been read yet be looked up, e.g. from the video ID and
+        subtitle track it will be downloaded from. Such a key assumes the source's text does not change while
+        the summary is cached.
+
+        Args:
+            source_key (str): Key identifying the source of the transcript, e.g. `SubtitleStream.track_key`.
+            model_name (str): Name of the model generating the summary.
+            prompt_type (Prompt): Type of the prompt used for the summary.
+
+        Returns:
+            str: SHA-256 hex digest identifying the summary.
+        """
+        digest = hashlib.sha256(b"source\0")
+        digest.update(source_key.encode("utf-8"))
+        return SummaryCache.finish_key(digest, model_name, prompt_type)
+
+    @staticmethod
+    def finish_key(digest: "hashlib._Hash", model_name: str, prompt_type: Prompt) -> str:
+        """
+        Return the cache key of a summary from a digest already fed with the whole transcript.
+
+        Lets a transcript that arrives in pieces be hashed as it is read, giving the same key as `make_key`.
+
+        Args:
+            digest (hashlib._Hash): SHA-256 digest updated with the UTF-8 encoded transcript.
+            model_name (str): Name of the model generating the summary.
+            prompt_type (Prompt): Type of the prompt used for the summary.
+
+        Returns:
+            str: SHA-256 hex digest identifying the summary.
+        """
+        digest.update(b"\0")
+        # The rendered template covers the wording of the prompt and the version any change to how it is generated.
+        for part in (model_name, str(PROMPT_VERSION), get_prompt_generator(prompt_type)("")):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_spans(self, key: str) -> list[tuple[int, int]] | None:
+        """
+        Return the character spans of the chunks a cached summary was made from.
+
+        Args:
+            key (str): Key of the summary.
+
+        Returns:
+            list[tuple[int, int]] | None: The spans, empty if the transcript was split into sentences, or None if
+                they are not known.
+        """
+        value = self.get(self._make_spans_key(key))
+        return None if value is None else [(start, end) for start, end in json.loads(value)]
+
+    def put_spans(self, key: str, spans: Sequence[tuple[int, int]] | None) -> None:
+        """
+        Store the character spans of the chunks a summary was made from, next to the summary.
+
+        Args:
+            key (str): Key of the summary.
+            spans (Sequence[tuple[int, int]] | None): The spans, or None if the transcript was split into sentences.
+        """
+        self.put(self._make_spans_key(key), json.dumps(list(spans or ())))
+
+    @staticmethod
+    def _make_spans_key(key: str) -> str:
+        """Return the cache key of the spans of a summary."""
+        return hashlib.sha256(f"spans\0{key}".encode()).hexdigest()
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], refresh: bool = False) -> str:
+        """
+        Return the cached summary for a key, computing and storing it on a miss.
+
+        Args:
+            key (str): Key returned by `make_key`.
+            compute (Callable[[], str]): Function generating the summary.
+            refresh (bool, optional): Ignore any cached entry and overwrite it. Defaults to False.
+
+        Returns:
+            str: The summary.
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                logger.info("Summary cache hit, skipping the LLM.")
+                return cached
+
+        summary = compute()
+        self.put(key, summary)
+        return summary
+
+    def get_or_stream(self, key: str, stream: Callable[[], Iterator[str]], refresh: bool = False) -> Iterator[str]:
+        """
+        Yield the cached summary for a key, or stream it and store it once the stream is complete.
+
+        Args:
+            key (str): Key returned by `make_key`.
+            stream (Callable[[], Iterator[str]]): Function streaming the summary in pieces.
+            refresh (bool, optional): Ignore any cached entry and overwrite it. Defaults to False.
+
+        Yields:
+            str: The summary, in one piece on a hit or as streamed on a miss.
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                logger.info("Summary cache hit, skipping the LLM.")
+                yield cached
+                return
+
+        pieces = []
+        for piece in stream():
+            pieces.append(piece)
+            yield piece
+        self.put(key, "".join(pieces))
+
+
+class ChunkCache(DiskCache):
+    """
+    Cache of answers to individual chunk prompts of the map stage.
+
+    Answers are stored as soon as each chunk completes, so an interrupted or failed job only has to
+    resend the missing chunks when it is re-run.
+    """
+
+    def __init__(
+        self,
+        directory: str = CHUNK_CACHE_DIR,
+        max_bytes: int = int(os.getenv("CHUNK_CACHE_MAX_MB", 200)) * 1024 * 1024,
+        max_entries: int = int(os.getenv("CHUNK_CACHE_MAX_ENTRIES", 50000)),
+        max_age_seconds: float = float(os.getenv("CHUNK_CACHE_MAX_AGE_DAYS", 7)) * 24 * 3600,
+    ):
+        """
+        Initialize the chunk cache.
+
+        Args:
+            directory (str, optional): Cache directory. Defaults to `CHUNK_CACHE_DIR`.
+            max_bytes (int, optional): Size limit. Defaults to 200 MB or `CHUNK_CACHE_MAX_MB`.
+            max_entries (int, optional): Entry limit. Defaults to 50000 or `CHUNK_CACHE_MAX_ENTRIES`.
+            max_age_seconds (float, optional): Age limit. Defaults to 7 days or `CHUNK_CACHE_MAX_AGE_DAYS`.
+        """
+        super().__init__(directory, max_bytes, max_entries, max_age_seconds)
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        """
+        Return the cache key of a chunk answer.
+
+        Args:
+            prompt (str): Full prompt sent for the chunk.
+            model_name (str): Name of the model answering the prompt.
+
+        Returns:
+            str: SHA-256 hex digest identifying the answer.
+        """
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode()).hexdigest()
+
+
+def summarize_transcript(
+    llm: "LLM",
+    prompt_type: Prompt,
+    transcript: str | Iterable[str],
+    cache: SummaryCache | None = None,
+    refresh: bool = False,
+    spans: Sequence[tuple[int, int]] | None = None,
+    source_key: str | None = None,
+) -> str:
+    """
+    Summarize a transcript with the LLM, going through the summary cache if one is given.
+
+    Concurrent calls for the same transcript, model and prompt share a single computation, so simultaneous
+    requests for one video cost a single map-reduce.
+
+    A transcript given as consecutive pieces, e.g. while its subtitles are downloaded, is chunked and sent to
+    the LLM as it arrives. Its content key is only known at the end, so it is looked up and coalesced under
+    `source_key` instead, without reading any piece on a hit. The summary is stored under both keys, so it is
+    also found for the whole transcript. A source key trusts that the source's text has not changed since it
+    was summarized, until the entry expires or is refreshed; without one, the pieces are neither looked up
+    nor coalesced.
+
+    Args:
+        llm (LLM): Language model generating the summary on a cache miss.
+        prompt_type (Prompt): Type of the prompt to use.
+        transcript (str | Iterable[str]): Cleaned transcript to summarize, whole or in consecutive pieces.
+        cache (SummaryCache | None, optional): Summary cache, or None to always call the LLM. Defaults to None.
+        refresh (bool, optional): Ignore any cached entry and overwrite it, and answer every chunk anew while
+            still caching the new answers. Defaults to False.
+        spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of a whole transcript,
+            e.g. from `plan_sections`, or None to split it into sentences. Defaults to None.
+        source_key (str | None, optional): Key identifying the source of a transcript given in pieces, e.g.
+            `SubtitleStream.track_key`. Defaults to None.
+
+    Returns:
+        str: The summary.
+    """
+    model_name = llm.get_model_name()
+    if isinstance(transcript, str):
+        key = SummaryCache.make_key(transcript, model_name, prompt_type)
+
+        def ask() -> str:
+            answer = llm.ask_prompt(prompt_type, transcript, spans=spans, refresh=refresh)
+            if cache is not None:
+                cache.put_spans(key, spans)
+            return answer
+
+    else:
+        pieces = transcript
+        digest = hashlib.sha256()
+
+        def ask() -> str:
+            answer = llm.ask_prompt(prompt_type, _hash_pieces(pieces, digest), refresh=refresh)
+            if cache is not None:
+                whole_key = SummaryCache.finish_key(digest, model_name, prompt_type)
+                cache.put(whole_key, answer)
+                cache.put_spans(whole_key, None)
+            return answer
+
+        if source_key is None:
+            return ask()
+        key = SummaryCache.make_source_key(source_key, model_name, prompt_type)
+
+    def compute() -> str:
+        if cache is None:
+            return ask()
+        return cache.get_or_compute(key, ask, refresh)
+
+    # A refresh only joins other refreshes, as any other call may return the cached summary.
+    summary: str = get_single_flight("summaries").do(f"{key}:refresh" if refresh else key, compute)
+    return summary
+
+
+def stream_transcript_summary(
+    llm: "LLM",
+    prompt_type: Prompt,
+    transcript: str | Iterable[str],
+    cache: SummaryCache | None = None,
+    refresh: bool = False,
+    on_progress: "ProgressCallback | None" = None,
+    spans: Sequence[tuple[int, int]] | None = None,
+    source_key: str | None = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of `summarize_transcript`, yielding the summary as the final LLM call produces it.
+
+    A call joining the in-flight computation of another caller yields the whole summary at once when it is done.
+    A transcript given in pieces is handled as in `summarize_transcript`.
+
+    Args:
+        llm (LLM): Language model generating the summary on a cache miss.
+        prompt_type (Prompt): Type of the prompt to use.
+        transcript (str | Iterable[str]): Cleaned transcript to summarize, whole or in consecutive pieces.
+        cache (SummaryCache | None, optional): Summary cache, or None to always call the LLM. Defaults to None.
+        refresh (bool, optional): Ignore any cached entry and overwrite it, and answer every chunk anew while
+            still caching the new answers. Defaults to False.
+        on_progress (ProgressCallback | None, optional): Called each time a chunk is answered. Defaults to None.
+        spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of a whole transcript,
+            e.g. from `plan_sections`. Defaults to None.
+        source_key (str | None, optional): Key identifying the source of a transcript given in pieces, e.g.
+            `SubtitleStream.track_key`. Defaults to None.
+
+    Yields:
+        str: Consecutive pieces of the summary.
+    """
+    model_name = llm.get_model_name()
+    if isinstance(transcript, str):
+        key = SummaryCache.make_key(transcript, model_name, prompt_type)
+
+        def stream() -> Iterator[str]:
+            yield from llm.ask_prompt_stream(prompt_type, transcript, on_progress, spans, refresh)
+            if cache is not None:
+                cache.put_spans(key, spans)
+
+    else:
+        pieces = transcript
+
+        def stream() -> Iterator[str]:
+            digest = hashlib.sha256()
+            answer = []
+            for piece in llm.ask_prompt_stream(prompt_type, _hash_pieces(pieces, digest), on_progress, refresh=refresh):
+                answer.append(piece)
+                yield piece
+            if cache is not None:
+                whole_key = SummaryCache.finish_key(digest, model_name, prompt_type)
+                cache.put(whole_key, "".join(answer))
+                cache.put_spans(whole_key, None)
+
+        if source_key is None:
+            yield from stream()
+            return
+        key = SummaryCache.make_source_key(source_key, model_name, prompt_type)
+
+    # A refresh only joins other refreshes, as any other call may return the cached summary.
+    flight_key = f"{key}:refresh" if refresh else key
+    flight = get_single_flight("summaries")
+    future, leader = flight.join(flight_key)
+    if not leader:
+        logger.info("Joining the in-flight summary of the same transcript.")
+        yield future.result()
+        return
+
+    summary = []
+    try:
+        with flight.leader_lock(flight_key):
+            for piece in stream() if cache is None else cache.get_or_stream(key, stream, refresh):
+                summary.append(piece)
+                yield piece
+    except Exception as e:
+        flight.set_exception(flight_key, future, e)
+        raise
+    except BaseException:
+        # Also raised when the consumer stops early, which must not hang the callers waiting for the summary.
+        flight.set_exception(flight_key, future, RuntimeError("The summary was abandoned before it was complete."))
+        raise
+    flight.set_result(flight_key, future, "".join(summary))
+
+
+async def stream_transcript_summary_async(
+    llm: "LLM",
+    prompt_type: Prompt,
+    transcript: str,
+    cache: SummaryCache | None = None,
+    refresh: bool = False,
+    spans: Sequence[tuple[int, int]] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Asynchronous variant of `stream_transcript_summary` for a whole transcript.
+
+    Its chunks are answered concurrently under the backend's process-wide limits instead of a thread pool per
+    call. Concurrent calls are coalesced within the process only, as waiting for another process would block
+    the event loop.
+
+    Args:
+        llm (LLM): Language model generating the summary on a cache miss.
+        prompt_type (Prompt): Type of the prompt to use.
+        transcript (str): Cleaned transcript to summarize.
+        cache (SummaryCache | None, optional): Summary cache, or None to always call the LLM. Defaults to None.
+        refresh (bool, optional): Ignore any cached entry and overwrite it, and answer every chunk anew while
+            still caching the new answers. Defaults to False.
+        spans (Sequence[tuple[int, int]] | None, optional): Character spans of the chunks of the transcript,
+            e.g. from `plan_sections`. Defaults to None.
+
+    Yields:
+        str: Consecutive pieces of the summary.
+    """
+    key = SummaryCache.make_key(transcript, llm.get_model_name(), prompt_type)
+    # A refresh only joins other refreshes, as any other call may return the cached summary.
+    flight_key = f"{key}:refresh" if refresh else key
+    flight = get_single_flight("summaries")
+    future, leader = flight.join(flight_key)
+    if not leader:
+        logger.info("Joining the in-flight summary of the same transcript.")
+        yield await asyncio.wrap_future(future)
+        return
+
+    summary = []
+    try:
+        cached = None if cache is None or refresh else await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            logger.info("Summary cache hit, skipping the LLM.")
+            summary.append(cached)
+            yield cached
+        else:
+            async for piece in llm.ask_prompt_stream_async(prompt_type, transcript, spans, refresh):
+                summary.append(piece)
+                yield piece
+            if cache is not None:
+                await asyncio.to_thread(cache.put_spans, key, spans)
+                await asyncio.to_thread(cache.put, key, "".join(summary))
+    except Exception as e:
+        flight.set_exception(flight_key, future, e)
+        raise
+    except BaseException:
+        # Also raised when the consumer stops early, which must not hang the callers waiting for the summary.
+        flight.set_exception(flight_key, future, RuntimeError("The summary was abandoned before it was complete."))
+        raise
+    flight.set_result(flight_key, future, "".join(summary))
+
+
+def plan_sections(
+    llm: "LLM",
+    prompt_type: Prompt,
+    transcript: "TimedTranscript",
+    cache: SummaryCache | None = None,
+    refresh: bool = False,
+) -> list["Section"]:
+    """
+    Plan the chunks of a timed transcript on its cue boundaries, preferring chapter starts.
+
+    The sections give `summarize_transcript` the spans of the chunks and the output the time of each chunk.
+    If the summary is cached, the sections are those it was made from instead of a new plan, which may differ,
+    e.g. with another token limit, and none if they are not known.
+
+    Args:
+        llm (LLM): Language model the chunks are planned for.
+        prompt_type (Prompt): Type of the prompt to use.
+        transcript (TimedTranscript): Transcript with the timing of its cues.
+        cache (SummaryCache | None, optional): Summary cache the summary will be looked up in. Defaults to None.
+        refresh (bool, optional): Plan anew, as the cached summary will be overwritten. Defaults to False.
+
+    Returns:
+        list[Section]: One section per chunk, or none if the transcript has no cue timing.
+    """
+    if not transcript.cue_count:
+        return []
+    if cache is not None and not refresh:
+        key = SummaryCache.make_key(transcript.text, llm.get_model_name(), prompt_type)
+        if cache.get(key) is not None:
+            return transcript.sections(cache.get_spans(key) or [])
+    spans = llm.plan_chunks(prompt_type, transcript.text, transcript.offsets, transcript.chapter_breaks())
+    return transcript.sections(spans)
+
+
+def _hash_pieces(pieces: Iterable[str], digest: "hashlib._Hash") -> Iterator[str]:
+    """Yield the pieces of a transcript, feeding each to the digest first."""
+    for piece in pieces:
+        digest.update(piece.encode("utf-8"))
+        yield piece
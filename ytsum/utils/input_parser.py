@@ -1,6 +1,9 @@
 import argparse
 import logging
 
+from ytsum.config import OUTPUT_DIR
+from ytsum.llms.registry import LLM_BACKENDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,6 +15,11 @@ def get_args() -> argparse.Namespace:
         argparse.Namespace: Parsed arguments including:
             - input_path (Path): Path to the input file or directory (must exist).
             - output_path (Path): Path to the output directory (will be created if not exists).
+            - no_cache (bool): Flag to bypass the summary cache.
+            - refresh (bool): Flag to regenerate and overwrite a cached summary.
+            - stream (bool): Flag to write the summary as it is generated.
+            - progress (bool): Flag to report chunk progress to stderr.
+            - backend (str | None): Name of the LLM backend, or None for the environment's choice.
             - verbose (bool): Flag to enable verbose logging.
 
     Raises:
@@ -38,7 +46,169 @@ def get_args() -> argparse.Namespace:
         help="Path to output directory where summaries will be saved.",
     )
 
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Neither read nor write the summary, chunk and transcript caches."
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Ignore cached summaries and chunk answers and regenerate them."
+    )
+
+    parser.add_argument(
+        "-s", "--stream", action="store_true", help="Write the summary piece by piece as it is generated."
+    )
+    parser.add_argument(
+        "--progress", action="store_true", help="Report the progress of long transcripts chunk by chunk to stderr."
+    )
+
+    parser.add_argument(
+        "--backend",
+        default=None,
+        choices=list(LLM_BACKENDS),
+        help="LLM backend to summarize with. Defaults to the LLM_BACKEND environment variable, or gemini.",
+    )
+
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging output.")
 
     args = parser.parse_args()
     return args
+
+
+def get_batch_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for the batch summarization CLI.
+
+    Returns:
+        argparse.Namespace: Parsed arguments including:
+            - urls (list[str]): Video, playlist or channel URLs given on the command line.
+            - input_file (str | None): File with one URL per line, or "-" to read from stdin.
+            - output_dir (str): Directory where summaries and the manifest are written.
+            - subtitle_workers (int): Concurrent subtitle downloads.
+            - title_workers (int): Concurrent title lookups.
+            - llm_workers (int): Videos summarized by the LLM concurrently.
+            - no_cache (bool): Flag to bypass the summary cache.
+            - refresh (bool): Flag to regenerate and overwrite cached summaries.
+            - backend (str | None): Name of the LLM backend, or None for the environment's choice.
+            - metrics_report (str | None): File to write the JSON run report to.
+            - metrics_textfile (str | None): File to write the metrics to in the Prometheus text format.
+            - verbose (bool): Flag to enable verbose logging.
+    """
+    parser = argparse.ArgumentParser(
+        description="YouTube Summarizer batch CLI - Summarize many videos, playlists or channels in one run."
+    )
+
+    parser.add_argument(
+        "-u",
+        "--url",
+        dest="urls",
+        action="append",
+        default=[],
+        type=str,
+        help="URL of a video, playlist or channel to summarize. Can be given multiple times.",
+    )
+
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        required=False,
+        default=None,
+        type=str,
+        help="Path to a file with one URL per line, or '-' to read URLs from stdin.",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        required=False,
+        default=OUTPUT_DIR,
+        type=str,
+        help="Directory where summaries and the run manifest will be saved.",
+    )
+
+    parser.add_argument("--subtitle-workers", default=4, type=_positive_int, help="Concurrent subtitle downloads.")
+    parser.add_argument("--title-workers", default=4, type=_positive_int, help="Concurrent video title lookups.")
+    parser.add_argument("--llm-workers", default=2, type=_positive_int, help="Videos summarized concurrently.")
+
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Neither read nor write the summary, chunk and transcript caches."
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Ignore cached summaries and chunk answers and regenerate them."
+    )
+
+    parser.add_argument(
+        "--backend",
+        default=None,
+        choices=list(LLM_BACKENDS),
+        help="LLM backend to summarize with. Defaults to the LLM_BACKEND environment variable, or gemini.",
+    )
+
+    parser.add_argument(
+        "--metrics-report", default=None, type=str, help="Write a JSON report of stage timings and tokens to this file."
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=None,
+        type=str,
+        help="Write the run's metrics to this file in the Prometheus text format, e.g. for a textfile collector.",
+    )
+
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging output.")
+
+    args = parser.parse_args()
+    if not args.urls and args.input_file is None:
+        parser.error("at least one of --url or --input-file is required")
+    return args
+
+
+def get_server_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for the summarization server.
+
+    Returns:
+        argparse.Namespace: Parsed arguments including:
+            - host (str): Interface to listen on.
+            - port (int): TCP port to listen on.
+            - unix_socket (str | None): Path of a Unix socket to listen on instead of TCP.
+            - workers (int): Jobs processed concurrently.
+            - queue_size (int): Jobs waiting for a worker before new ones are rejected.
+            - no_cache (bool): Flag to bypass the summary, chunk and transcript caches.
+            - backend (str | None): Name of the LLM backend, or None for the environment's choice.
+            - verbose (bool): Flag to enable verbose logging.
+    """
+    parser = argparse.ArgumentParser(
+        description="YouTube Summarizer server - Serve summarization jobs over HTTP with warm clients and caches."
+    )
+
+    parser.add_argument("--host", default="127.0.0.1", type=str, help="Interface to listen on.")
+    parser.add_argument("--port", default=8000, type=int, help="TCP port to listen on.")
+    parser.add_argument(
+        "--unix-socket", default=None, type=str, help="Path of a Unix socket to listen on instead of a TCP port."
+    )
+
+    parser.add_argument("--workers", default=4, type=_positive_int, help="Jobs processed concurrently.")
+    parser.add_argument(
+        "--queue-size", default=100, type=_positive_int, help="Jobs waiting for a worker before new ones are rejected."
+    )
+
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Neither read nor write the summary, chunk and transcript caches."
+    )
+
+    parser.add_argument(
+        "--backend",
+        default=None,
+        choices=list(LLM_BACKENDS),
+        help="LLM backend to summarize with. Defaults to the LLM_BACKEND environment variable, or gemini.",
+    )
+
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging output.")
+
+    return parser.parse_args()
+
+
+def _positive_int(value: str) -> int:
+    """Argparse type accepting only integers greater than zero."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
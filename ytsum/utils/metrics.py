@@ -0,0 +1,235 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Any, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+PREFIX = "ytsum_"
+# Upper bounds of the span duration buckets in seconds, from token counting to long LLM calls.
+DURATION_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, with their count, sum and maximum."""
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets (tuple[float, ...], optional): Sorted upper bounds of the buckets; values above the last
+                one only count towards the implicit +Inf bucket. Defaults to `DURATION_BUCKETS`.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add a value to the histogram. Callers must hold the lock of the owning `Metrics`.
+
+        Args:
+            value (float): Observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms describing what the process spent its time on.
+
+    Spans time a block of code and record its duration in the `span_duration_seconds` histogram, labelled with
+    the span name, and count the blocks that raised in `span_errors_total`. Counters add up quantities such as
+    tokens sent or seconds slept. The registry is exported as a JSON run report or in the Prometheus text
+    exposition format, with every metric name prefixed by `ytsum_`.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._started = time.time()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1.0, /, **labels: str) -> None:
+        """
+        Add a value to a counter.
+
+        Args:
+            name (str): Counter name, ending in `_total` by convention.
+            value (float, optional): Amount to add. Defaults to 1.
+            **labels (str): Labels distinguishing the series of the counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, /, **labels: str) -> None:
+        """
+        Add a value to a histogram.
+
+        Args:
+            name (str): Histogram name.
+            value (float): Observed value.
+            **labels (str): Labels distinguishing the series of the histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Time the enclosed block as a span.
+
+        Args:
+            name (str): Span name, e.g. "chunk_text".
+            **labels (str): Further labels of the span, e.g. the model name.
+
+        Yields:
+            None: Control to the timed block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment("span_errors_total", span=name, **labels)
+            raise
+        finally:
+            self.observe("span_duration_seconds", time.perf_counter() - started, span=name, **labels)
+
+    def reset(self) -> None:
+        """Drop every recorded value and restart the report clock."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+    def report(self) -> dict[str, Any]:
+        """
+        Return the JSON run report.
+
+        Returns:
+            dict[str, Any]: Start time and elapsed seconds of the run, the count, total, mean and maximum
+                duration of every span, and the value of every counter, keyed as Prometheus series.
+        """
+        with self._lock:
+            spans = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name != "span_duration_seconds":
+                    continue
+                span_name = dict(labels)["span"]
+                key = span_name + _format_labels(tuple(label for label in labels if label[0] != "span"))
+                errors = self._counters.get(("span_errors_total", labels), 0.0)
+                spans[key] = {
+                    "count": histogram.count,
+                    "errors": int(errors),
+                    "total_seconds": round(histogram.sum, 6),
+                    "mean_seconds": round(histogram.sum / histogram.count, 6),
+                    "max_seconds": round(histogram.max, 6),
+                }
+            counters = {
+                name + _format_labels(labels): value for (name, labels), value in sorted(self._counters.items())
+            }
+            return {
+                "started": datetime.fromtimestamp(self._started, UTC).isoformat(timespec="seconds"),
+                "elapsed_seconds": round(time.time() - self._started, 3),
+                "spans": spans,
+                "counters": counters,
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Return every counter and histogram in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, one `# TYPE` line per metric followed by its series.
+        """
+        lines: list[str] = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self._counters})
+            for metric in counter_names:
+                lines.append(f"# TYPE {PREFIX}{metric} counter")
+                for (name, labels), value in sorted(self._counters.items()):
+                    if name == metric:
+                        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+            histogram_names = sorted({name for name, _ in self._histograms})
+            for metric in histogram_names:
+                lines.append(f"# TYPE {PREFIX}{metric} histogram")
+                for (name, labels), histogram in sorted(self._histograms.items()):
+                    if name != metric:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, math.inf), histogram.counts, strict=True):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else _format_value(bound)
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels((*labels, ('le', le)))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """
+    Return the process-wide metrics registry.
+
+    Returns:
+        Metrics: Registry shared by every instrumented function in the process.
+    """
+    return _metrics
+
+
+def timed(name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Decorate a function so that every call is recorded as a span of the process-wide registry.
+
+    Args:
+        name (str): Span name.
+
+    Returns:
+        Callable[[Callable[P, R]], Callable[P, R]]: The decorator.
+    """
+
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with get_metrics().span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _format_labels(labels: Labels) -> str:
+    """Format labels as a Prometheus label set, or an empty string if there are none."""
+    if not labels:
+        return ""
+    escaped = ((name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, without a fractional part for whole numbers."""
+    return str(int(value)) if value.is_integer() else repr(value)
@@ -0,0 +1,92 @@
+import sys
+from collections.abc import Callable, Iterable, Iterator, Sequence
+
+from ytsum.youtube.captions import Section
+from ytsum.youtube.utils import get_timestamp_url
+
+
+def format_summary(summary: str, video_title: str, video_url: str, sections: Sequence[Section] = ()) -> str:
+    """
+    Append the link to the original video to a generated summary, after links to the summarized sections.
+
+    Args:
+        summary (str): The summary text returned by the LLM.
+        video_title (str): Title of the summarized video.
+        video_url (str): URL of the summarized video.
+        sections (Sequence[Section], optional): Chunks the transcript was summarized in, listed with a link to
+            the time each starts at if there are several. Defaults to none.
+
+    Returns:
+        str: Markdown text ready to be written to a file or stdout.
+    """
+    return summary + format_sections(sections, video_url) + f"\n\nOriginal video: [**{video_title}**]({video_url})\n"
+
+
+def format_sections(sections: Sequence[Section], video_url: str) -> str:
+    """
+    Format the chunks of a summarized transcript as a list of links to the time each starts at.
+
+    Args:
+        sections (Sequence[Section]): Chunks the transcript was summarized in.
+        video_url (str): URL of the summarized video.
+
+    Returns:
+        str: Markdown list preceded by a blank line, or an empty string for fewer than two sections.
+    """
+    if len(sections) < 2:
+        return ""
+    lines = ["\n\nSections:"]
+    for section in sections:
+        times = f"{_format_time(section.start)}–{_format_time(section.end)}"
+        titles = f" {', '.join(section.titles)}" if section.titles else ""
+        lines.append(f"- [{times}]({get_timestamp_url(video_url, section.start)}){titles}")
+    return "\n".join(lines)
+
+
+def format_summary_stream(
+    summary_pieces: Iterable[str],
+    video_title: str | Callable[[], str],
+    video_url: str,
+    sections: Sequence[Section] = (),
+) -> Iterator[str]:
+    """
+    Streaming variant of `format_summary`, passing the summary through piece by piece.
+
+    Args:
+        summary_pieces (Iterable[str]): Consecutive pieces of the summary text.
+        video_title (str | Callable[[], str]): Title of the summarized video, or a function returning it,
+            called only after the last piece, so the title may still be looked up while the summary streams.
+        video_url (str): URL of the summarized video.
+        sections (Sequence[Section], optional): Chunks the transcript was summarized in. Defaults to none.
+
+    Yields:
+        str: Markdown text pieces ready to be written to a file or stdout.
+    """
+    yield from summary_pieces
+    yield format_summary("", video_title if isinstance(video_title, str) else video_title(), video_url, sections)
+
+
+def write_pieces(pieces: Iterable[str], output_file: str | None) -> None:
+    """
+    Write text pieces to a file, or to stdout if no file is given, flushing after each piece.
+
+    Args:
+        pieces (Iterable[str]): Text pieces in order.
+        output_file (str | None): Path of the output file, or None for stdout.
+    """
+    if output_file is None:
+        for piece in pieces:
+            sys.stdout.write(piece)
+            sys.stdout.flush()
+        return
+    with open(output_file, "w", encoding="utf-8") as f:
+        for piece in pieces:
+            f.write(piece)
+            f.flush()
+
+
+def _format_time(seconds: float) -> str:
+    """Format a time in seconds as m:ss, or as h:mm:ss from an hour on."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
@@ -1,9 +1,9 @@
-"""Prompt factory module for mapping prompt types to their respective generator functions."""
+"""Prompt factory module for mapping prompt types to their respective generator functions and preambles."""
 
 from enum import IntEnum, auto
 from typing import Callable
 
-from ytsum.utils.prompts.prompt_generators import generate_summary_prompt
+from ytsum.utils.prompts.prompt_generators import SUMMARY_PREAMBLE, generate_summary_prompt
 
 
 class Prompt(IntEnum):
@@ -16,6 +16,11 @@ PROMPT_TO_GENERATOR: dict[Prompt, Callable[[str], str]] = {
     Prompt.SUMMARY: generate_summary_prompt,
 }
 
+# Fixed instructions every prompt of a type starts with; the generated prompt is the preamble followed by the text.
+PROMPT_TO_PREAMBLE: dict[Prompt, str] = {
+    Prompt.SUMMARY: SUMMARY_PREAMBLE,
+}
+
 
 def get_prompt_generator(prompt: Prompt) -> Callable[[str], str]:
     """
@@ -34,3 +39,22 @@ def get_prompt_generator(prompt: Prompt) -> Callable[[str], str]:
         return PROMPT_TO_GENERATOR[prompt]
     except KeyError:
         raise NotImplementedError(f"Prompt {prompt} not implemented") from None
+
+
+def get_prompt_preamble(prompt: Prompt) -> str:
+    """
+    Retrieves the fixed preamble that every prompt of a given type starts with, before its variable text.
+
+    Args:
+        prompt (Prompt): The prompt type to retrieve the preamble for.
+
+    Returns:
+        str: The preamble, such that the generated prompt for a text is the preamble followed by the text.
+
+    Raises:
+        NotImplementedError: If the prompt type is not supported.
+    """
+    try:
+        return PROMPT_TO_PREAMBLE[prompt]
+    except KeyError:
+        raise NotImplementedError(f"Prompt {prompt} not implemented") from None
@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Generic, TypeVar
+
+from ytsum.config import LOCK_DIR
+
+logger = logging.getLogger(__name__)
+
+LOCK_STRIPES = 256
+
+T = TypeVar("T")
+
+_flights: dict[str, "SingleFlight[Any]"] = {}
+_flights_lock = threading.Lock()
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent computations of the same key within the process.
+
+    The first caller of a key becomes its leader and computes the result, and every caller arriving while
+    the computation is in flight waits for it and shares its result or exception. Results are not kept once
+    the computation finishes; persisting them is left to the caches.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the flight with no computations in flight."""
+        self._calls: dict[str, Future[T]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, compute: Callable[[], T]) -> T:
+        """
+        Return the result of a computation, sharing it with concurrent callers of the same key.
+
+        Args:
+            key (str): Key identifying the computation.
+            compute (Callable[[], T]): Function computing the result, called only by the leader.
+
+        Returns:
+            T: The result, computed by this caller or by the leader it joined.
+        """
+        future, leader = self.join(key)
+        if not leader:
+            logger.info(f"Joining in-flight computation {key}")
+            return future.result()
+        try:
+            with self.leader_lock(key):
+                result = compute()
+        except BaseException as e:
+            self.set_exception(key, future, e)
+            raise
+        self.set_result(key, future, result)
+        return result
+
+    def join(self, key: str) -> tuple[Future[T], bool]:
+        """
+        Join the computation of a key, becoming its leader if none is in flight.
+
+        A leader must finish the computation with `set_result` or `set_exception`, holding `leader_lock`
+        while computing.
+
+        Args:
+            key (str): Key identifying the computation.
+
+        Returns:
+            tuple[Future[T], bool]: Future of the result, and whether the caller is the leader.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def set_result(self, key: str, future: "Future[T]", result: T) -> None:
+        """Finish a computation led by the caller and hand its result to the waiting callers."""
+        self._release(key, future)
+        future.set_result(result)
+
+    def set_exception(self, key: str, future: "Future[T]", error: BaseException) -> None:
+        """Finish a failed computation led by the caller and raise its error in the waiting callers."""
+        self._release(key, future)
+        future.set_exception(error)
+
+    @contextmanager
+    def leader_lock(self, key: str) -> Iterator[None]:
+        """Lock held by the leader while computing. Does nothing, as in-process callers are already coalesced."""
+        yield
+
+    def _release(self, key: str, future: "Future[T]") -> None:
+        """Stop routing new callers of a key to a finished computation."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+
+class FileSingleFlight(SingleFlight[T]):
+    """
+    Single flight that also coalesces computations across processes on one host.
+
+    A leader holds an exclusive file lock while computing, so leaders of the same key in other processes
+    wait for it to finish. Computations must consult a persistent cache first, so the waiting processes find
+    the result there once they get the lock. Keys are hashed onto a fixed number of lock files, so the lock
+    directory stays bounded, at the price of rarely serializing two unrelated keys. Platforms without
+    `fcntl` only coalesce within the process.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the flight, creating the lock directory if needed.
+
+        Args:
+            directory (str): Directory holding the lock files.
+        """
+        super().__init__()
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def leader_lock(self, key: str) -> Iterator[None]:
+        """Hold the key's file lock, waiting for a leader in another process to release it."""
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+
+        stripe = int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % LOCK_STRIPES
+        with open(os.path.join(self._directory, f"{stripe:02x}.lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def get_single_flight(name: str) -> SingleFlight[Any]:
+    """
+    Return the process-wide single flight of a kind of computation, creating it on first use.
+
+    Computations are coalesced across processes through lock files in `LOCK_DIR` if `SINGLE_FLIGHT_FILE_LOCKS`
+    is set to 1, and only within the process otherwise.
+
+    Args:
+        name (str): Kind of computation, e.g. "summaries".
+
+    Returns:
+        SingleFlight[Any]: Single flight shared by every computation of that kind.
+    """
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            if os.getenv("SINGLE_FLIGHT_FILE_LOCKS", "0") == "1":
+                flight = FileSingleFlight(os.path.join(LOCK_DIR, name))
+            else:
+                flight = SingleFlight()
+            _flights[name] = flight
+        return flight
@@ -0,0 +1,414 @@
+import codecs
+import html
+import json
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Sequence
+from typing import IO, Any, NamedTuple
+from xml.etree import ElementTree
+
+STREAM_CHUNK_SIZE = 64 * 1024
+MIN_ROLLING_OVERLAP_WORDS = 2
+MAX_ROLLING_OVERLAP_CHARS = 500
+PAUSE_SECONDS = 2.0
+
+_TIMESTAMP = r"(?:\d+:)?\d{1,2}:\d{2}[,.]\d{3}"
+# A timing line followed by the cue text, i.e. every following line up to the next blank one.
+_CUE_PATTERN = re.compile(
+    rf"^[^\S\n]*({_TIMESTAMP})[^\S\n]*-->[^\S\n]*({_TIMESTAMP})[^\n]*\n((?:[^\S\n]*\S[^\n]*\n?)*)", re.MULTILINE
+)
+_NOISE_PATTERN = re.compile(r"<[^>]*>|\[[^\]]*]")
+
+
+class Cue(NamedTuple):
+    """A single caption with its start and end time in seconds."""
+
+    start: float
+    end: float
+    text: str
+
+
+class Chapter(NamedTuple):
+    """A chapter of a video, as listed in the `chapters` metadata of yt-dlp, with times in seconds."""
+
+    start: float
+    end: float
+    title: str
+
+
+class Section(NamedTuple):
+    """A chunk of a timed transcript: its time span, its character span and the chapters it covers."""
+
+    start: float
+    end: float
+    offset: int
+    stop: int
+    titles: tuple[str, ...]
+
+    @property
+    def span(self) -> tuple[int, int]:
+        """Character span of the chunk in the transcript text."""
+        return self.offset, self.stop
+
+
+def iter_text(stream: IO[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Decodes a UTF-8 byte stream incrementally and yields its text with line endings normalized to LF.
+
+    CRLF, LF and CR line endings are accepted, and only one chunk of the stream is held in memory at a time.
+
+    :param stream: Binary stream, e.g. an HTTP response
+    :param chunk_size: Number of bytes read from the stream at a time
+    :return: Iterator over consecutive pieces of the decoded text
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    carriage_return = ""
+    while chunk := stream.read(chunk_size):
+        text = carriage_return + decoder.decode(chunk)
+        # A trailing "\r" may be the first half of a "\r\n" split across chunks.
+        carriage_return = "\r" if text.endswith("\r") else ""
+        yield text[: len(text) - len(carriage_return)].replace("\r\n", "\n").replace("\r", "\n")
+    yield (carriage_return + decoder.decode(b"", final=True)).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def clean_text(text: str) -> str:
+    """
+    Removes inline tags like <c> or <00:00:01.120>, annotations like [music] and redundant whitespace.
+
+    :param text: Raw caption text
+    :return: The clean text, possibly empty
+    """
+    if "<" in text or "[" in text:
+        text = _NOISE_PATTERN.sub("", text)
+    if "&" in text:
+        text = html.unescape(text)
+    return " ".join(text.split())
+
+
+def _seconds(timestamp: str) -> float:
+    """Converts an SRT or WebVTT timestamp like 01:02:03,456 or 02:03.456 to seconds."""
+    hours, _, minutes = timestamp[:-7].rpartition(":")
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(timestamp[-6:-4]) + int(timestamp[-3:]) / 1000
+
+
+def _parse_cues(text: str, end: int) -> Iterator[Cue]:
+    """Parses the SRT or WebVTT cues found in the first `end` characters of the text."""
+    # Every cue but the first starts when the previous one ends, so most timestamps are converted once.
+    times: dict[str, float] = {}
+    for start, stop, raw in _CUE_PATTERN.findall(text, 0, end):
+        cue_text = clean_text(raw)
+        if cue_text:
+            if start not in times:
+                times[start] = _seconds(start)
+            if stop not in times:
+                times[stop] = _seconds(stop)
+            yield Cue(times[start], times[stop], cue_text)
+
+
+def parse_timed_text(pieces: Iterable[str]) -> Iterator[Cue]:
+    """
+    Parses SRT or WebVTT text into cues in a single pass.
+
+    Every cue starts at a timing line and its text runs until the next blank line. Indices, cue identifiers,
+    the WebVTT header, NOTE and STYLE blocks and cue settings are skipped, so both formats share one parser.
+    Blocks may be separated by any number of blank lines, and a block may span several pieces.
+
+    :param pieces: Consecutive pieces of the subtitle text with LF line endings
+    :return: Iterator over the cues with non-empty text, in file order
+    """
+    pending = ""
+    for piece in pieces:
+        text = pending + piece
+        # Only complete blocks are parsed; the text after the last blank line may continue in the next piece.
+        end = text.rfind("\n\n") + 1
+        yield from _parse_cues(text, end)
+        pending = text[end:]
+    yield from _parse_cues(pending, len(pending))
+
+
+def parse_json3(data: str | bytes) -> Iterator[Cue]:
+    """
+    Parses YouTube's json3 timed-text format into cues.
+
+    Events without text, like the line breaks of auto-captions, are skipped.
+
+    :param data: The json3 document
+    :return: Iterator over the cues with non-empty text
+    """
+    for event in json.loads(data).get("events") or []:
+        text = clean_text("".join(seg.get("utf8", "") for seg in event.get("segs") or []))
+        if text:
+            start = event.get("tStartMs", 0) / 1000
+            yield Cue(start, start + event.get("dDurationMs", 0) / 1000, text)
+
+
+def parse_srv3(stream: IO[bytes]) -> Iterator[Cue]:
+    """
+    Parses YouTube's srv3 timed-text XML into cues incrementally, releasing every paragraph once parsed.
+
+    :param stream: Binary stream with the XML document
+    :return: Iterator over the cues with non-empty text
+    """
+    for _, element in ElementTree.iterparse(stream):
+        if element.tag == "p":
+            text = clean_text("".join(element.itertext()))
+            if text:
+                start = int(element.get("t", 0)) / 1000
+                yield Cue(start, start + int(element.get("d", 0)) / 1000, text)
+            element.clear()
+
+
+def iter_cues(stream: IO[bytes], ext: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Cue]:
+    """
+    Parses subtitles in the given format into cues while reading them from a byte stream.
+
+    SRT and WebVTT are decoded and parsed chunk by chunk and srv3 is parsed as an XML event stream.
+    json3 has to be loaded whole, as the standard library has no incremental JSON parser.
+
+    :param stream: Binary stream with the UTF-8 encoded subtitles
+    :param ext: Subtitle format, one of "srt", "vtt", "json3" and "srv3"
+    :param chunk_size: Number of bytes read from the stream at a time
+    :return: Iterator over the cues
+    :raises ValueError: If the format is not supported
+    """
+    if ext in ("srt", "vtt"):
+        return parse_timed_text(iter_text(stream, chunk_size))
+    if ext == "json3":
+        return parse_json3(stream.read())
+    if ext == "srv3":
+        return parse_srv3(stream)
+    raise ValueError(f"Unsupported subtitle format: {ext}")
+
+
+def _rolling_overlap(tail: str, text: str) -> str:
+    """Returns the longest run of whole words that ends `tail` and starts `text`, or an empty string."""
+    if tail.endswith(text) and (len(tail) == len(text) or tail[-len(text) - 1] == " "):
+        return text
+    # Every overlap ends with the last word of the tail, so only its occurrences in the text are tried,
+    # from the last one back, and the first that closes a run of words ending the tail is the longest.
+    last_word = tail[tail.rfind(" ") + 1 :]
+    stop = text.rfind(last_word) + len(last_word)
+    while stop >= len(last_word) > 0:
+        overlap = text[:stop]
+        if (stop == len(text) or text[stop] == " ") and tail.endswith(overlap):
+            if stop == len(tail) or tail[-stop - 1] == " ":
+                return overlap
+        stop = text.rfind(last_word, 0, stop - 1) + len(last_word)
+    return ""
+
+
+def merge_rolling_cues(cues: Iterable[Cue]) -> Iterator[Cue]:
+    """
+    Removes the text each cue repeats from the previous ones, as in YouTube's rolling auto-captions.
+
+    Auto-captions show two lines at a time, so every cue starts with the line of the cue before it.
+    The longest run of words that ends the text emitted so far and starts the new cue is dropped from
+    the new cue, and cues left without text are skipped. Overlaps shorter than `MIN_ROLLING_OVERLAP_WORDS`
+    are kept unless they cover the whole cue, so a word legitimately repeated across cues survives.
+
+    :param cues: Cues in time order, with text normalized by `clean_text`
+    :return: Iterator over the cues with only their new text
+    """
+    tail = ""
+    for cue in cues:
+        text = cue.text
+        overlap = _rolling_overlap(tail, text)
+        if overlap and (len(overlap) == len(text) or overlap.count(" ") + 1 >= MIN_ROLLING_OVERLAP_WORDS):
+            text = text[len(overlap) + 1 :]
+        if text:
+            tail = f"{tail} {text}" if tail else text
+            if len(tail) > MAX_ROLLING_OVERLAP_CHARS:
+                tail = tail[tail.find(" ", len(tail) - MAX_ROLLING_OVERLAP_CHARS) + 1 :]
+            yield Cue(cue.start, cue.end, text) if text is not cue.text else cue
+
+
+def cues_to_text(cues: Iterable[Cue], pause_seconds: float = PAUSE_SECONDS) -> str:
+    """
+    Joins the text of cues into a single transcript that keeps their boundaries.
+
+    Every cue goes on its own line, and a pause of at least `pause_seconds` between two cues becomes a blank
+    line, so segmenters can fall back to cue boundaries and pauses when the captions lack punctuation.
+
+    :param cues: Cues in time order
+    :param pause_seconds: Minimum silence between cues that starts a new paragraph
+    :return: The transcript text
+    """
+    return "".join(iter_transcript(cues, pause_seconds))
+
+
+def iter_transcript(cues: Iterable[Cue], pause_seconds: float = PAUSE_SECONDS) -> Iterator[str]:
+    """
+    Incremental variant of `cues_to_text`, yielding the transcript cue by cue as the cues are parsed.
+
+    :param cues: Cues in time order
+    :param pause_seconds: Minimum silence between cues that starts a new paragraph
+    :return: Iterator over consecutive pieces of the transcript, each cue's text preceded by its line break
+    """
+    previous_end: float | None = None
+    for cue in cues:
+        if previous_end is None:
+            yield cue.text
+        else:
+            yield ("\n\n" if cue.start - previous_end >= pause_seconds else "\n") + cue.text
+        previous_end = cue.end
+
+
+class TimedTranscript:
+    """
+    A transcript that keeps the timing of its cues, so it can be chunked on cue and chapter boundaries.
+
+    The text of all cues lives in one shared buffer, joined as by `cues_to_text`. Every cue is described by
+    its start and end time and the span of its text in the buffer, kept in typed arrays rather than as one
+    object per cue, so even the transcript of a ten-hour video takes a few hundred kilobytes of timing.
+    A transcript stored before timing was kept has no cues and only its text.
+    """
+
+    def __init__(self, chapters: Iterable[Chapter] = (), pause_seconds: float = PAUSE_SECONDS):
+        """
+        Initialize an empty transcript.
+
+        :param chapters: Chapters of the video, in any order
+        :param pause_seconds: Minimum silence between cues that starts a new paragraph
+        """
+        self.chapters = sorted(chapters)
+        self.starts = array("d")
+        self.ends = array("d")
+        self.offsets = array("q")
+        self.stops = array("q")
+        self._pause_seconds = pause_seconds
+        self._pieces: list[str] = []
+        self._length = 0
+
+    @classmethod
+    def from_cues(
+        cls, cues: Iterable[Cue], chapters: Iterable[Chapter] = (), pause_seconds: float = PAUSE_SECONDS
+    ) -> "TimedTranscript":
+        """
+        Builds a transcript from cues.
+
+        :param cues: Cues in time order, with text normalized by `clean_text`
+        :param chapters: Chapters of the video
+        :param pause_seconds: Minimum silence between cues that starts a new paragraph
+        :return: The transcript
+        """
+        transcript = cls(chapters, pause_seconds)
+        for cue in cues:
+            transcript.append(cue)
+        return transcript
+
+    @classmethod
+    def from_text(cls, text: str) -> "TimedTranscript":
+        """
+        Wraps a transcript whose cue timing is unknown.
+
+        :param text: The transcript text
+        :return: A transcript without cues
+        """
+        transcript = cls()
+        transcript._pieces.append(text)
+        transcript._length = len(text)
+        return transcript
+
+    @classmethod
+    def from_dict(cls, text: str, data: dict[str, Any]) -> "TimedTranscript":
+        """
+        Restores a transcript from its text and the timing saved by `to_dict`.
+
+        :param text: The transcript text
+        :param data: The saved timing
+        :return: The transcript
+        :raises ValueError: If the timing does not match the text
+        """
+        transcript = cls.from_text(text)
+        transcript.chapters = sorted(Chapter(start, end, title) for start, end, title in data["chapters"])
+        transcript.starts.extend(start / 1000 for start in data["starts"])
+        transcript.ends.extend(end / 1000 for end in data["ends"])
+        transcript.offsets.extend(data["offsets"])
+        transcript.stops.extend(data["stops"])
+        counts = {len(transcript.starts), len(transcript.ends), len(transcript.offsets), len(transcript.stops)}
+        if len(counts) != 1 or (transcript.stops and transcript.stops[-1] > len(text)):
+            raise ValueError("The cue timing does not match the transcript.")
+        return transcript
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the timing of the transcript as JSON-serializable data, with times in milliseconds.
+
+        :return: The chapters and the times and text spans of the cues
+        """
+        return {
+            "chapters": [list(chapter) for chapter in self.chapters],
+            "starts": [round(start * 1000) for start in self.starts],
+            "ends": [round(end * 1000) for end in self.ends],
+            "offsets": self.offsets.tolist(),
+            "stops": self.stops.tolist(),
+        }
+
+    def append(self, cue: Cue) -> str:
+        """
+        Adds a cue at the end of the transcript.
+
+        :param cue: The next cue in time order
+        :return: The text appended to the transcript, i.e. the cue's text preceded by its line break
+        """
+        separator = ""
+        if self.ends:
+            separator = "\n\n" if cue.start - self.ends[-1] >= self._pause_seconds else "\n"
+        self.starts.append(cue.start)
+        self.ends.append(cue.end)
+        self.offsets.append(self._length + len(separator))
+        self._length += len(separator) + len(cue.text)
+        self.stops.append(self._length)
+        piece = separator + cue.text
+        self._pieces.append(piece)
+        return piece
+
+    @property
+    def text(self) -> str:
+        """The transcript text, as `cues_to_text` joins the cues."""
+        if len(self._pieces) != 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0]
+
+    @property
+    def cue_count(self) -> int:
+        """The number of cues, 0 if their timing is unknown."""
+        return len(self.offsets)
+
+    def chapter_breaks(self) -> list[int]:
+        """
+        Returns the offsets in the text where chapters start, each at the first cue starting in its chapter.
+
+        :return: Ascending offsets, without the start of the text
+        """
+        breaks: list[int] = []
+        for index in self._chapter_cues():
+            if 0 < index < self.cue_count and (not breaks or breaks[-1] < self.offsets[index]):
+                breaks.append(self.offsets[index])
+        return breaks
+
+    def sections(self, spans: Sequence[tuple[int, int]]) -> list[Section]:
+        """
+        Describes chunks of the text by the time they span and the chapters they cover.
+
+        A chunk covers the chapter its first cue belongs to and every chapter starting within it.
+
+        :param spans: Character spans of the chunks, e.g. from `LLM.plan_chunks`
+        :return: One section per span, or none if the transcript has no cues
+        """
+        if not self.cue_count:
+            return []
+        chapter_cues = self._chapter_cues()
+        sections = []
+        for offset, stop in spans:
+            first = max(bisect_right(self.offsets, offset) - 1, 0)
+            last = max(bisect_left(self.offsets, stop) - 1, first)
+            covered = self.chapters[max(bisect_right(chapter_cues, first) - 1, 0) : bisect_right(chapter_cues, last)]
+            titles = tuple(chapter.title for chapter in covered)
+            sections.append(Section(self.starts[first], self.ends[last], offset, stop, titles))
+        return sections
+
+    def _chapter_cues(self) -> list[int]:
+        """Returns the index of the first cue starting at or after the start of each chapter."""
+        return [bisect_left(self.starts, chapter.start) for chapter in self.chapters]
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from ytsum.config import TRANSCRIPT_CACHE_DIR
+from ytsum.youtube.captions import TimedTranscript
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+INDEX_LOCK_NAME = "index.json.lock"
+
+
+@dataclass
+class TranscriptEntry:
+    """Metadata of a stored transcript, as kept in the store's index."""
+
+    title: str
+    duration: float | None
+    language: str
+    source: str
+    size: int
+    fetched_at: float
+
+
+class TranscriptStore:
+    """
+    Persistent store of cleaned transcripts and their video metadata, keyed by video ID.
+
+    Every transcript is a `<video_id>.txt` file, with the timing of its cues and the video's chapters in a
+    `<video_id>.cues.json` file next to it, and the metadata of all of them lives in a single JSON index,
+    so lookups read one small file instead of scanning the directory. The index is loaded once and reloaded
+    only when another process has rewritten it. Changes to the index hold a file lock from loading it to
+    replacing it, so processes sharing the store never overwrite each other's entries. Platforms without
+    `fcntl` only serialize changes within the process.
+
+    Entries fetched longer ago than the TTL are stale: they are still returned, but callers are expected to
+    revalidate them against fresh video metadata before use. A transcript file's access time is bumped on
+    every read and drives least-recently-used eviction once the store exceeds its size limit.
+    """
+
+    def __init__(
+        self,
+        directory: str = TRANSCRIPT_CACHE_DIR,
+        max_bytes: int = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", 500)) * 1024 * 1024,
+        ttl_seconds: float = float(os.getenv("TRANSCRIPT_CACHE_TTL_DAYS", 7)) * 24 * 3600,
+    ):
+        """
+        Initialize the store, creating its directory if needed.
+
+        :param directory: Directory holding the transcripts and the index
+        :param max_bytes: Maximum total size of the transcripts, 500 MB or `TRANSCRIPT_CACHE_MAX_MB` by default
+        :param ttl_seconds: Age after which an entry is stale, 7 days or `TRANSCRIPT_CACHE_TTL_DAYS` by default
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._index: dict[str, TranscriptEntry] = {}
+        self._index_version: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def index_path(self) -> str:
+        """Path of the JSON index with the metadata of every stored transcript."""
+        return os.path.join(self._directory, INDEX_NAME)
+
+    def get_entry(self, video_id: str) -> TranscriptEntry | None:
+        """
+        Returns the metadata of a stored transcript without reading the transcript itself.
+
+        :param video_id: YouTube video ID
+        :return: The entry, or None if the video is not stored
+        """
+        with self._lock:
+            self._reload()
+            return self._index.get(video_id)
+
+    def is_stale(self, entry: TranscriptEntry) -> bool:
+        """
+        Returns True if an entry was fetched longer ago than the TTL and should be revalidated.
+
+        :param entry: Entry returned by `get_entry`
+        :return: Whether the entry needs revalidation
+        """
+        return time.time() - entry.fetched_at > self._ttl_seconds
+
+    def read_transcript(self, video_id: str) -> str | None:
+        """
+        Reads a stored transcript and marks it as recently used.
+
+        :param video_id: YouTube video ID
+        :return: The transcript, or None if it is missing
+        """
+        path = self._path(video_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                transcript = f.read()
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+            return transcript
+        except FileNotFoundError:
+            return None
+
+    def read_timed_transcript(self, video_id: str) -> TimedTranscript | None:
+        """
+        Reads a stored transcript with the timing of its cues and marks it as recently used.
+
+        A transcript stored without timing, or with unreadable timing, is returned without cues.
+
+        :param video_id: YouTube video ID
+        :return: The transcript, or None if it is missing
+        """
+        transcript = self.read_transcript(video_id)
+        if transcript is None:
+            return None
+        try:
+            with open(self._timing_path(video_id), encoding="utf-8") as f:
+                return TimedTranscript.from_dict(transcript, json.load(f))
+        except FileNotFoundError:
+            return TimedTranscript.from_text(transcript)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cue timing of {video_id}: {e}")
+            return TimedTranscript.from_text(transcript)
+
+    def put(
+        self,
+        video_id: str,
+        transcript: str | TimedTranscript,
+        title: str,
+        duration: float | None,
+        language: str,
+        source: str,
+    ) -> None:
+        """
+        Stores a transcript with its metadata, then evicts least recently used transcripts over the size limit.
+
+        :param video_id: YouTube video ID
+        :param transcript: Cleaned transcript text, with the timing of its cues to store it too
+        :param title: Title of the video
+        :param duration: Duration of the video in seconds, if known
+        :param language: Language code of the subtitle track, e.g. "en" or "en-US"
+        :param source: "official" for uploaded subtitles, "automatic" for auto-generated captions
+        """
+        timing = b""
+        if isinstance(transcript, TimedTranscript):
+            timing = json.dumps(transcript.to_dict(), separators=(",", ":")).encode("utf-8")
+            transcript = transcript.text
+        data = transcript.encode("utf-8")
+        self._write_atomic(self._path(video_id), data)
+        if timing:
+            self._write_atomic(self._timing_path(video_id), timing)
+        else:
+            self._remove(self._timing_path(video_id))
+        entry = TranscriptEntry(title, duration, language, source, len(data) + len(timing), time.time())
+        with self._index_lock():
+            self._reload()
+            self._index[video_id] = entry
+            self._evict()
+            self._save()
+
+    def revalidate(self, video_id: str, title: str, duration: float | None) -> None:
+        """
+        Marks a stale entry as fresh again after its subtitle track was confirmed to be unchanged.
+
+        The title and duration are replaced by the current ones, as a video can be renamed without its
+        subtitles changing.
+
+        :param video_id: YouTube video ID
+        :param title: Current title of the video
+        :param duration: Current duration of the video in seconds, if known
+        """
+        with self._index_lock():
+            self._reload()
+            entry = self._index.get(video_id)
+            if entry is not None:
+                entry.title = title
+                entry.duration = duration
+                entry.fetched_at = time.time()
+                self._save()
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Holds the lock, and the index's file lock shared with other processes, while the index is changed."""
+        with self._lock:
+            try:
+                import fcntl
+            except ImportError:
+                yield
+                return
+
+            with open(os.path.join(self._directory, INDEX_LOCK_NAME), "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _evict(self) -> None:
+        """Removes least recently read transcripts until the size limit holds. Must hold the index lock."""
+        total_bytes = sum(entry.size for entry in self._index.values())
+        if total_bytes <= self._max_bytes:
+            return
+
+        def last_access(video_id: str) -> float:
+            try:
+                return os.stat(self._path(video_id)).st_atime
+            except FileNotFoundError:
+                return 0.0
+
+        removed = 0
+        for video_id in sorted(self._index, key=last_access):
+            if total_bytes <= self._max_bytes:
+                break
+            total_bytes -= self._index.pop(video_id).size
+            self._remove(self._path(video_id))
+            self._remove(self._timing_path(video_id))
+            removed += 1
+        logger.debug(f"Evicted {removed} transcripts from {self._directory}")
+
+    def _reload(self) -> None:
+        """Loads the index if it was never loaded or another process has rewritten it. Must hold the lock."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        # Every save replaces the file, so its inode changes even if two saves share a modification time.
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._index_version:
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                raw: dict[str, dict[str, Any]] = json.load(f)
+            self._index = {video_id: TranscriptEntry(**fields) for video_id, fields in raw.items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable transcript index {self.index_path}: {e}")
+            self._index = {}
+        self._index_version = version
+
+    def _save(self) -> None:
+        """Writes the index atomically. Must hold the index lock."""
+        raw = {video_id: asdict(entry) for video_id, entry in self._index.items()}
+        self._write_atomic(self.index_path, json.dumps(raw, separators=(",", ":")).encode("utf-8"))
+        stat = os.stat(self.index_path)
+        self._index_version = (stat.st_ino, stat.st_mtime_ns)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """Writes a file through a temporary file in the store directory, so readers never see it half-written."""
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _path(self, video_id: str) -> str:
+        """Returns the file path of a stored transcript."""
+        return os.path.join(self._directory, f"{video_id}.txt")
+
+    def _timing_path(self, video_id: str) -> str:
+        """Returns the file path of the cue timing and chapters of a stored transcript."""
+        return os.path.join(self._directory, f"{video_id}.cues.json")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        """Removes a file if it exists."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
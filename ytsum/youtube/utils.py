@@ -1,5 +1,18 @@
+import io
 import logging
 import re
+from collections.abc import Iterator
+from typing import IO
+
+from ytsum.youtube.captions import (
+    STREAM_CHUNK_SIZE,
+    Cue,
+    cues_to_text,
+    iter_cues,
+    iter_transcript,
+    merge_rolling_cues,
+    parse_json3,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -8,27 +21,123 @@ def get_raw_text_from_srt(srt_subs: str) -> str:
     """
     Parses SRT subtitle content and returns clean text:
     - Removes indices and timestamps
-    - Strips annotations like [music], [applause]
+    - Strips annotations like [music], [applause] and inline tags like <i>
     - Preserves multi-line dialogue as single lines
+    - Drops text repeated from the previous cues, as in rolling auto-captions
+    """
+    return parse_subtitles(srt_subs, "srt")
+
+
+def get_raw_text_from_vtt(vtt_subs: str) -> str:
+    """
+    Parses WebVTT subtitle content and returns clean text:
+    - Removes the header, cue identifiers, timestamps and cue settings
+    - Strips inline timing and styling tags like <00:00:01.120> or <c>
+    - Strips annotations like [music], [applause]
+    - Drops text repeated from the previous cues, as in rolling auto-captions
+    """
+    return parse_subtitles(vtt_subs, "vtt")
+
+
+def get_raw_text_from_json3(json3_subs: str | bytes) -> str:
+    """
+    Parses YouTube's json3 timed-text content and returns clean text:
+    - Joins the segments of every caption event
+    - Skips events without text, like the line breaks of rolling auto-captions
+    - Strips annotations like [music], [applause]
+    """
+    return cues_to_text(merge_rolling_cues(parse_json3(json3_subs)))
+
+
+def parse_subtitles(content: str, ext: str) -> str:
+    """
+    Parses subtitle content in the given format into clean text.
+
+    Supported formats are "srt", "vtt", "json3" and "srv3".
+    """
+    return parse_subtitle_stream(io.BytesIO(content.encode("utf-8")), ext)
+
+
+def parse_subtitle_stream(stream: IO[bytes], ext: str, chunk_size: int = STREAM_CHUNK_SIZE) -> str:
+    """
+    Parses subtitles in the given format into clean text while reading them from a byte stream,
+    e.g. an HTTP response, without buffering the whole payload as text first.
+
+    :param stream: Binary stream with the UTF-8 encoded subtitles
+    :param ext: Subtitle format, one of "srt", "vtt", "json3" and "srv3"
+    :param chunk_size: Number of bytes read from the stream at a time
+    :return: The clean subtitle text
+    :raises ValueError: If the format is not supported
     """
-    logger.debug(f"Parsing srt subtitles: {srt_subs}")
-    blocks = srt_subs.strip().split("\n\n")
-    lines = []
+    return cues_to_text(merge_rolling_cues(iter_cues(stream, ext, chunk_size)))
 
-    for block in blocks:
-        parts = block.strip().splitlines()
 
-        if len(parts) < 3:
-            continue
+def iter_subtitle_stream(stream: IO[bytes], ext: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Incremental variant of `parse_subtitle_stream`, yielding the clean text cue by cue while the subtitles
+    are read, so the transcript can be processed before the stream has been read to its end.
+
+    :param stream: Binary stream with the UTF-8 encoded subtitles
+    :param ext: Subtitle format, one of "srt", "vtt", "json3" and "srv3"
+    :param chunk_size: Number of bytes read from the stream at a time
+    :return: Iterator over consecutive pieces of the clean subtitle text, which join to the whole text
+    :raises ValueError: If the format is not supported
+    """
+    return iter_transcript(merge_rolling_cues(iter_cues(stream, ext, chunk_size)))
+
+
+def iter_subtitle_cues(
+    stream: IO[bytes], ext: str, chunk_size: int = STREAM_CHUNK_SIZE, automatic: bool = True
+) -> Iterator[Cue]:
+    """
+    Parses subtitles in the given format into cues while reading them from a byte stream, dropping the
+    text repeated by rolling auto-captions, so the timing of the clean text is kept.
+
+    Official subtitles do not roll, so their cues are kept as they are; a line a speaker repeats is then
+    never mistaken for rolled text.
+
+    :param stream: Binary stream with the UTF-8 encoded subtitles
+    :param ext: Subtitle format, one of "srt", "vtt", "json3" and "srv3"
+    :param chunk_size: Number of bytes read from the stream at a time
+    :param automatic: Whether the subtitles are automatic captions, whose rolled text is dropped
+    :return: Iterator over the cues with only their new text
+    :raises ValueError: If the format is not supported
+    """
+    cues = iter_cues(stream, ext, chunk_size)
+    return merge_rolling_cues(cues) if automatic else cues
+
+
+_VIDEO_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})")
+_COLLECTION_PATTERN = re.compile(r"[?&]list=|/playlist\b|/@|/channel/|/c/|/user/")
 
-        text_lines = [line for line in parts[2:] if line.strip()]
-        cleaned = [re.sub(r"\[.*?]", "", line).strip() for line in text_lines]
 
-        block_text = " ".join(filter(None, cleaned))
-        if block_text:
-            lines.append(block_text)
+def get_video_id(url: str) -> str | None:
+    """
+    Extracts the 11-character video ID from a YouTube video URL.
+
+    Supports `watch?v=`, `youtu.be/`, `shorts/`, `embed/` and `live/` URL forms.
+    Returns None if the URL does not contain a recognizable video ID.
+    """
+    match = _VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
 
-    subtitles = " ".join(lines)
-    logger.debug(f"Srt subtitles parsed as {subtitles}")
 
-    return subtitles
+def is_collection_url(url: str) -> bool:
+    """
+    Returns True if the URL points to a playlist or a channel rather than a single video.
+
+    A watch URL carrying a `list=` parameter is treated as a playlist.
+    """
+    return bool(_COLLECTION_PATTERN.search(url))
+
+
+def get_timestamp_url(url: str, seconds: float) -> str:
+    """
+    Returns a link to a video that starts playing at the given time.
+
+    Returns the URL unchanged if it does not contain a recognizable video ID.
+    """
+    video_id = get_video_id(url)
+    if video_id is None:
+        return url
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
@@ -1,111 +1,420 @@
-import glob
 import logging
-import os
-import tempfile
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, NamedTuple
 
-import yt_dlp
+from ytsum.utils.metrics import timed
+from ytsum.utils.single_flight import get_single_flight
+from ytsum.youtube.captions import Chapter, TimedTranscript
+from ytsum.youtube.utils import get_video_id, iter_subtitle_cues
 
-from ytsum.youtube.utils import get_raw_text_from_srt
+if TYPE_CHECKING:
+    from ytsum.youtube.transcript_store import TranscriptStore
 
 logger = logging.getLogger(__name__)
 
+SUBTITLE_FORMATS = ("json3", "srv3", "vtt", "srt")
+INFO_CACHE_SIZE = 64
+# Seconds an extracted info dict is reused, long enough for the title and subtitle lookups of one summary but
+# far shorter than the lifetime of the signed subtitle URLs it holds.
+INFO_CACHE_TTL_SECONDS = 60.0
 
-def get_video_subtitles(youtube_url: str) -> str | None:
+# Futures of extractions with the monotonic time their result expires at, infinite while still in flight.
+_info_cache: OrderedDict[str, tuple[Future[dict[str, Any]], float]] = OrderedDict()
+_info_cache_lock = threading.Lock()
+
+
+class QuietLogger:
+    """Custom logger to suppress yt-dlp output."""
+
+    def debug(self, msg: str) -> None:
+        """Discard a debug message."""
+
+    def warning(self, msg: str) -> None:
+        """Discard a warning."""
+
+    def error(self, msg: str) -> None:
+        """Discard an error message."""
+
+
+YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "nocheckcertificate": True,
+    "skip_download": True,
+    "logger": QuietLogger(),  # Suppress yt-dlp logs
+}
+
+
+def get_video_info(url: str, fresh: bool = False) -> dict[str, Any]:
+    """
+    Extracts the metadata of a YouTube video, including its title and available subtitle tracks.
+
+    Concurrent calls for the same URL share the result of a single `extract_info` call, and a completed result
+    is reused for `INFO_CACHE_TTL_SECONDS`, so title and subtitle lookups do not fetch the video page twice.
+    Results are not kept longer, as the subtitle URLs they hold are signed and expire.
+
+    :param url: URL of the YouTube video
+    :param fresh: Whether to skip a completed result and only share an extraction still in flight
+    :return: The yt-dlp info dict of the video
+    :raises RuntimeError: If the metadata cannot be extracted
+    """
+    with _info_cache_lock:
+        entry = _info_cache.get(url)
+        now = time.monotonic()
+        if entry is not None and (now >= entry[1] or (fresh and entry[0].done())):
+            entry = None
+        owner = entry is None
+        if entry is None:
+            future: Future[dict[str, Any]] = Future()
+            _info_cache[url] = (future, math.inf)
+            while len(_info_cache) > INFO_CACHE_SIZE:
+                _info_cache.popitem(last=False)
+        else:
+            future = entry[0]
+            _info_cache.move_to_end(url)
+
+    if owner:
+        try:
+            info_dict = _extract_info(url)
+        except BaseException as e:
+            # Waiters are released even if the extraction is interrupted, e.g. by Ctrl+C, and the next call retries.
+            with _info_cache_lock:
+                if _info_cache.get(url, (None,))[0] is future:
+                    del _info_cache[url]
+            future.set_exception(e)
+            raise
+        else:
+            with _info_cache_lock:
+                if _info_cache.get(url, (None,))[0] is future:
+                    _info_cache[url] = (future, time.monotonic() + INFO_CACHE_TTL_SECONDS)
+            future.set_result(info_dict)
+    return future.result()
+
+
+@timed("ytdlp_extract")
+def _extract_info(url: str) -> dict[str, Any]:
+    """Runs a single yt-dlp metadata extraction for a video URL."""
+    import yt_dlp
+
+    logger.info(f"Extracting video info for URL: {url}")
+    try:
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            info_dict = ydl.extract_info(url, download=False)
+    except Exception as e:
+        raise RuntimeError(f"Error extracting video info for {url}: {e}") from e
+    if info_dict is None:
+        raise RuntimeError(f"Could not extract video info for URL: {url}")
+    return dict(info_dict)
+
+
+def select_subtitle_track(info_dict: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    Chooses the English subtitle track to download from a video's info dict.
+
+    Official subtitles are preferred over automatic captions, plain "en" over regional variants
+    like en-GB or en-US, and formats earlier in `SUBTITLE_FORMATS` over later ones.
+
+    :param info_dict: The yt-dlp info dict of the video
+    :return: The chosen track (with "url", "ext", "language" and "source" keys), or None if there is none
+    """
+    for source, key in (("official", "subtitles"), ("automatic", "automatic_captions")):
+        tracks_by_language: dict[str, list[dict[str, Any]]] = info_dict.get(key) or {}
+        languages = sorted(
+            (language for language in tracks_by_language if language == "en" or language.startswith("en-")),
+            key=lambda language: language != "en",
+        )
+        for language in languages:
+            tracks = {track.get("ext"): track for track in tracks_by_language[language] if track.get("url")}
+            for ext in SUBTITLE_FORMATS:
+                if ext in tracks:
+                    return {**tracks[ext], "language": language, "source": source}
+    return None
+
+
+def get_chapters(info_dict: dict[str, Any]) -> list[Chapter]:
+    """
+    Reads the chapters of a video from its info dict.
+
+    :param info_dict: The yt-dlp info dict of the video
+    :return: The chapters with a start time, in the order listed, or an empty list if there are none
+    """
+    chapters = []
+    for chapter in info_dict.get("chapters") or []:
+        start = chapter.get("start_time")
+        if start is not None:
+            end = chapter.get("end_time")
+            chapters.append(
+                Chapter(float(start), float(start if end is None else end), str(chapter.get("title") or ""))
+            )
+    return chapters
+
+
+def get_video_subtitles(youtube_url: str, store: "TranscriptStore | None" = None) -> str | None:
     """
     Downloads English subtitles or auto-generated English subtitles (including en variants like en-GB, en-US)
     from a YouTube video URL. Returns the subtitle content as a string, or None if no subtitles are available.
+
+    The track is chosen from the shared video info and parsed incrementally while it is read from the
+    response, without touching the filesystem. Only sizes are logged, never the subtitle content.
+
+    If a transcript store is given, it is consulted first. A stale transcript is kept without downloading
+    it again if fresh video info still offers a track of the same language and source.
+
+    Concurrent calls for the same video share a single download.
+
+    :param youtube_url: URL of the YouTube video
+    :param store: Transcript store to read from and write to, or None to always download
+    :return: The clean subtitle text, or None if no subtitles are available
+    """
+    transcript = get_video_transcript(youtube_url, store)
+    return transcript.text if transcript is not None else None
+
+
+@timed("subtitles")
+def get_video_transcript(youtube_url: str, store: "TranscriptStore | None" = None) -> TimedTranscript | None:
+    """
+    Variant of `get_video_subtitles` that keeps the timing of every cue and the chapters of the video,
+    for chunking the transcript on cue and chapter boundaries and linking to the time of each chunk.
+
+    A transcript stored before timing was kept is returned without cues.
+
+    :param youtube_url: URL of the YouTube video
+    :param store: Transcript store to read from and write to, or None to always download
+    :return: The timed transcript, or None if no subtitles are available
     """
+    # Only the leader's store receives the download, so callers with another store, or none, do not join it.
+    location = store.index_path if store is not None else ""
+    key = f"{location}:{get_video_id(youtube_url) or youtube_url}"
+    transcript: TimedTranscript | None = get_single_flight("subtitles").do(
+        key, lambda: _download_subtitles(youtube_url, store)
+    )
+    return transcript
+
+
+class _SubtitleDownload(NamedTuple):
+    """A subtitle track chosen for download, with the video info and ID it is stored under."""
+
+    track: dict[str, Any]
+    info_dict: dict[str, Any]
+    video_id: str
+
+
+class SubtitleStream(Iterator[str]):
+    """
+    Pieces of a subtitle track's clean text, downloaded and parsed only as they are consumed.
+
+    The track is known before its download starts, so `track_key` lets a summary of the same track be looked up
+    without reading it.
+    """
+
+    def __init__(self, pieces: Iterator[str], track_key: str | None):
+        """
+        Wrap the pieces of a track.
+
+        :param pieces: Iterator downloading and parsing the track
+        :param track_key: Video ID, language and source of the track, or None if the video ID is unknown
+        """
+        self._pieces = pieces
+        self.track_key = track_key
+
+    def __next__(self) -> str:
+        """Returns the next piece of the text, downloading more of the track as needed."""
+        return next(self._pieces)
+
+
+def stream_video_subtitles(
+    youtube_url: str, store: "TranscriptStore | None" = None
+) -> TimedTranscript | SubtitleStream | None:
+    """
+    Streaming variant of `get_video_subtitles`, for summarizing a transcript while it is still being downloaded.
+
+    A transcript found in the store is returned whole, as in `get_video_transcript`. Otherwise the track is
+    chosen up front and a `SubtitleStream` is returned that downloads and parses it only as it is consumed,
+    yielding the clean text cue by cue and writing the complete transcript to the store at its end. Unlike
+    `get_video_subtitles`, concurrent calls for the same video do not share a download; callers coalesce on the
+    stream's `track_key` instead, before consuming it.
+
+    :param youtube_url: URL of the YouTube video
+    :param store: Transcript store to read from and write to, or None to always download
+    :return: The stored timed transcript, a stream of pieces of the downloaded text, or None if no
+        subtitles are available
+    """
+    try:
+        subtitles = _find_subtitles(youtube_url, store)
+    except Exception as e:
+        logger.error(f"Error downloading subtitles for {youtube_url}: {e}")
+        return None
+    if isinstance(subtitles, _SubtitleDownload):
+        track = subtitles.track
+        track_key = f"{subtitles.video_id}:{track['language']}:{track['source']}" if subtitles.video_id else None
+        return SubtitleStream(_stream_subtitles(youtube_url, subtitles, store), track_key)
+    return subtitles
+
+
+def _download_subtitles(youtube_url: str, store: "TranscriptStore | None") -> TimedTranscript | None:
+    """Reads the subtitles of a video from the store or downloads them, as described in `get_video_subtitles`."""
+    try:
+        subtitles = _find_subtitles(youtube_url, store)
+        if isinstance(subtitles, _SubtitleDownload):
+            transcript = TimedTranscript(get_chapters(subtitles.info_dict))
+            for _ in _read_subtitles(subtitles, store, transcript):
+                pass
+            return transcript if transcript.text else None
+        return subtitles
+    except Exception as e:
+        logger.error(f"Error downloading subtitles for {youtube_url}: {e}")
+        return None
+
+
+def _find_subtitles(youtube_url: str, store: "TranscriptStore | None") -> TimedTranscript | _SubtitleDownload | None:
+    """Returns the stored transcript of a video if it is still current, or else the track to download, if any."""
     logger.info(f"Starting subtitle download for URL: {youtube_url}")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        base_path = os.path.join(tmpdir, "subs")
-
-        def find_srt_file() -> str | None:
-            matches = glob.glob(os.path.join(tmpdir, "subs.en*.srt"))
-            if matches:
-                logger.info(f"Found subtitle file: {matches[0]}")
-                return matches[0]
-            return None
-
-        ydl_opts = {
-            "quiet": True,
-            "no_warnings": True,
-            "writesubtitles": True,
-            "subtitleslangs": ["en.*"],  # Match all English variants
-            "subtitlesformat": "srt",
-            "skip_download": True,
-            "outtmpl": f"{base_path}.%(ext)s",
-        }
+    video_id = get_video_id(youtube_url) or ""
+    if not video_id:
+        store = None
+    entry = store.get_entry(video_id) if store is not None else None
+    if store is not None and entry is not None and not store.is_stale(entry):
+        transcript = store.read_timed_transcript(video_id)
+        if transcript is not None:
+            logger.info(f"Using stored transcript (size: {len(transcript.text)} characters).")
+            return transcript
 
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Attempt to download official subtitles
-                logger.info("Attempting to download official English subtitles...")
-                ydl.download([youtube_url])
+    # Revalidating a stored transcript must see the tracks the video has now, not a recently cached answer.
+    info_dict = get_video_info(youtube_url, fresh=entry is not None)
+    track = select_subtitle_track(info_dict)
+    if track is None:
+        logger.info("No subtitles found.")
+        return None
 
-                subs_file = find_srt_file()
+    # A stale transcript is still current if the same track would be downloaded again, unless the video was
+    # re-cut, which shows as a different duration.
+    duration = info_dict.get("duration")
+    stored_track = (entry.language, entry.source) if entry is not None else None
+    recut = entry is not None and None not in (entry.duration, duration) and entry.duration != duration
+    if store is not None and stored_track == (track["language"], track["source"]) and not recut:
+        transcript = store.read_timed_transcript(video_id)
+        if transcript is not None:
+            store.revalidate(video_id, str(info_dict.get("title") or ""), duration)
+            logger.info(f"Revalidated stored transcript (size: {len(transcript.text)} characters).")
+            return transcript
 
-                # Try auto-generated subtitles if no official subtitles are found
-                if subs_file is None:
-                    logger.info("Official subtitles not found. Trying auto-generated subtitles...")
-                    ydl_opts["writeautomaticsub"] = True
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl_auto:
-                        ydl_auto.download([youtube_url])
-                        subs_file = find_srt_file()
+    return _SubtitleDownload(track, info_dict, video_id)
 
-                if subs_file is None:
-                    logger.info("No subtitles found.")
-                    return None
 
-                with open(subs_file, encoding="utf-8") as f:
-                    content = f.read()
-                    logger.info(f"Successfully read subtitles from {subs_file} (size: {len(content)} characters).")
-                    logger.debug(content)
-                    return get_raw_text_from_srt(content)
+def _read_subtitles(
+    download: _SubtitleDownload, store: "TranscriptStore | None", transcript: TimedTranscript
+) -> Iterator[str]:
+    """
+    Downloads and parses a subtitle track into a transcript, yielding its clean text cue by cue and storing
+    the transcript at the end.
+    """
+    import yt_dlp
+
+    track = download.track
+    logger.info(f"Downloading {track['source']} {track['language']} subtitles ({track['ext']})...")
+    with yt_dlp.YoutubeDL(YDL_OPTS) as ydl, ydl.urlopen(track["url"]) as response:
+        for cue in iter_subtitle_cues(response, track["ext"], automatic=track["source"] == "automatic"):
+            yield transcript.append(cue)
+    subtitles = transcript.text
+    logger.info(f"Successfully parsed {transcript.cue_count} cues (size: {len(subtitles)} characters).")
 
-        except Exception as e:
-            logger.error(f"Error downloading subtitles for {youtube_url}: {e}")
-            return None
+    if store is not None and download.video_id and subtitles:
+        store.put(
+            download.video_id,
+            transcript,
+            title=str(download.info_dict.get("title") or ""),
+            duration=download.info_dict.get("duration"),
+            language=track["language"],
+            source=track["source"],
+        )
 
 
-def get_video_name(url: str) -> str:
+def _stream_subtitles(youtube_url: str, download: _SubtitleDownload, store: "TranscriptStore | None") -> Iterator[str]:
+    """Yields the pieces of a subtitle download, raising RuntimeError if it fails or has no text."""
+    empty = True
+    try:
+        for piece in _read_subtitles(download, store, TimedTranscript(get_chapters(download.info_dict))):
+            empty = empty and not piece
+            yield piece
+    except Exception as e:
+        raise RuntimeError(f"Error downloading subtitles for {youtube_url}: {e}") from e
+    if empty:
+        raise RuntimeError(f"Failed to retrieve subtitles from video: {youtube_url}")
+
+
+@timed("video_name")
+def get_video_name(url: str, store: "TranscriptStore | None" = None) -> str:
     """
     Retrieves the title of a YouTube video without downloading the content.
 
+    If a transcript store is given and holds a fresh entry for the video, its title is returned without
+    any network request.
+
     :param url: URL of the YouTube video
+    :param store: Transcript store to consult first, or None to always extract the video info
     :return: Title of the video as a string
     """
     logger.info(f"Fetching video title for URL: {url}")
 
-    class QuietLogger:
-        """Custom logger to suppress yt-dlp output."""
+    try:
+        video_id = get_video_id(url)
+        entry = store.get_entry(video_id) if store is not None and video_id else None
+        if store is not None and entry is not None and entry.title and not store.is_stale(entry):
+            logger.info(f"Using stored video title: {entry.title}")
+            return entry.title
+
+        title = get_video_info(url).get("title")
+        if not title:
+            raise ValueError(f"No title found in video metadata for URL: {url}")
+        logger.info(f"Retrieved video title: {title}")
+        return str(title)
+    except Exception as e:
+        raise RuntimeError(f"Error fetching video title for {url}: {e}") from e
 
-        def debug(self, msg: str) -> None:
-            pass
 
-        def warning(self, msg: str) -> None:
-            pass
+def get_playlist_video_urls(url: str) -> list[str]:
+    """
+    Expands a playlist or channel URL into the watch URLs of the videos it contains.
 
-        def error(self, msg: str) -> None:
-            pass
+    Uses a flat extraction so only the listing is fetched, not the metadata of every video.
+    Channel tabs (e.g. Videos, Live) are expanded recursively.
 
-    ydl_opts = {
-        "quiet": True,
-        "no_warnings": True,
-        "ignoreerrors": True,
-        "nocheckcertificate": True,
-        "logger": QuietLogger(),  # Suppress yt-dlp logs
-    }
+    :param url: URL of a YouTube playlist or channel
+    :return: List of video URLs in playlist order
+    """
+    import yt_dlp
+
+    logger.info(f"Expanding playlist/channel URL: {url}")
+
+    ydl_opts = {**YDL_OPTS, "extract_flat": "in_playlist"}
+
+    def collect(info: dict[str, Any], depth: int) -> list[str]:
+        urls: list[str] = []
+        for entry in info.get("entries") or []:
+            if not entry:
+                continue
+            if entry.get("ie_key") == "YoutubeTab" and depth > 0:
+                tab_info = ydl.extract_info(entry["url"], download=False)
+                if tab_info:
+                    urls.extend(collect(tab_info, depth - 1))
+            elif entry.get("id"):
+                urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+        return urls
 
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info_dict = ydl.extract_info(url, download=False)
             if info_dict is None:
-                raise RuntimeError(f"Could not extract video info for URL: {url}")
-            title = info_dict.get("title")
-            if not title:
-                raise ValueError(f"No title found in video metadata for URL: {url}")
-            logger.info(f"Retrieved video title: {title}")
-            return str(title)
+                raise RuntimeError(f"Could not extract playlist info for URL: {url}")
+            video_urls = collect(info_dict, depth=1)
     except Exception as e:
-        raise RuntimeError(f"Error fetching video title for {url}: {e}") from e
+        raise RuntimeError(f"Error expanding playlist {url}: {e}") from e
+
+    logger.info(f"Found {len(video_urls)} videos in {url}")
+    return video_urls